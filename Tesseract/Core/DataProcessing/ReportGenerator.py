@@ -0,0 +1,81 @@
+# Tesseract/Core/DataProcessing/ReportGenerator.py
+
+import os
+import logging
+from typing import Callable, Optional
+from Core.System.ConfigManager import ConfigManager
+from Core.System.StateManager import StateManager
+from Core.System.ErrorHandler import ErrorHandler
+from Core.System.AtomicWriter import escribir_atomico
+from .Services import RecordFormatter, ConfigProvider, BitmaskConverter, FileNameGenerator
+
+class ReportGenerator:
+    """Genera el reporte diario (histórico en USB + archivo pendiente de envío).
+
+    Vive en el núcleo para que la tarea programada funcione sin la interfaz.
+    """
+    TAREA_REPORTE = "reporte_diario"
+
+    def __init__(self, error_handler: ErrorHandler,
+                 guardar_pendiente: Optional[Callable[[str, str], bool]] = None,
+                 directorio_pendientes: str = "pendientes_usb"):
+        self.error_handler = error_handler
+        self.guardar_pendiente = guardar_pendiente
+        self.directorio_pendientes = directorio_pendientes
+        self.logger = logging.getLogger(__name__)
+
+    def programar(self, scheduler, hora: str = None):
+        """Registra (o reprograma) la tarea diaria en el servicio de programación"""
+        hora = hora or ConfigManager.cargar_config_general().get("hora_reporte", "23:00")
+        scheduler.programar_diario(self.TAREA_REPORTE, hora, self.generar_reporte_diario)
+        self.logger.info(f"Reporte diario programado a las {hora}")
+
+    def generar_reporte_diario(self) -> bool:
+        try:
+            config = ConfigManager.cargar_config_general()
+            tipo_reporte = config.get("report_type", "Medidor")
+            usb_path = config.get("storage_path", "")
+
+            # Validacíón crítica de USB
+            if not usb_path or not os.path.exists(usb_path):
+                raise ValueError("Ruta USB no configurada o inválida")
+
+            # Obtener medidor desde StateManager
+            medidor = StateManager.get_state('medidor')
+            if not medidor:
+                raise ValueError("Medidor no configurado")
+
+            # Obtener datos del medidor
+            datos = medidor.leer_registros()
+            perfil = medidor.perfil
+
+            # Generar contenido con formato
+            config_provider = ConfigProvider(ConfigManager())
+            formatter = RecordFormatter(config_provider, BitmaskConverter())
+            contenido = formatter.format(tipo_reporte, datos, perfil)
+
+            name_gen = FileNameGenerator(config_provider)
+
+            # 1. Archivo historico (USB) - SIN FECHA
+            nombre_historico = name_gen.generate_historic_name(tipo_reporte)
+            ruta_historico = os.path.join(usb_path, nombre_historico)
+
+            with open(ruta_historico, 'a') as f:
+                f.write(contenido + "\n")
+
+            # 2. Crear archivo diario (pendientes_usb) - CON FECHA
+            nombre_diario = name_gen.generate_daily_name(tipo_reporte)
+            ruta_diario = os.path.join(self.directorio_pendientes, nombre_diario)
+
+            os.makedirs(self.directorio_pendientes, exist_ok=True)
+            # Escritura atómica: el archivo diario queda completo o no existe
+            if self.guardar_pendiente:
+                if not self.guardar_pendiente(ruta_diario, contenido):
+                    raise IOError(f"No se pudo guardar {ruta_diario}")
+            else:
+                escribir_atomico(ruta_diario, contenido)
+            return True
+
+        except Exception as e:
+            self.error_handler.log_error("REP-GEN", f"Error generando reporte: {str(e)}")
+            return False
@@ -10,9 +10,20 @@ from pymodbus.exceptions import ModbusException
 from pymodbus.payload import BinaryPayloadDecoder
 from pymodbus.constants import Endian
 from Core.System.ErrorHandler import ErrorHandler
+from Core.System.Metrics import REGISTRO
 
 RegisterValue = Union[float, int, Dict[str, bool]]
 
+# La tasa de sondeo por medidor es rate(tesseract_modbus_lecturas_total)
+_LECTURAS = REGISTRO.contador(
+    "tesseract_modbus_lecturas_total", "Ciclos de lectura de registros por medidor", ("medidor",))
+_FALLOS = REGISTRO.contador(
+    "tesseract_modbus_fallos_total", "Lecturas fallidas por medidor y causa", ("medidor", "causa"))
+_REINTENTOS = REGISTRO.contador(
+    "tesseract_modbus_reintentos_total", "Reintentos de lectura de un registro", ("medidor",))
+_DURACION = REGISTRO.histograma(
+    "tesseract_modbus_lectura_segundos", "Duración de un ciclo de lectura completo", ("medidor",))
+
 class IMedidorAgua(ABC):
     """Interfaz para todos los tipos de medidores de agua"""
     @abstractmethod
@@ -126,6 +137,11 @@ class MedidorAguaBase(IMedidorAgua):
                     timeout=self.perfil.get("timeout", 3.0)  # Aumentado a 3 segundos
                 )
 
+    @property
+    def id_medidor(self) -> str:
+        """Identificador del medidor para agrupar sus alertas"""
+        return f"{self.perfil.get('modelo', 'medidor')}@{self.perfil.get('puerto_serie')}/{self.perfil.get('slave_id')}"
+
     def _map_parity(self, parity_char: str) -> str:
         mapping = {'N': 'N', 'E': 'E', 'O': 'O'}
         return mapping.get(parity_char.upper(), 'N')
@@ -137,11 +153,11 @@ class MedidorAguaBase(IMedidorAgua):
             try:
                 return self.client.connect()
             except FileNotFoundError as e:
-                self.error_handler.log_error("005", f"Puerto no disponible: {e}")
+                self.error_handler.log_error("005", f"Puerto no disponible: {e}", medidor=self.id_medidor)
             except ModbusException as e:
-                self.error_handler.log_error("020", f"Error Modbus: {e}")
+                self.error_handler.log_error("020", f"Error Modbus: {e}", medidor=self.id_medidor)
             except Exception as e:
-                self.error_handler.log_error("010", f"Error conexión: {type(e).__name__}: {e}")
+                self.error_handler.log_error("010", f"Error conexión: {type(e).__name__}: {e}", medidor=self.id_medidor)
             return False
 
     def desconectar(self):
@@ -150,7 +166,7 @@ class MedidorAguaBase(IMedidorAgua):
                 try:
                     self.client.close()
                 except Exception as e:
-                    self.error_handler.log_error("015", f"Error desconexión: {e}")
+                    self.error_handler.log_error("015", f"Error desconexión: {e}", medidor=self.id_medidor)
 
     def obtener_unidad_flujo(self) -> str:
         """Obtiene la unidad de flujo con caché para mejor rendimiento"""
@@ -166,13 +182,16 @@ class MedidorAguaBase(IMedidorAgua):
                 self._unidad_flujo_cache = unidades.get(registro, "m³/h")
                 self._ultima_lectura_unidad = ahora
             except Exception as e:
-                self.error_handler.log_error("UNIDAD_FLUJO", f"Error leyendo unidad: {e}")
+                self.error_handler.log_error("UNIDAD_FLUJO", f"Error leyendo unidad: {e}", medidor=self.id_medidor)
         return self._unidad_flujo_cache
     
     def leer_registros(self) -> Dict[str, RegisterValue]:
         """Lee registros con protección de lock reentrante"""
-        with self._connection_lock:
+        medidor = self.id_medidor
+        _LECTURAS.etiquetas(medidor).incrementar()
+        with self._connection_lock, _DURACION.etiquetas(medidor).medir_tiempo():
             if not self.client.connected and not self.conectar():
+                _FALLOS.etiquetas(medidor, "conexion").incrementar()
                 return {}
                 
             resultados = {}
@@ -182,10 +201,12 @@ class MedidorAguaBase(IMedidorAgua):
                     self.logger.debug(f"Leyendo registro: {reg_name}")
                     resultados[reg_name] = self._leer_registro(reg_name)
                 except ModbusException as e:
-                    self.error_handler.log_error("021", f"Error registro {reg_name}: {e}")
+                    _FALLOS.etiquetas(medidor, "modbus").incrementar()
+                    self.error_handler.log_error("021", f"Error registro {reg_name}: {e}", medidor=medidor)
                     resultados[reg_name] = None
                 except Exception as e:
-                    self.error_handler.log_error("022", f"Error decodificación {reg_name}: {e}")
+                    _FALLOS.etiquetas(medidor, "decodificacion").incrementar()
+                    self.error_handler.log_error("022", f"Error decodificación {reg_name}: {e}", medidor=medidor)
                     resultados[reg_name] = None
             return resultados
 
@@ -232,5 +253,6 @@ class MedidorAguaBase(IMedidorAgua):
             except ModbusException as e:
                 if intento == 2:
                     raise
+                _REINTENTOS.etiquetas(self.id_medidor).incrementar()
                 time.sleep(0.2)
                 self.conectar()
\ No newline at end of file
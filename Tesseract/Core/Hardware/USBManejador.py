@@ -2,12 +2,24 @@
 
 import os
 import logging
+import select
 import shutil
 import threading
 import psutil  
 from Core.System.ErrorHandler import ErrorHandler
+from Core.System.Metrics import REGISTRO
+
+_DETECCIONES = REGISTRO.contador("tesseract_usb_detecciones_total", "Unidades USB conectadas y detectadas")
+_COPIADOS = REGISTRO.contador("tesseract_usb_archivos_copiados_total", "Archivos pendientes copiados a USB")
+_ESCRITURAS = REGISTRO.contador(
+    "tesseract_usb_escrituras_total", "Escrituras directas en USB según resultado", ("resultado",))
+_ERRORES = REGISTRO.contador("tesseract_usb_errores_total", "Errores de E/S en USB por operación", ("operacion",))
+_UNIDADES = REGISTRO.indicador("tesseract_usb_unidades", "Unidades USB montadas actualmente")
+_PENDIENTES = REGISTRO.indicador("tesseract_usb_pendientes", "Archivos esperando una unidad USB")
 
 class USBManejador:
+    MOUNTS_PATH = "/proc/self/mounts"
+
     def __init__(self, error_handler: ErrorHandler, poll_interval: int = 5, pendientes_dir: str = "pendientes_usb"):
         self.error_handler = error_handler
         self._pendientes_dir = pendientes_dir
@@ -15,33 +27,100 @@ class USBManejador:
         self._lock = threading.Lock()
         self._monitoring_thread = None
         self._running = False
+        self._stop_event = threading.Event()
+        self._stop_pipe = None
+        # Caché de unidades montadas; solo se actualiza cuando cambia la tabla de montaje
+        self._drives_lock = threading.Lock()
+        self._drives_cache = None
         os.makedirs(self._pendientes_dir, exist_ok=True)
+        REGISTRO.agregar_colector(self._actualizar_metricas)
+
+    def _actualizar_metricas(self):
+        with self._drives_lock:
+            drives = self._drives_cache
+        _UNIDADES.fijar(len(drives) if drives else 0)
+        try:
+            _PENDIENTES.fijar(sum(1 for nombre in os.listdir(self._pendientes_dir) if self._es_pendiente(nombre)))
+        except OSError:
+            _PENDIENTES.fijar(0)
+
+    @staticmethod
+    def _es_pendiente(nombre: str) -> bool:
+        """Excluye el diario y los temporales del escritor atómico (.journal, .<archivo>.tmp)"""
+        return not (nombre.startswith(".") or nombre.endswith(".tmp"))
 
     def inicializar_monitoreo(self):
-        """Inicia el monitoreo periódico de unidades USB"""
+        """Inicia el monitoreo de unidades USB (por eventos si el sistema lo permite)"""
+        if self._monitoring_thread and self._monitoring_thread.is_alive():
+            # Reinicio: se detiene el monitor anterior y se libera su pipe
+            self.detener_monitoreo()
         self._running = True
+        self._stop_event.clear()
+        if self._soporta_eventos_montaje():
+            self._stop_pipe = os.pipe()
+            target, args = self._monitor_mount_events, (self._poll_interval, self._stop_pipe[0])
+        else:
+            target, args = self._monitor_usb_changes, (self._poll_interval,)
         self._monitoring_thread = threading.Thread(
-            target=self._monitor_usb_changes,
-            args=(self._poll_interval,),
+            target=target,
+            args=args,
             daemon=True
         )
         self._monitoring_thread.start()
 
+    def _soporta_eventos_montaje(self) -> bool:
+        """poll() sobre /proc/self/mounts notifica cambios de montaje en Linux"""
+        return hasattr(select, "poll") and os.path.exists(self.MOUNTS_PATH)
+
+    def _monitor_mount_events(self, interval, stop_fd: int):
+        """Espera notificaciones del kernel sobre la tabla de montaje (sin sondeo periódico)"""
+        try:
+            mounts = open(self.MOUNTS_PATH, "r")
+        except OSError as e:
+            self.error_handler.log_error("USB-017", f"No se pudo abrir {self.MOUNTS_PATH}: {e}")
+            self._monitor_usb_changes(interval)
+            return
+
+        poller = select.poll()
+        poller.register(mounts.fileno(), select.POLLPRI | select.POLLERR)
+        poller.register(stop_fd, select.POLLIN)
+        last_state = self._actualizar_cache()
+
+        try:
+            while self._running:
+                eventos = poller.poll()
+                if any(fd == stop_fd for fd, _ in eventos):
+                    break
+                last_state = self._procesar_cambio(last_state)
+        finally:
+            # El pipe lo cierra detener_monitoreo una vez terminado este hilo
+            mounts.close()
+
     def _monitor_usb_changes(self, interval):
-        """Monitorea cambios en unidades USB cada intervalo especificado"""
+        """Respaldo por sondeo para sistemas sin notificación de montajes (p. ej. Windows)"""
         last_state = set()
         
         while self._running:
-            current_state = self._get_usb_drives()
-            new_drives = current_state - last_state
-            
-            if new_drives:
-                for drive in new_drives:
-                    self.error_handler.log_evento(f"USB detectado: {drive}")
-                    self._copiar_pendientes(drive)
-            
-            last_state = current_state
-            threading.Event().wait(interval)
+            last_state = self._procesar_cambio(last_state)
+            self._stop_event.wait(interval)
+
+    def _procesar_cambio(self, last_state: set) -> set:
+        current_state = self._actualizar_cache()
+        new_drives = current_state - last_state
+
+        if new_drives:
+            for drive in new_drives:
+                _DETECCIONES.incrementar()
+                self.error_handler.log_evento(f"USB detectado: {drive}")
+                self._copiar_pendientes(drive)
+
+        return current_state
+
+    def _actualizar_cache(self) -> set:
+        drives = self._get_usb_drives()
+        with self._drives_lock:
+            self._drives_cache = drives
+        return drives
 
     def _get_usb_drives(self):
         """Retorna conjunto de unidades USB actualmente montadas usando psutil"""
@@ -61,16 +140,24 @@ class USBManejador:
                     # CORRECCIÓN: Usar modo 'w' para sobrescribir
                     with open(ruta_completa, 'w', encoding='utf-8') as f:
                         f.write(contenido)  # Sin añadir nueva línea
-                    return os.path.exists(ruta_completa)
+                    exitoso = os.path.exists(ruta_completa)
+                    _ESCRITURAS.etiquetas("exitosa" if exitoso else "fallida").incrementar()
+                    return exitoso
                 else:
+                    _ESCRITURAS.etiquetas("sin_unidad").incrementar()
                     return False
             except Exception as e:
+                _ERRORES.etiquetas("escritura").incrementar()
                 self.error_handler.log_error("USB-015", f"Error USB: {e}")
                 return False
 
     def _get_first_usb_drive(self):
-        """Retorna la primera unidad USB detectada o None"""
-        drives = self._get_usb_drives()
+        """Retorna la primera unidad USB detectada o None (usa la caché del monitor)"""
+        with self._drives_lock:
+            drives = self._drives_cache
+        if drives is None:
+            # Sin monitor activo todavía: enumerar una sola vez
+            drives = self._actualizar_cache()
         return next(iter(drives), None) if drives else None
 
     def _copiar_pendientes(self, usb_drive: str):
@@ -81,6 +168,8 @@ class USBManejador:
 
             for archivo in os.listdir(self._pendientes_dir):
                 ruta_origen = os.path.join(self._pendientes_dir, archivo)
+                if not self._es_pendiente(archivo) or not os.path.isfile(ruta_origen):
+                    continue
                 ruta_destino = os.path.join(usb_drive, archivo)
 
                 try:
@@ -93,11 +182,28 @@ class USBManejador:
                         shutil.copy(ruta_origen, ruta_destino)
                     
                     os.remove(ruta_origen)
+                    _COPIADOS.incrementar()
                 except Exception as e:
+                    _ERRORES.etiquetas("copia").incrementar()
                     self.error_handler.log_error("USB-016", f"Error copiando {archivo}: {e}")
 
     def detener_monitoreo(self):
         """Detiene el monitoreo de unidades USB"""
         self._running = False
+        self._stop_event.set()
+        if self._stop_pipe:
+            try:
+                os.write(self._stop_pipe[1], b"\0")
+            except OSError:
+                pass
         if self._monitoring_thread:
-            self._monitoring_thread.join(timeout=5)
\ No newline at end of file
+            self._monitoring_thread.join(timeout=5)
+            if self._monitoring_thread.is_alive():
+                # Cerrar el pipe con el hilo aún en poll() sería peor que conservarlo
+                logging.warning("Monitor USB no terminó a tiempo; se conserva su pipe")
+                return
+            self._monitoring_thread = None
+        if self._stop_pipe:
+            for fd in self._stop_pipe:
+                os.close(fd)
+            self._stop_pipe = None
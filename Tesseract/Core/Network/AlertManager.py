@@ -2,59 +2,113 @@
 
 import logging
 from abc import ABC, abstractmethod
+import threading
 from Core.System.ErrorHandler import ErrorHandler
-from twilio.rest import Client
+from Core.System.AlertDispatcher import heredar_despacho
+from Core.System.TokenBucket import RateLimiter
+from Core.System.Metrics import REGISTRO
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from Core.Network.SMSGateway import TwilioHTTPClient, SMSPipeline
+from Core.Network.WebhookGateway import WebhookEndpoint, crear_sesion
 import smtplib
+from email.header import Header
 from email.mime.text import MIMEText
+from email.utils import formataddr, parseaddr
+
+_ALERTAS = REGISTRO.contador(
+    "tesseract_alertas_total", "Alertas por canal y resultado (enviada, fallida, error, suprimida)",
+    ("canal", "resultado"))
+_DURACION_ALERTA = REGISTRO.histograma(
+    "tesseract_alerta_envio_segundos", "Duración del envío de una alerta por canal", ("canal",))
 
 class AlertChannel(ABC):
     """Interfaz para canales de alerta"""
+    # Límite propio de alertas por destino; None = el general de AlertManager
+    alertas_por_hora = None
+    rafaga_alertas = None
+
     @abstractmethod
     def send(self, message: str, destination: str) -> bool:
         pass
 
 class SMSChannel(AlertChannel):
+    """SMS vía la API REST de Twilio con cola, empaquetado y límite de tasa"""
+    TIMEOUT_ENVIO = 120
+
     def __init__(self, config: dict, error_handler: ErrorHandler):
         self.config = config
         self.error_handler = error_handler
         try:
-            self.client = Client(config["account_sid"], config["auth_token"])
+            concurrencia = config.get("sms_concurrencia", 4)
+            self.pipeline = SMSPipeline(
+                TwilioHTTPClient(config, conexiones=concurrencia),
+                error_handler,
+                segmentos_por_segundo=config.get("sms_segmentos_por_segundo", 1.0),
+                rafaga=config.get("sms_rafaga", 10),
+                concurrencia=concurrencia,
+                ventana=config.get("sms_ventana_empaquetado", 2.0),
+                max_segmentos=config.get("sms_max_segmentos", 10)
+            )
         except Exception as e:
             self.error_handler.log_error("SMS-INIT", f"Error inicializando cliente SMS: {e}")
-            self.client = None
+            self.pipeline = None
 
     def send(self, message: str, destination: str) -> bool:
-        if self.client is None:
+        return self.enviar_lineas([message], destination)
+
+    def enviar_lineas(self, lineas: List[str], destination: str, clave: str = None) -> bool:
+        """Encola las líneas (empaquetadas con otras de la misma clave y destino) y espera la entrega"""
+        if self.pipeline is None:
             return False
         try:
-            self.client.messages.create(
-                body=message,
-                from_=self.config["numero_twilio"],
-                to=destination
-            )
-            logging.info(f"SMS enviado a {destination}")
-            return True
+            return self.pipeline.encolar(destination, lineas, clave).result(timeout=self.TIMEOUT_ENVIO)
         except Exception as e:
             logging.error(f"Error enviando SMS: {e}")
             self.error_handler.log_error("SMS-SEND", f"Error enviando SMS: {e}")
             return False
 
+    def cerrar(self):
+        if self.pipeline:
+            self.pipeline.detener()
+
 class EmailChannel(AlertChannel):
     def __init__(self, config: dict, error_handler: ErrorHandler):
         self.config = config
         self.error_handler = error_handler
+        # Sesión SMTP reutilizada entre alertas; se reconecta si el servidor la cerró
+        self._server = None
+        self._lock = threading.Lock()
+
+    def _conectar(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.config["smtp_server"], self.config["smtp_port"], timeout=15)
+        server.starttls()
+        server.login(self.config["email_user"], self.config["email_password"])
+        return server
 
     def send(self, message: str, destination: str) -> bool:
         try:
-            msg = MIMEText(message)
-            msg['Subject'] = self.config.get("subject", "Alerta de Telemetría")
-            msg['From'] = self.config["email_from"]
+            msg = MIMEText(message, "plain", "utf-8")
+            # Encabezados codificados (RFC 2047): sendmail exige un mensaje ASCII
+            msg['Subject'] = Header(self.config.get("subject", "Alerta de Telemetría"), "utf-8")
+            msg['From'] = formataddr(parseaddr(self.config["email_from"]), charset="utf-8")
             msg['To'] = destination
 
-            with smtplib.SMTP(self.config["smtp_server"], self.config["smtp_port"]) as server:
-                server.starttls()
-                server.login(self.config["email_user"], self.config["email_password"])
-                server.sendmail(self.config["email_from"], destination, msg.as_string())
+            with self._lock:
+                for intento in range(2):
+                    try:
+                        if self._server is None:
+                            self._server = self._conectar()
+                        self._server.sendmail(self.config["email_from"], destination, msg.as_string())
+                        break
+                    except smtplib.SMTPServerDisconnected:
+                        self._server = None
+                        if intento == 1:
+                            raise
+                    except Exception:
+                        # Error a mitad del envío: la sesión queda en estado incierto y se descarta
+                        self._descartar_sesion()
+                        raise
             logging.info(f"Email enviado a {destination}")
             return True
         except Exception as e:
@@ -62,11 +116,84 @@ class EmailChannel(AlertChannel):
             self.error_handler.log_error("EMAIL-SEND", f"Error enviando email: {e}")
             return False
 
+    def _descartar_sesion(self):
+        if self._server:
+            self._server.close()
+            self._server = None
+
+    def cerrar(self):
+        with self._lock:
+            if self._server:
+                try:
+                    self._server.quit()
+                except Exception:
+                    pass
+                self._server = None
+
+class WebhookChannel(AlertChannel):
+    """Publica alertas como lotes JSON en uno o más endpoints HTTP (NOC).
+
+    config["webhooks"]: lista de URLs o de {"url": ..., "headers": {...}}.
+    """
+    TIMEOUT_ENVIO = 30
+    # Sin costo por mensaje: límite holgado, solo contra tormentas y bucles
+    ALERTAS_POR_HORA = 360
+    RAFAGA_ALERTAS = 20
+
+    def __init__(self, config: dict, error_handler: ErrorHandler):
+        self.config = config
+        self.error_handler = error_handler
+        self.alertas_por_hora = config.get("webhook_alertas_por_hora", self.ALERTAS_POR_HORA)
+        self.rafaga_alertas = config.get("webhook_rafaga_alertas", self.RAFAGA_ALERTAS)
+        webhooks = config.get("webhooks", [])
+        self.session = crear_sesion(max(1, len(webhooks)) * 2)
+        self.endpoints = []
+        for webhook in webhooks:
+            if isinstance(webhook, str):
+                webhook = {"url": webhook}
+            self.endpoints.append(WebhookEndpoint(
+                webhook["url"],
+                self.session,
+                headers=webhook.get("headers"),
+                timeout=config.get("webhook_timeout", 5.0),
+                origen=config.get("origen", "")
+            ))
+
+    def send(self, message: str, destination: str) -> bool:
+        # Todos los endpoints reciben la alerta en paralelo (un hilo por endpoint)
+        futuros = [endpoint.encolar(message, destination) for endpoint in self.endpoints]
+        exitoso = bool(futuros)
+        for futuro in futuros:
+            try:
+                exitoso = futuro.result(timeout=self.TIMEOUT_ENVIO) and exitoso
+            except Exception as e:
+                logging.error(f"Error enviando webhook: {e}")
+                exitoso = False
+        if not exitoso:
+            self.error_handler.log_error("WEBHOOK-SEND", "Fallo publicando alerta en webhook")
+        return exitoso
+
+    def cerrar(self):
+        for endpoint in self.endpoints:
+            endpoint.detener()
+        self.session.close()
+
 class AlertManager:
+    # Límite de alertas por canal y destino (cubeta de tokens)
+    ALERTAS_POR_HORA = 12
+    RAFAGA_ALERTAS = 3
+
     def __init__(self, config: dict, error_handler: ErrorHandler):
         self.config = config
         self.error_handler = error_handler
         self.channel = self._create_channel()
+        self.channels = [self.channel]
+        if config.get("webhooks"):
+            self.channels.append(WebhookChannel(config, error_handler))
+        self._executor = ThreadPoolExecutor(max_workers=len(self.channels), thread_name_prefix="AlertFanout")
+        self._limitadores = {id(canal): self._crear_limitador(canal) for canal in self.channels}
+        self._suprimidas = {}
+        self._suprimidas_lock = threading.Lock()
 
     def _create_channel(self) -> AlertChannel:
         if self.config.get("use_sms", False):
@@ -74,13 +201,56 @@ class AlertManager:
         else:
             return EmailChannel(self.config, self.error_handler)
 
-    def enviar_alerta(self, mensaje: str, destino: str):
+    def _crear_limitador(self, canal: AlertChannel) -> RateLimiter:
+        if canal.alertas_por_hora is not None:
+            return RateLimiter(canal.alertas_por_hora / 3600.0, canal.rafaga_alertas or 1)
+        return RateLimiter(
+            self.config.get("alertas_por_hora", self.ALERTAS_POR_HORA) / 3600.0,
+            self.config.get("rafaga_alertas", self.RAFAGA_ALERTAS)
+        )
+
+    def _destino_por_defecto(self, canal: AlertChannel) -> str:
+        if isinstance(canal, SMSChannel):
+            return self.config.get("numero_destino", "")
+        if isinstance(canal, EmailChannel):
+            return self.config.get("email_to", self.config.get("email_from", ""))
+        return None
+
+    def enviar_alerta(self, mensaje: str, destino: str = None):
+        """Envía la alerta por todos los canales configurados, en paralelo"""
+        if len(self.channels) == 1:
+            return self._enviar_por_canal(self.channel, mensaje, destino)
+        # Los hilos del fan-out heredan la marca de despacho: sus errores no alertan
+        tarea = heredar_despacho(self._enviar_por_canal)
+        futuros = [self._executor.submit(tarea, canal, mensaje, destino) for canal in self.channels]
+        resultados = [futuro.result() for futuro in futuros]
+        return any(resultados)
+
+    def _enviar_por_canal(self, canal: AlertChannel, mensaje: str, destino: str = None) -> bool:
+        if canal is not self.channel or not destino:
+            destino = self._destino_por_defecto(canal)
+        nombre_canal = type(canal).__name__
+        clave = (nombre_canal, destino)
+        if not self._limitadores[id(canal)].consumir(clave):
+            # Límite alcanzado: se cuenta y se informa con la próxima alerta enviada
+            _ALERTAS.etiquetas(nombre_canal, "suprimida").incrementar()
+            with self._suprimidas_lock:
+                self._suprimidas[clave] = self._suprimidas.get(clave, 0) + 1
+            logging.warning(f"Alerta suprimida por límite de envío a {destino}")
+            return False
+        with self._suprimidas_lock:
+            suprimidas = self._suprimidas.pop(clave, 0)
+        if suprimidas:
+            mensaje = f"{mensaje} [+{suprimidas} alertas suprimidas por límite de envío]"
         try:
-            success = self.channel.send(f"ALERTA: {mensaje}", destino)
+            with _DURACION_ALERTA.etiquetas(nombre_canal).medir_tiempo():
+                success = canal.send(f"ALERTA: {mensaje}", destino)
+            _ALERTAS.etiquetas(nombre_canal, "enviada" if success else "fallida").incrementar()
             if not success:
-                self.error_handler.log_error("ALERT-001", "Fallo en envío de alerta")
+                self.error_handler.log_error("ALERT-001", f"Fallo en envío de alerta ({nombre_canal})")
             return success
         except Exception as e:
+            _ALERTAS.etiquetas(nombre_canal, "error").incrementar()
             self.error_handler.log_error("ALERT-002", f"Error crítico: {e}")
             return False
 
@@ -90,15 +260,23 @@ class AlertManager:
             with open(archivo_path, 'r', encoding='utf-8') as f:
                 contenido = f.read().strip()
             
-            # Limitar el contenido si es muy largo para SMS (1600 caracteres máximo)
-            if len(contenido) > 1600:
-                contenido = contenido[:1596] + "..."
-            
-            # Enviar como SMS
-            success = self.channel.send(contenido, destino)
+            if isinstance(self.channel, SMSChannel):
+                # Las líneas CONAGUA se empaquetan en segmentos completos, sin truncar
+                success = self.channel.enviar_lineas(contenido.splitlines(), destino, clave=archivo_path)
+            else:
+                # Limitar el contenido si es muy largo (1600 caracteres máximo)
+                if len(contenido) > 1600:
+                    contenido = contenido[:1596] + "..."
+                success = self.channel.send(contenido, destino)
             if not success:
                 self.error_handler.log_error("SMS-FILE", f"Fallo enviando archivo por SMS: {archivo_path}")
             return success
         except Exception as e:
             self.error_handler.log_error("SMS-FILE-READ", f"Error leyendo archivo para SMS: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def cerrar(self):
+        for canal in self.channels:
+            if hasattr(canal, "cerrar"):
+                canal.cerrar()
+        self._executor.shutdown(wait=False)
\ No newline at end of file
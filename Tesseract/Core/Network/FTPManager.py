@@ -1,15 +1,38 @@
 # Tesseract/Core/Network/FTPManager.py
 
 import ftplib
+import hashlib
+import json
 import logging
 import os
+import posixpath
+import threading
 import time
 import ssl
-from typing import Optional
+import zlib
+from typing import Optional, Iterable, Tuple, Dict
 from Core.System.ErrorHandler import ErrorHandler
+from Core.System.AtomicWriter import escribir_atomico
+from Core.System.Metrics import REGISTRO
 from .IFileTransfer import IFileTransfer
+from .FTPSessionPool import FTPSessionPool
+from .InternetManager import registrar_actividad_red
+
+_ENVIOS = REGISTRO.contador(
+    "tesseract_ftp_envios_total", "Archivos enviados por FTP según resultado", ("resultado",))
+_DURACION_ENVIO = REGISTRO.histograma(
+    "tesseract_ftp_envio_segundos", "Duración de enviar_archivo, reintentos incluidos")
+_BYTES = REGISTRO.contador(
+    "tesseract_ftp_bytes_enviados_total", "Bytes transferidos con STOR (sin contar lo ya presente)")
+_SIN_CONEXION = REGISTRO.contador(
+    "tesseract_ftp_conexiones_fallidas_total", "Intentos de envío sin sesión FTP disponible")
+_REANUDACIONES = REGISTRO.contador(
+    "tesseract_ftp_reanudaciones_total", "Transferencias reanudadas desde un offset remoto")
 
 class FTPManager(IFileTransfer):
+    # Algoritmos de HASH (draft-bryan-ftpext-hash) soportados localmente
+    ALGORITMOS_HASH = {"SHA-256": "sha256", "SHA-1": "sha1", "SHA-512": "sha512", "MD5": "md5"}
+
     def __init__(self, config: dict, error_handler: ErrorHandler):
         self.config = config
         self.error_handler = error_handler
@@ -18,57 +41,77 @@ class FTPManager(IFileTransfer):
         self.timeout = config.get("timeout", 30)
         self.port = config.get("puerto", 21)
         self.secure_mode = config.get("secure", True)  # Valor por defecto True
+        self._pool = FTPSessionPool(
+            self._crear_conexion,
+            max_sesiones=config.get("max_sesiones", 3),  # más sesiones solo por configuración: cada una es un login
+            keepalive=config.get("keepalive", 30),
+            max_inactividad=config.get("max_inactividad", 300)
+        )
+        self.reanudar = config.get("reanudar", True)  # REST + SIZE para transferencias parciales
+        self.verificar_hash = config.get("verificar_hash", True)
+        self._features: Optional[Dict[str, str]] = None
+        # Señal de congestión del último envío, por hilo (421, timeouts)
+        self._estado_hilo = threading.local()
+        # Caché de directorios remotos que ya existen (opcionalmente persistida en disco)
+        self._cache_dirs_path = config.get("cache_directorios")
+        self._dirs_lock = threading.Lock()
+        self._directorios_conocidos = self._cargar_cache_directorios()
 
     def _conectar(self) -> bool:
+        if self.connection:
+            try:
+                self.connection.quit()
+            except:
+                pass
+        self.connection = self._crear_conexion()
+        return self.connection is not None
+
+    def _crear_conexion(self) -> Optional[ftplib.FTP]:
+        """Abre y autentica una conexión de control nueva (TLS si está habilitado)"""
         try:
-            if self.connection:
-                try:
-                    self.connection.quit()
-                except:
-                    pass
-            
             # Intento con TLS si está habilitado
             if self.secure_mode:
                 try:    
-                    self.connection = ftplib.FTP_TLS(
+                    connection = ftplib.FTP_TLS(
                         timeout=self.timeout,
                         context=ssl.create_default_context()
                     )
-                    self.connection.connect(
+                    connection.connect(
                         self.config["host"],
                         self.port
                     )
-                    self.connection.login(
+                    connection.login(
                         user=self.config["usuario"],
                         passwd=self.config["clave"]
                     )
                     # Intentar establecer protección de datos
                     try:
-                        self.connection.prot_p()
+                        connection.prot_p()
                     except:
                         self.logger.warning("El servidor no soporta PROT P, continuando sin cifrado de datos")
-                    return True
+                    return connection
                 except Exception as e:
                     self.logger.warning(f"Fallo TLS, intentando sin cifrado")  # ¡Credenciales seguras!
                     
             # Conexión FTP estándar
-            self.connection = ftplib.FTP(timeout=self.timeout)
-            self.connection.connect(
+            connection = ftplib.FTP(timeout=self.timeout)
+            connection.connect(
                 self.config["host"],
                 self.port
             )
-            self.connection.login(
+            connection.login(
                 user=self.config["usuario"],
                 passwd=self.config["clave"]
             )
-            return True
+            return connection
         
         except ftplib.all_errors as e:
+            self._marcar_congestion(e)
             self.error_handler.log_error("FTP-001", f"Conexión fallida: {e}")
-            return False
+            return None
         except Exception as e:
             self.error_handler.log_error("FTP-002", f"Error inesperado: {e}")
-            return False
+            return None
 
     def _cerrar_conexion(self):
         try:
@@ -79,35 +122,120 @@ class FTPManager(IFileTransfer):
         finally:
             self.connection = None
 
-    def _crear_directorios_remotos(self, remote_dir: str):
-        """Crea directorios remotos recursivamente - Versión mejorada"""
+    def cerrar(self):
+        """Cierra las sesiones reutilizables del pool"""
+        self._pool.cerrar()
+
+    def _cargar_cache_directorios(self) -> set:
+        if not self._cache_dirs_path or not os.path.exists(self._cache_dirs_path):
+            return set()
+        try:
+            with open(self._cache_dirs_path, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+            if datos.get("host") != self.config.get("host"):
+                return set()
+            return set(datos.get("directorios", []))
+        except Exception as e:
+            self.logger.warning(f"Caché de directorios ignorada: {e}")
+            return set()
+
+    def _guardar_cache_directorios(self):
+        if not self._cache_dirs_path:
+            return
+        with self._dirs_lock:
+            datos = {"host": self.config.get("host"), "directorios": sorted(self._directorios_conocidos)}
+        try:
+            escribir_atomico(self._cache_dirs_path, json.dumps(datos, indent=4))
+        except Exception as e:
+            self.logger.warning(f"No se pudo guardar la caché de directorios: {e}")
+
+    def _registrar_directorios(self, directorios: Iterable[str]):
+        with self._dirs_lock:
+            nuevos = set(directorios) - self._directorios_conocidos
+            self._directorios_conocidos.update(nuevos)
+        if nuevos:
+            self._guardar_cache_directorios()
+
+    def _invalidar_directorio(self, remote_dir: str):
+        """Olvida un directorio (y sus subdirectorios) tras un 550"""
+        remote_dir = self._normalizar_ruta(remote_dir)
+        with self._dirs_lock:
+            self._directorios_conocidos = {
+                d for d in self._directorios_conocidos
+                if d != remote_dir and not d.startswith(remote_dir.rstrip("/") + "/")
+            }
+        self._guardar_cache_directorios()
+
+    @staticmethod
+    def _normalizar_ruta(ruta: str) -> str:
+        """Ruta remota absoluta con separadores POSIX"""
+        ruta = ruta.replace("\\", "/")
+        return posixpath.normpath("/" + ruta.lstrip("/"))
+
+    def _crear_directorios_remotos(self, ftp: ftplib.FTP, remote_dir: str):
+        """Crea directorios remotos recursivamente usando la caché para evitar viajes"""
+        remote_dir = self._normalizar_ruta(remote_dir)
+        with self._dirs_lock:
+            if remote_dir == "/" or remote_dir in self._directorios_conocidos:
+                return
+
         try:
-            # 1. Resetear a directorio raíz
-            self.connection.cwd("/")
-            
-            # 2. Crear estructura completa
-            segments = remote_dir.strip("/").split("/")
             current_path = ""
-            
-            for segment in segments:
-                if not segment:
-                    continue
-                    
-                current_path += f"/{segment}" if current_path else segment
-                
+            creados = []
+            for segment in remote_dir.strip("/").split("/"):
+                current_path += f"/{segment}"
+                with self._dirs_lock:
+                    if current_path in self._directorios_conocidos:
+                        continue
                 try:
-                    self.connection.cwd(current_path)
-                except ftplib.error_perm:
-                    try:
-                        self.connection.mkd(current_path)
-                        self.connection.cwd(current_path)
-                    except ftplib.error_perm as e:
-                        # Ignorar error si directorio ya existe
-                        if "550" not in str(e):
-                            raise
+                    ftp.mkd(current_path)
+                except ftplib.error_perm as e:
+                    # 550/521: el directorio ya existe
+                    if not str(e).startswith(("550", "521")):
+                        raise
+                creados.append(current_path)
+            self._registrar_directorios(creados)
         except Exception as e:
             self.error_handler.log_error("FTP-003", f"Error creando directorios: {e}")
 
+    def precalentar_directorios(self, remote_dirs: Iterable[str]):
+        """Carga la caché con un MLSD por directorio padre, una vez por lote"""
+        pendientes = set()
+        for remote_dir in remote_dirs:
+            remote_dir = self._normalizar_ruta(remote_dir)
+            with self._dirs_lock:
+                if remote_dir == "/" or remote_dir in self._directorios_conocidos:
+                    continue
+            pendientes.add(posixpath.dirname(remote_dir))
+        if not pendientes:
+            return
+
+        ftp = self._pool.obtener()
+        if ftp is None:
+            return
+        sesion_valida = True
+        try:
+            for padre in sorted(pendientes):
+                try:
+                    encontrados = [
+                        posixpath.join(padre, nombre)
+                        for nombre, hechos in ftp.mlsd(padre, facts=["type"])
+                        if hechos.get("type") == "dir"
+                    ]
+                except ftplib.error_perm as e:
+                    if str(e).startswith(("500", "501", "502")):
+                        self.logger.info("El servidor no soporta MLSD; sin precarga de directorios")
+                        return
+                    continue  # 550: el padre tampoco existe
+                if padre != "/":
+                    encontrados.append(padre)
+                self._registrar_directorios(encontrados)
+        except (ftplib.error_temp, ftplib.error_reply, ftplib.error_proto, OSError, EOFError) as e:
+            sesion_valida = False
+            self.logger.warning(f"Precarga de directorios interrumpida: {e}")
+        finally:
+            self._pool.liberar(ftp, sesion_valida)
+
     def _validar_formato_conagua(self, local_path: str) -> bool:
         """Valida que el archivo cumpla con normativa Conagua"""
         try:
@@ -119,49 +247,221 @@ class FTPManager(IFileTransfer):
             return False
 
     def enviar_archivo(self, local_path: str, remote_path: str) -> bool:
+        with _DURACION_ENVIO.medir_tiempo():
+            exitoso = self._enviar_archivo(local_path, remote_path)
+        if exitoso:
+            _ENVIOS.etiquetas("exitoso").incrementar()
+        else:
+            _ENVIOS.etiquetas("congestion" if self.fue_congestion() else "fallido").incrementar()
+        return exitoso
+
+    def _enviar_archivo(self, local_path: str, remote_path: str) -> bool:
         self.logger.info(f"Iniciando envío FTP: {local_path} -> {remote_path}")
+        remote_path = self._normalizar_ruta(remote_path)
+        self._estado_hilo.congestion = False
+        
+        # Validación CRÍTICA de formato Conagua
+        if not self._validar_formato_conagua(local_path):
+            self.error_handler.log_error("FTP-010", f"Formato inválido: {os.path.basename(local_path)}")
+            return False
         
         for intento in range(3):
-            try:
-                if not self._conectar():
-                    self.logger.error("No se pudo establecer conexión FTP")
-                    continue
-                
-                # Validación CRÍTICA de formato Conagua
-                if not self._validar_formato_conagua(local_path):
-                    self.error_handler.log_error("FTP-010", f"Formato inválido: {os.path.basename(local_path)}")
+            ftp = self._pool.obtener()
+            if ftp is None:
+                _SIN_CONEXION.incrementar()
+                self.logger.error("No se pudo establecer conexión FTP")
+                if self.fue_congestion():
+                    # 421 al conectar: insistir solo agrava la saturación; lo reprograma la bandeja
                     return False
+                continue
+            sesion_valida = True
+            try:
+                # Crear estructura de directorios (sin viajes si ya está en caché)
+                remote_dir = posixpath.dirname(remote_path)
+                self._crear_directorios_remotos(ftp, remote_dir)
                 
-                # Crear estructura de directorios
-                remote_dir = os.path.dirname(remote_path)
-                if remote_dir:
-                    self._crear_directorios_remotos(remote_dir)
-                
-                # Enviar archivo
-                with open(local_path, "rb") as file:
-                    self.connection.storbinary(f"STOR {os.path.basename(remote_path)}", file)
+                # Enviar archivo directo con STOR a la ruta absoluta
+                try:
+                    verificado = self._stor(ftp, local_path, remote_path)
+                except ftplib.error_perm as e:
+                    if not str(e).startswith("550"):
+                        raise
+                    # El directorio en caché ya no existe: recrear y reintentar una vez
+                    self._invalidar_directorio(remote_dir)
+                    self._crear_directorios_remotos(ftp, remote_dir)
+                    verificado = self._stor(ftp, local_path, remote_path)
+                if not verificado:
+                    self.error_handler.log_error("FTP-011", f"Verificación fallida: {os.path.basename(local_path)}")
+                    time.sleep(2)
+                    continue
                 self.logger.info(f"Archivo enviado exitosamente: {local_path}")
+                registrar_actividad_red()
                 return True
-            except (ftplib.error_temp, ConnectionResetError) as e:
+            except (ftplib.error_temp, ftplib.error_reply, EOFError, OSError) as e:
+                self._marcar_congestion(e)
+                # Transferencia interrumpida: el siguiente intento reanuda desde el offset remoto
+                sesion_valida = False
+                if str(e).startswith("421"):
+                    self.logger.warning(f"Servidor saturado, se reprograma el envío: {e}")
+                    return False
                 self.logger.warning(f"Reintento {intento+1}/3 por error temporal: {e}")
                 time.sleep(2)
             except ftplib.error_perm as e:
                 error_code = int(str(e).split()[0])
                 # Código 534: Política no permite TLS
                 if error_code == 534:
+                    sesion_valida = False
                     self.secure_mode = False
+                    self._pool.vaciar()
                     self.logger.warning("Desactivando TLS por política del servidor")
                     time.sleep(1)
                 else:
                     self.error_handler.log_error("FTP-004", f"Error de permisos: {e}")
                     return False
             except Exception as e:
+                sesion_valida = False
                 self.error_handler.log_error("FTP-005", f"Error crítico: {e}")
                 return False
             finally:
-                self._cerrar_conexion()
+                # La sesión vuelve al pool para el siguiente archivo (o se descarta si quedó rota)
+                self._pool.liberar(ftp, sesion_valida)
         return False
 
+    def _marcar_congestion(self, error: Exception):
+        """421 (demasiadas conexiones) y timeouts indican saturación del servidor o del enlace"""
+        if isinstance(error, TimeoutError) or str(error).startswith("421"):
+            self._estado_hilo.congestion = True
+
+    def fue_congestion(self) -> bool:
+        """Indica si el último enviar_archivo de este hilo falló por congestión"""
+        return getattr(self._estado_hilo, "congestion", False)
+
+    def sesiones_maximas(self) -> int:
+        """Envíos simultáneos que admite el pool; más hilos solo esperarían sesión"""
+        return self._pool.max_sesiones
+
+    def _stor(self, ftp: ftplib.FTP, local_path: str, remote_path: str) -> bool:
+        """Sube el archivo reanudando transferencias parciales y verifica lo recibido.
+
+        Solo se reanuda si el servidor ofrece un hash para comprobar el resultado:
+        sin él, un parcial ajeno del mismo tamaño pasaría la verificación.
+        """
+        tamano_local = os.path.getsize(local_path)
+        tamano_remoto = self._tamano_remoto(ftp, remote_path) if self.reanudar else None
+        verificable = self._soporta_hash(ftp)
+
+        offset = 0
+        if tamano_remoto is not None and 0 < tamano_remoto < tamano_local:
+            if verificable:
+                offset = tamano_remoto
+            else:
+                self.logger.info(f"Servidor sin HASH/XCRC, se sube completo en lugar de reanudar: {remote_path}")
+        elif tamano_remoto == tamano_local and verificable:
+            # Posible envío previo completo sin confirmar: no se transfiere si el hash coincide
+            if self._verificar_remoto(ftp, local_path, remote_path, tamano_local):
+                self.logger.info(f"Archivo ya presente en servidor: {remote_path}")
+                return True
+
+        self._transferir(ftp, local_path, remote_path, offset)
+        if self._verificar_remoto(ftp, local_path, remote_path, tamano_local):
+            return True
+        if offset:
+            # Lo que ya estaba en el servidor no correspondía a este archivo: subir completo
+            self.logger.warning(f"Reanudación descartada, reenviando completo: {remote_path}")
+            self._transferir(ftp, local_path, remote_path, 0)
+            return self._verificar_remoto(ftp, local_path, remote_path, tamano_local)
+        return False
+
+    def _transferir(self, ftp: ftplib.FTP, local_path: str, remote_path: str, offset: int):
+        with open(local_path, "rb") as file:
+            if offset:
+                _REANUDACIONES.incrementar()
+                self.logger.info(f"Reanudando {remote_path} desde byte {offset}")
+                file.seek(offset)
+            ftp.storbinary(f"STOR {remote_path}", file, rest=offset or None)
+            _BYTES.incrementar(file.tell() - offset)
+
+    def _tamano_remoto(self, ftp: ftplib.FTP, remote_path: str) -> Optional[int]:
+        """SIZE del archivo remoto (None si no existe o el servidor no lo soporta)"""
+        try:
+            ftp.voidcmd("TYPE I")
+            return ftp.size(remote_path)
+        except ftplib.error_perm:
+            return None
+
+    def _caracteristicas(self, ftp: ftplib.FTP) -> Dict[str, str]:
+        """Extensiones anunciadas por FEAT (se consulta una vez por servidor)"""
+        if self._features is None:
+            features = {}
+            try:
+                for linea in ftp.sendcmd("FEAT").splitlines()[1:-1]:
+                    partes = linea.strip().split(" ", 1)
+                    if partes and partes[0]:
+                        features[partes[0].upper()] = partes[1] if len(partes) > 1 else ""
+            except ftplib.error_perm:
+                pass
+            self._features = features
+        return self._features
+
+    def _soporta_hash(self, ftp: ftplib.FTP) -> bool:
+        """HASH con un algoritmo que se sabe calcular localmente, o XCRC"""
+        if not self.verificar_hash:
+            return False
+        features = self._caracteristicas(ftp)
+        algoritmos = [a.strip().rstrip("*").upper() for a in features.get("HASH", "").split(";")]
+        return "XCRC" in features or any(a in self.ALGORITMOS_HASH for a in algoritmos)
+
+    def _hash_remoto(self, ftp: ftplib.FTP, remote_path: str) -> Optional[Tuple[str, str]]:
+        """(algoritmo, valor) calculado por el servidor vía HASH o XCRC, si existe"""
+        if not self.verificar_hash:
+            return None
+        features = self._caracteristicas(ftp)
+        try:
+            if "HASH" in features:
+                algoritmos = [a.strip() for a in features["HASH"].split(";") if a.strip()]
+                actual = next((a for a in algoritmos if a.endswith("*")), algoritmos[0] if algoritmos else "")
+                if actual.rstrip("*").upper() in self.ALGORITMOS_HASH:
+                    # 213 <algoritmo> <rango> <valor> <ruta>
+                    partes = ftp.sendcmd(f"HASH {remote_path}").split()
+                    return partes[1].upper(), partes[3].lower()
+            if "XCRC" in features:
+                # 250 <crc32 en hexadecimal>
+                valor = ftp.sendcmd(f"XCRC {remote_path}").split()[1].lower()
+                return "CRC32", valor[2:] if valor.startswith("0x") else valor
+        except (ftplib.error_perm, IndexError) as e:
+            self.logger.debug(f"Hash remoto no disponible: {e}")
+        return None
+
+    @classmethod
+    def _hash_local(cls, local_path: str, algoritmo: str) -> str:
+        with open(local_path, "rb") as f:
+            if algoritmo == "CRC32":
+                crc = 0
+                for bloque in iter(lambda: f.read(65536), b""):
+                    crc = zlib.crc32(bloque, crc)
+                return f"{crc:08x}"
+            digest = hashlib.new(cls.ALGORITMOS_HASH[algoritmo])
+            for bloque in iter(lambda: f.read(65536), b""):
+                digest.update(bloque)
+            return digest.hexdigest()
+
+    def _verificar_remoto(self, ftp: ftplib.FTP, local_path: str, remote_path: str, tamano_local: int) -> bool:
+        """Compara tamaño remoto y, si el servidor lo permite, el hash del contenido"""
+        tamano_remoto = self._tamano_remoto(ftp, remote_path)
+        if tamano_remoto is not None and tamano_remoto != tamano_local:
+            self.logger.warning(f"Tamaño remoto {tamano_remoto} != local {tamano_local}: {remote_path}")
+            return False
+        remoto = self._hash_remoto(ftp, remote_path)
+        if remoto is None:
+            return True
+        algoritmo, valor = remoto
+        if algoritmo not in self.ALGORITMOS_HASH and algoritmo != "CRC32":
+            return True
+        coincide = valor.lstrip("0") == self._hash_local(local_path, algoritmo).lstrip("0")
+        if not coincide:
+            self.logger.warning(f"Hash {algoritmo} remoto no coincide: {remote_path}")
+        return coincide
+
     def verificar_conexion(self) -> bool:
         """Implementación de método de interfaz"""
         try:
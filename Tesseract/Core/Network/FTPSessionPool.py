@@ -0,0 +1,168 @@
+# Tesseract/Core/Network/FTPSessionPool.py
+
+import ftplib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional, List, Tuple
+
+class FTPSessionPool:
+    """Pool de sesiones FTP/FTPS autenticadas reutilizables.
+
+    Mantiene vivas las conexiones de control con NOOP y descarta las que
+    fallan o llevan demasiado tiempo inactivas.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Optional[ftplib.FTP]],
+        max_sesiones: int = 3,
+        keepalive: float = 30.0,
+        max_inactividad: float = 300.0,
+        espera_sesion: float = 60.0
+    ):
+        self._factory = factory
+        self.max_sesiones = max_sesiones
+        self.keepalive = keepalive
+        self.max_inactividad = max_inactividad
+        self.espera_sesion = espera_sesion
+        self.logger = logging.getLogger(__name__)
+
+        self._cond = threading.Condition()
+        self._inactivas: List[Tuple[ftplib.FTP, float]] = []  # (sesión, último uso)
+        self._total = 0
+        self._stop_event = threading.Event()
+        self._keepalive_thread = None
+
+    def obtener(self) -> Optional[ftplib.FTP]:
+        """Entrega una sesión viva del pool o crea una nueva si hay cupo"""
+        limite = time.monotonic() + self.espera_sesion
+        while True:
+            with self._cond:
+                while not self._inactivas and self._total >= self.max_sesiones:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        return None
+                    self._cond.wait(restante)
+                if self._inactivas:
+                    ftp, ultimo_uso = self._inactivas.pop()
+                else:
+                    ftp, ultimo_uso = None, 0.0
+                    self._total += 1
+
+            if ftp is None:
+                break
+            # Sesiones recién usadas se entregan sin validar; el resto con NOOP
+            if time.monotonic() - ultimo_uso < self.keepalive or self._noop(ftp):
+                return ftp
+            self._descartar(ftp, ordenado=False)
+
+        # Conexión y login fuera del lock para no bloquear al resto de workers
+        ftp = None
+        try:
+            ftp = self._factory()
+        finally:
+            if ftp is None:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+        if ftp is not None:
+            self._iniciar_keepalive()
+        return ftp
+
+    def liberar(self, ftp: ftplib.FTP, valida: bool = True):
+        """Devuelve la sesión al pool; las sesiones rotas se cierran"""
+        if valida and not self._stop_event.is_set():
+            with self._cond:
+                self._inactivas.append((ftp, time.monotonic()))
+                self._cond.notify()
+        else:
+            self._descartar(ftp, ordenado=valida)
+
+    @contextmanager
+    def sesion(self):
+        ftp = self.obtener()
+        valida = True
+        try:
+            yield ftp
+        except (ftplib.error_temp, ftplib.error_reply, ftplib.error_proto, OSError, EOFError):
+            valida = False
+            raise
+        finally:
+            if ftp is not None:
+                self.liberar(ftp, valida)
+
+    def vaciar(self):
+        """Cierra todas las sesiones inactivas (p. ej. al cambiar de modo TLS)"""
+        with self._cond:
+            inactivas, self._inactivas = self._inactivas, []
+        for ftp, _ in inactivas:
+            self._descartar(ftp)
+
+    def cerrar(self):
+        self._stop_event.set()
+        self.vaciar()
+        if self._keepalive_thread:
+            self._keepalive_thread.join(timeout=3.0)
+            self._keepalive_thread = None
+        self._stop_event.clear()
+
+    def _iniciar_keepalive(self):
+        with self._cond:
+            if self._keepalive_thread and self._keepalive_thread.is_alive():
+                return
+            self._keepalive_thread = threading.Thread(
+                target=self._keepalive_task,
+                name="FTPKeepalive",
+                daemon=True
+            )
+            self._keepalive_thread.start()
+
+    def _keepalive_task(self):
+        while not self._stop_event.wait(self.keepalive):
+            with self._cond:
+                revisar, self._inactivas = self._inactivas, []
+
+            # NOOP fuera del lock: los workers pueden seguir creando sesiones
+            ahora = time.monotonic()
+            vigentes = []
+            for ftp, ultimo_uso in revisar:
+                if ahora - ultimo_uso > self.max_inactividad:
+                    self.logger.debug("Sesión FTP inactiva cerrada")
+                    self._descartar(ftp)
+                elif self._noop(ftp):
+                    vigentes.append((ftp, ultimo_uso))
+                else:
+                    self._descartar(ftp, ordenado=False)
+
+            with self._cond:
+                self._inactivas.extend(vigentes)
+                self._cond.notify_all()
+                if self._total == 0:
+                    # Sin sesiones que mantener: el hilo termina hasta el próximo uso
+                    self._keepalive_thread = None
+                    return
+
+    def _noop(self, ftp: ftplib.FTP) -> bool:
+        try:
+            ftp.voidcmd("NOOP")
+            return True
+        except Exception:
+            return False
+
+    def _descartar(self, ftp: ftplib.FTP, ordenado: bool = True):
+        """Cierra una sesión: QUIT si está sana, cierre directo del socket si no"""
+        with self._cond:
+            self._total = max(0, self._total - 1)
+            self._cond.notify()
+        try:
+            if ordenado:
+                ftp.quit()
+            else:
+                ftp.close()
+        except Exception:
+            try:
+                ftp.close()
+            except Exception:
+                pass
@@ -0,0 +1,301 @@
+# Tesseract/Core/Network/HTTPTransferManager.py
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, List, Optional, Tuple
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote
+import requests
+from requests.adapters import HTTPAdapter
+from Core.System.ErrorHandler import ErrorHandler
+from .IFileTransfer import IFileTransfer
+from .InternetManager import registrar_actividad_red
+
+class HTTPTransferManager(IFileTransfer):
+    """Transporte HTTP(S) con conexiones persistentes, lotes multipart y subida reanudable.
+
+    Protocolo esperado del servidor (relativo a config["url_base"]):
+      POST  /lote                      multipart, un archivo por parte (filename = ruta remota)
+                                       -> {"archivos": {ruta_remota: {"sha256": ...}}}
+      HEAD  /archivos/<ruta>           -> cabecera Upload-Offset (bytes ya recibidos)
+      PATCH /archivos/<ruta>           cuerpo parcial con cabecera Upload-Offset (estilo tus)
+      POST  /archivos/<ruta>/completar -> {"sha256": ...}
+      DELETE /archivos/<ruta>          descarta una subida parcial corrupta
+    El servidor calcula el SHA-256 de lo recibido y se compara con el local.
+    """
+    MAX_REINTENTOS = 3
+    TAMANO_BLOQUE = 1024 * 1024
+    UMBRAL_BLOQUES = 1024 * 1024   # archivos mayores van por subida reanudable
+    MAX_LOTE = 20
+    VENTANA_LOTE = 0.25            # segundos para agrupar envíos concurrentes
+
+    def __init__(self, config: Dict[str, Any], error_handler: ErrorHandler):
+        self.config = config
+        self.error_handler = error_handler
+        self.logger = logging.getLogger(__name__)
+        self.url_base = config["url_base"].rstrip("/")
+        self.timeout = config.get("timeout", 30)
+        self.tamano_bloque = config.get("tamano_bloque", self.TAMANO_BLOQUE)
+        self.umbral_bloques = config.get("umbral_bloques", self.UMBRAL_BLOQUES)
+        self.max_lote = config.get("max_lote", self.MAX_LOTE)
+        self.ventana_lote = config.get("ventana_lote", self.VENTANA_LOTE)
+        conexiones = config.get("max_conexiones", 4)
+
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexiones)
+        self.session.mount("http://", adaptador)
+        self.session.mount("https://", adaptador)
+        self.session.verify = config.get("verificar_ssl", True)
+        if config.get("token"):
+            self.session.headers["Authorization"] = f"Bearer {config['token']}"
+        elif config.get("usuario"):
+            self.session.auth = (config["usuario"], config.get("clave", ""))
+
+        self._conexiones = conexiones
+        self._estado_hilo = threading.local()
+        self._cola = queue.Queue()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._agrupador = None
+        self._stop_event = threading.Event()
+
+    # --- IFileTransfer ---
+
+    def enviar_archivo(self, local_path: str, remote_path: str) -> bool:
+        self._estado_hilo.congestion = False
+        self._estado_hilo.espera = None
+        try:
+            tamano = os.path.getsize(local_path)
+        except OSError as e:
+            self.error_handler.log_error("HTTP-001", f"No se puede leer {local_path}: {e}")
+            return False
+
+        if tamano > self.umbral_bloques:
+            exitoso = self._enviar_por_bloques(local_path, remote_path, tamano)
+        else:
+            # Los envíos concurrentes de archivos pequeños viajan juntos en un lote
+            self._iniciar_agrupador()
+            future = Future()
+            self._cola.put((local_path, remote_path, future))
+            try:
+                exitoso, congestion, espera = future.result(timeout=self.timeout * (self.MAX_REINTENTOS + 1))
+            except Exception as e:
+                self.error_handler.log_error("HTTP-002", f"Envío HTTP sin respuesta: {e}")
+                exitoso, congestion, espera = False, False, None
+            self._estado_hilo.congestion = congestion
+            self._estado_hilo.espera = espera
+
+        if exitoso:
+            self.logger.info(f"Archivo enviado por HTTP: {local_path}")
+            registrar_actividad_red()
+        return exitoso
+
+    def verificar_conexion(self) -> bool:
+        try:
+            respuesta = self.session.head(self.url_base, timeout=self.timeout)
+            return respuesta.status_code < 500
+        except requests.RequestException as e:
+            self.error_handler.log_error("HTTP-003", f"Servidor HTTP inaccesible: {e}")
+            return False
+
+    def fue_congestion(self) -> bool:
+        """Indica si el último envío de este hilo falló por saturación (429/503)"""
+        return getattr(self._estado_hilo, "congestion", False)
+
+    def espera_sugerida(self) -> Optional[float]:
+        """Segundos indicados por el servidor (Retry-After) en la última congestión de este hilo"""
+        return getattr(self._estado_hilo, "espera", None)
+
+    def sesiones_maximas(self) -> int:
+        """Envíos simultáneos que admite el pool de conexiones"""
+        return self._conexiones
+
+    def cerrar(self):
+        with self._lock:
+            self._stop_event.set()
+            agrupador, executor = self._agrupador, self._executor
+            self._agrupador = self._executor = None
+        if agrupador:
+            agrupador.join(timeout=3.0)
+        if executor:
+            executor.shutdown(wait=True)
+        self.session.close()
+
+    # --- Lotes multipart ---
+
+    def _iniciar_agrupador(self):
+        with self._lock:
+            if self._agrupador and self._agrupador.is_alive():
+                return
+            self._stop_event.clear()
+            self._executor = ThreadPoolExecutor(max_workers=self._conexiones, thread_name_prefix="HTTPLote")
+            self._agrupador = threading.Thread(
+                target=self._agrupador_task,
+                args=(self._executor,),
+                name="HTTPAgrupador",
+                daemon=True
+            )
+            self._agrupador.start()
+
+    def _agrupador_task(self, executor: ThreadPoolExecutor):
+        while not self._stop_event.is_set():
+            try:
+                primero = self._cola.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            lote = [primero]
+            limite = time.monotonic() + self.ventana_lote
+            while len(lote) < self.max_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            executor.submit(self._enviar_lote, lote)
+
+        # Detenido: lo que quedó en cola se reporta como fallido (se reintenta luego)
+        while True:
+            try:
+                _, _, future = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            future.set_result((False, False, None))
+
+    def _enviar_lote(self, lote: List[Tuple[str, str, Future]]):
+        resultados = {remoto: False for _, remoto, _ in lote}
+        congestion = False
+        espera = None
+        try:
+            hashes = {remoto: self._hash_local(local) for local, remoto, _ in lote}
+            for intento in range(self.MAX_REINTENTOS):
+                respuesta = self._post_lote(lote, hashes)
+                if respuesta is None or self._es_congestion(respuesta):
+                    congestion = respuesta is not None
+                    espera = self._retry_after(respuesta) if congestion else None
+                    if espera is not None:
+                        # El servidor indicó cuándo volver: lo decide la bandeja, no este bucle
+                        break
+                    time.sleep(2 ** intento)
+                    continue
+                if respuesta.status_code >= 300:
+                    self.error_handler.log_error("HTTP-004", f"Lote rechazado ({respuesta.status_code})")
+                    break
+                congestion = False
+                recibidos = respuesta.json().get("archivos", {})
+                for remoto, esperado in hashes.items():
+                    obtenido = (recibidos.get(remoto) or {}).get("sha256")
+                    resultados[remoto] = obtenido == esperado
+                    if not resultados[remoto]:
+                        self.error_handler.log_error("HTTP-005", f"Hash no coincide en el servidor: {remoto}")
+                break
+        except Exception as e:
+            self.error_handler.log_error("HTTP-004", f"Error enviando lote HTTP: {e}")
+        finally:
+            for _, remoto, future in lote:
+                future.set_result((resultados[remoto], congestion, espera))
+
+    def _post_lote(self, lote: List[Tuple[str, str, Future]], hashes: Dict[str, str]) -> Optional[requests.Response]:
+        archivos = []
+        try:
+            for local, remoto, _ in lote:
+                archivos.append(("archivos", (remoto, open(local, "rb"), "application/octet-stream")))
+            return self.session.post(
+                f"{self.url_base}/lote",
+                files=archivos,
+                data={"sha256": json.dumps(hashes)},
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            self.logger.warning(f"Error de red enviando lote: {e}")
+            return None
+        finally:
+            for _, (_, f, _) in archivos:
+                f.close()
+
+    # --- Subida reanudable por bloques ---
+
+    def _url_archivo(self, remote_path: str) -> str:
+        return f"{self.url_base}/archivos/{quote(remote_path.lstrip('/'))}"
+
+    def _enviar_por_bloques(self, local_path: str, remote_path: str, tamano: int) -> bool:
+        url = self._url_archivo(remote_path)
+        for intento in range(self.MAX_REINTENTOS):
+            try:
+                offset = self._offset_remoto(url)
+                if offset > tamano:
+                    self.session.delete(url, timeout=self.timeout)
+                    offset = 0
+                if offset:
+                    self.logger.info(f"Reanudando {remote_path} desde byte {offset}")
+
+                with open(local_path, "rb") as f:
+                    f.seek(offset)
+                    while offset < tamano:
+                        bloque = f.read(self.tamano_bloque)
+                        respuesta = self.session.patch(
+                            url,
+                            data=bloque,
+                            headers={
+                                "Upload-Offset": str(offset),
+                                "Upload-Length": str(tamano),
+                                "Content-Type": "application/offset+octet-stream"
+                            },
+                            timeout=self.timeout
+                        )
+                        if self._es_congestion(respuesta):
+                            self._estado_hilo.congestion = True
+                            self._estado_hilo.espera = self._retry_after(respuesta)
+                            return False
+                        respuesta.raise_for_status()
+                        offset = int(respuesta.headers.get("Upload-Offset", offset + len(bloque)))
+                        f.seek(offset)
+
+                respuesta = self.session.post(f"{url}/completar", timeout=self.timeout)
+                respuesta.raise_for_status()
+                if respuesta.json().get("sha256") == self._hash_local(local_path):
+                    return True
+                # Copia parcial corrupta: se descarta y se sube completa de nuevo
+                self.error_handler.log_error("HTTP-005", f"Hash no coincide en el servidor: {remote_path}")
+                self.session.delete(url, timeout=self.timeout)
+            except (requests.RequestException, ValueError) as e:
+                self.logger.warning(f"Error en subida por bloques de {remote_path} (intento {intento + 1}): {e}")
+                time.sleep(2 ** intento)
+        return False
+
+    def _offset_remoto(self, url: str) -> int:
+        respuesta = self.session.head(url, timeout=self.timeout)
+        if respuesta.status_code == 404:
+            return 0
+        respuesta.raise_for_status()
+        return int(respuesta.headers.get("Upload-Offset", 0))
+
+    @staticmethod
+    def _es_congestion(respuesta: requests.Response) -> bool:
+        return respuesta.status_code in (429, 503)
+
+    @staticmethod
+    def _retry_after(respuesta: requests.Response) -> Optional[float]:
+        valor = respuesta.headers.get("Retry-After", "")
+        if valor.isdigit():
+            return float(valor)
+        try:
+            fecha = parsedate_to_datetime(valor)
+            return max(0.0, fecha.timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _hash_local(local_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(local_path, "rb") as f:
+            for bloque in iter(lambda: f.read(65536), b""):
+                digest.update(bloque)
+        return digest.hexdigest()
@@ -1,37 +1,149 @@
 # Tesseract/Core/Network/InternetManager.py
 
 import requests
-import time 
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
 from Core.System.ErrorHandler import ErrorHandler
 
+# Señal pasiva compartida: último tráfico de red exitoso (FTP, SMTP, HTTP).
+# time.monotonic() cuenta desde el arranque del equipo: con 0.0 un programa
+# iniciado dentro del ttl se daría por conectado sin sondear
+_ultima_actividad = float("-inf")
+
+def registrar_actividad_red():
+    """Los transportes la llaman tras una transferencia exitosa"""
+    global _ultima_actividad
+    _ultima_actividad = time.monotonic()
+
 class InternetManager:
     TEST_URLS = [
         "http://www.google.com",
         "http://www.cloudflare.com",
         "http://www.amazon.com"
     ]
-    
-    def __init__(self, error_handler: ErrorHandler, timeout=5):
+    TTL_ESTADO = 30.0          # segundos que un resultado se considera vigente
+    INTERVALO_SONDEO = 30.0
+
+    def __init__(self, error_handler: ErrorHandler, timeout=5, urls: List[str] = None,
+                 ttl: float = TTL_ESTADO, intervalo: float = INTERVALO_SONDEO):
         self.error_handler = error_handler
         self.timeout = timeout
+        self.urls = list(urls or self.TEST_URLS)
+        self.ttl = ttl
+        self.intervalo = intervalo
+        self.logger = logging.getLogger(__name__)
+
+        self._session = requests.Session()
+        self._executor = ThreadPoolExecutor(max_workers=len(self.urls), thread_name_prefix="NetProbe")
+        self._cond = threading.Condition()
+        self._estado: Optional[bool] = None
+        self._verificado = float("-inf")
+        self._suscriptores: List[Callable[[bool], None]] = []
+        self._stop_event = threading.Event()
+        self._sondeo_solicitado = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        """Arranca el monitor en segundo plano (idempotente)"""
+        with self._cond:
+            if self._hilo and self._hilo.is_alive():
+                return
+            self._stop_event.clear()
+            self._hilo = threading.Thread(target=self._monitor_task, name="InternetMonitor", daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._stop_event.set()
+        self._sondeo_solicitado.set()
+        if self._hilo:
+            self._hilo.join(timeout=self.timeout + 1)
+            self._hilo = None
+
+    def suscribir(self, callback: Callable[[bool], None]):
+        """callback(conectado) se invoca en cada cambio de estado"""
+        with self._cond:
+            self._suscriptores.append(callback)
 
     def is_connected(self) -> bool:
-        """Verifica conectividad con múltiples endpoints"""
-        for url in self.TEST_URLS:
-            try:
-                response = requests.head(url, timeout=self.timeout)
-                if response.status_code < 500:
-                    return True
-            except:
-                continue
-        self.error_handler.log_evento("NET-001", "Sin conexión a internet")
-        return False
-        
+        """Respuesta inmediata desde el estado en caché.
+
+        Solo la primera consulta, sin estado previo, espera al primer sondeo
+        (como máximo un timeout, pues los endpoints se prueban en paralelo).
+        """
+        self.iniciar()
+        with self._cond:
+            if self._estado is None:
+                self._sondeo_solicitado.set()
+                self._cond.wait_for(lambda: self._estado is not None, timeout=self.timeout + 1)
+            return bool(self._estado)
+
+    def solicitar_sondeo(self):
+        """Fuerza un sondeo activo (p. ej. tras un fallo de transferencia)"""
+        with self._cond:
+            self._verificado = float("-inf")
+        self._sondeo_solicitado.set()
+
     def wait_for_connection(self, max_retries=10, base_delay=3) -> bool:
         """Espera hasta que se restaure la conexión"""
-        for intento in range(max_retries):
-            if self.is_connected():
-                return True
-            delay = base_delay * (2 ** intento)
-            time.sleep(min(delay, 60))  # Máximo 60s entre reintentos
-        return False
\ No newline at end of file
+        # Mismo tiempo máximo que el esquema de reintentos original, pero despierta
+        # en cuanto el monitor detecta la conexión
+        limite = time.monotonic() + sum(min(base_delay * (2 ** i), 60) for i in range(max_retries))
+        self.iniciar()
+        with self._cond:
+            while not self._estado:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._sondeo_solicitado.set()
+                self._cond.wait(min(restante, self.intervalo))
+            return True
+
+    def _monitor_task(self):
+        while not self._stop_event.is_set():
+            self._sondeo_solicitado.clear()
+            ahora = time.monotonic()
+            if ahora - _ultima_actividad < self.ttl:
+                # Tráfico reciente exitoso: no hace falta sondear
+                self._actualizar_estado(True)
+            elif ahora - self._verificado >= self.ttl or self._estado is None:
+                self._actualizar_estado(self._sondear())
+            self._sondeo_solicitado.wait(self.intervalo)
+
+    def _sondear(self) -> bool:
+        """HEAD en paralelo a todos los endpoints; gana la primera respuesta válida"""
+        futuros = [self._executor.submit(self._probar, url) for url in self.urls]
+        try:
+            for futuro in as_completed(futuros, timeout=self.timeout + 1):
+                if futuro.result():
+                    return True
+        except Exception:
+            pass
+        return False
+
+    def _probar(self, url: str) -> bool:
+        try:
+            response = self._session.head(url, timeout=self.timeout)
+            return response.status_code < 500
+        except requests.RequestException:
+            return False
+
+    def _actualizar_estado(self, conectado: bool):
+        with self._cond:
+            anterior = self._estado
+            self._estado = conectado
+            self._verificado = time.monotonic()
+            suscriptores = list(self._suscriptores) if anterior != conectado else []
+            self._cond.notify_all()
+        if anterior != conectado:
+            if not conectado:
+                self.error_handler.log_evento("Sin conexión a internet", "NET-001")
+            elif anterior is not None:
+                self.error_handler.log_evento("Conexión a internet restablecida", "NET-002")
+        for callback in suscriptores:
+            try:
+                callback(conectado)
+            except Exception as e:
+                self.logger.error(f"Error en suscriptor de conectividad: {e}")
@@ -0,0 +1,252 @@
+# Tesseract/Core/Network/SMSGateway.py
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Hashable, List, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from Core.System.ErrorHandler import ErrorHandler
+from Core.System.TokenBucket import TokenBucket
+from Core.System.AlertDispatcher import heredar_despacho, en_despacho
+
+# Alfabeto GSM 03.38 básico (1 septeto por carácter) y extensión (2 septetos)
+GSM7_BASICO = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENSION = set("^{}\\[~]|€\f")
+
+def es_gsm7(texto: str) -> bool:
+    return all(c in GSM7_BASICO or c in GSM7_EXTENSION for c in texto)
+
+def longitud_sms(texto: str) -> Tuple[int, int, int]:
+    """(unidades usadas, unidades por segmento simple, por segmento concatenado)"""
+    if es_gsm7(texto):
+        return sum(2 if c in GSM7_EXTENSION else 1 for c in texto), 160, 153
+    # UCS-2: los caracteres fuera del BMP ocupan dos unidades
+    return sum(2 if ord(c) > 0xFFFF else 1 for c in texto), 70, 67
+
+def segmentos(texto: str) -> int:
+    unidades, simple, concatenado = longitud_sms(texto)
+    if unidades <= simple:
+        return 1
+    return -(-unidades // concatenado)
+
+def empaquetar_lineas(lineas: List[str], max_segmentos: int = 10) -> List[str]:
+    """Agrupa líneas completas en el menor número de mensajes de hasta max_segmentos.
+
+    Una línea nunca se parte entre dos mensajes salvo que por sí sola exceda el
+    tamaño máximo de un mensaje.
+    """
+    mensajes = []
+    actual = ""
+    for linea in lineas:
+        linea = linea.rstrip("\r\n")
+        if not linea:
+            continue
+        for trozo in _partir_linea(linea, max_segmentos):
+            candidato = f"{actual}\n{trozo}" if actual else trozo
+            if actual and segmentos(candidato) > max_segmentos:
+                mensajes.append(actual)
+                candidato = trozo
+            actual = candidato
+    if actual:
+        mensajes.append(actual)
+    return mensajes
+
+def _partir_linea(linea: str, max_segmentos: int) -> List[str]:
+    if segmentos(linea) <= max_segmentos:
+        return [linea]
+    gsm = es_gsm7(linea)
+    capacidad = max_segmentos * (153 if gsm else 67)
+    trozos, actual, usadas = [], [], 0
+    for c in linea:
+        if gsm:
+            unidades = 2 if c in GSM7_EXTENSION else 1
+        else:
+            unidades = 2 if ord(c) > 0xFFFF else 1
+        if usadas + unidades > capacidad:
+            trozos.append("".join(actual))
+            actual, usadas = [], 0
+        actual.append(c)
+        usadas += unidades
+    if actual:
+        trozos.append("".join(actual))
+    return trozos
+
+def _fallo_al_conectar(error: requests.RequestException) -> bool:
+    """True si la petición no llegó al servidor, de modo que reintentar no duplica el SMS"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError) or not error.args:
+        return False
+    motivo = getattr(error.args[0], "reason", error.args[0])
+    return isinstance(motivo, NewConnectionError)
+
+class TwilioHTTPClient:
+    """Cliente REST mínimo de Twilio sobre una única sesión HTTP reutilizada.
+
+    'twilio_base_url' permite apuntar a un servidor local compatible en pruebas.
+    """
+    BASE_URL = "https://api.twilio.com"
+    MAX_REINTENTOS = 3
+
+    def __init__(self, config: dict, conexiones: int = 4):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        self.base_url = config.get("twilio_base_url", self.BASE_URL).rstrip("/")
+        self.timeout = config.get("timeout_http", 15)
+        self.session = requests.Session()
+        self.session.auth = (config["account_sid"], config["auth_token"])
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexiones)
+        self.session.mount("http://", adaptador)
+        self.session.mount("https://", adaptador)
+        self._url = f"{self.base_url}/2010-04-01/Accounts/{config['account_sid']}/Messages.json"
+
+    def enviar(self, cuerpo: str, destino: str) -> bool:
+        for intento in range(self.MAX_REINTENTOS):
+            try:
+                respuesta = self.session.post(
+                    self._url,
+                    data={"From": self.config["numero_twilio"], "To": destino, "Body": cuerpo},
+                    timeout=self.timeout
+                )
+            except requests.RequestException as e:
+                if not _fallo_al_conectar(e):
+                    # Sin respuesta (p. ej. ReadTimeout) Twilio pudo haber creado el mensaje
+                    self.logger.error(f"Error de red enviando SMS, no se reintenta: {e}")
+                    return False
+                self.logger.warning(f"Error de red enviando SMS (intento {intento + 1}): {e}")
+                time.sleep(2 ** intento)
+                continue
+            if respuesta.status_code in (200, 201):
+                return True
+            if respuesta.status_code == 429 or respuesta.status_code >= 500:
+                # Límite del proveedor o falla temporal: respetar Retry-After
+                espera = respuesta.headers.get("Retry-After")
+                try:
+                    espera = float(espera)
+                except (TypeError, ValueError):
+                    espera = 2 ** intento
+                self.logger.warning(f"Twilio respondió {respuesta.status_code}, reintento en {espera:.0f}s")
+                time.sleep(min(espera, 60))
+                continue
+            self.logger.error(f"Twilio rechazó el SMS ({respuesta.status_code}): {respuesta.text[:200]}")
+            return False
+        return False
+
+    def cerrar(self):
+        self.session.close()
+
+class SMSPipeline:
+    """Cola de SMS con empaquetado por destino, límite de tasa y envío concurrente.
+
+    Las líneas encoladas para un mismo destino y una misma clave (p. ej. el
+    archivo de origen) dentro de la ventana se empaquetan en mensajes que
+    aprovechan segmentos completos; sin clave, cada llamada se empaqueta sola
+    y recibe su propio resultado. La cubeta de tokens cuenta segmentos, que
+    es como el proveedor mide el caudal.
+    """
+
+    def __init__(self, cliente: TwilioHTTPClient, error_handler: ErrorHandler = None,
+                 segmentos_por_segundo: float = 1.0, rafaga: int = 10, concurrencia: int = 4,
+                 ventana: float = 2.0, max_segmentos: int = 10, max_cola: int = 500):
+        self.cliente = cliente
+        self.error_handler = error_handler
+        self.ventana = ventana
+        self.max_segmentos = max_segmentos
+        self.logger = logging.getLogger(__name__)
+        self._cubeta = TokenBucket(segmentos_por_segundo, max(rafaga, max_segmentos))
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._executor = ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix="SMSWorker")
+        self._stop_event = threading.Event()
+        self._hilo = threading.Thread(target=self._empaquetador_task, name="SMSEmpaquetador", daemon=True)
+        self._hilo.start()
+
+    def encolar(self, destino: str, lineas: List[str], clave: Hashable = None) -> Future:
+        """Encola líneas para un destino; el Future indica si todas se entregaron"""
+        future = Future()
+        try:
+            # Se recuerda si lo encoló el envío de una alerta para que sus errores no alerten
+            self._cola.put_nowait((destino, clave, lineas, future, en_despacho()))
+        except queue.Full:
+            self._log_error("SMS-QUEUE", "Cola de SMS llena, mensaje descartado")
+            future.set_result(False)
+        return future
+
+    def _empaquetador_task(self):
+        while not self._stop_event.is_set():
+            try:
+                primero = self._cola.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            lote = [primero]
+            limite = time.monotonic() + self.ventana
+            while True:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            # Solo se mezclan líneas del mismo destino y la misma clave
+            grupos: Dict[Tuple[str, Hashable], List[Tuple[List[str], Future, bool]]] = {}
+            for destino, clave, lineas, future, alerta in lote:
+                grupo = (destino, clave if clave is not None else id(future))
+                grupos.setdefault(grupo, []).append((lineas, future, alerta))
+            for (destino, _), items in grupos.items():
+                self._despachar_destino(destino, items)
+
+    def _despachar_destino(self, destino: str, items: List[Tuple[List[str], Future, bool]]):
+        lineas = [linea for lineas_item, _, _ in items for linea in lineas_item]
+        mensajes = empaquetar_lineas(lineas, self.max_segmentos)
+        enviar = heredar_despacho(self._enviar, any(alerta for _, _, alerta in items))
+        envios = [self._executor.submit(enviar, cuerpo, destino) for cuerpo in mensajes]
+        self.logger.info(f"{len(lineas)} línea(s) para {destino} empaquetadas en {len(mensajes)} SMS")
+
+        pendientes = [len(envios)]
+        resultado = [True]
+        lock = threading.Lock()
+
+        def _completado(envio: Future):
+            with lock:
+                resultado[0] = resultado[0] and not envio.cancelled() and envio.exception() is None and envio.result()
+                pendientes[0] -= 1
+                terminado = pendientes[0] == 0
+            if terminado:
+                for _, future, _ in items:
+                    future.set_result(resultado[0])
+
+        if not envios:
+            for _, future, _ in items:
+                future.set_result(True)
+        for envio in envios:
+            envio.add_done_callback(_completado)
+
+    def _enviar(self, cuerpo: str, destino: str) -> bool:
+        if not self._cubeta.esperar(segmentos(cuerpo), detener=self._stop_event):
+            return False
+        exitoso = self.cliente.enviar(cuerpo, destino)
+        if exitoso:
+            self.logger.info(f"SMS enviado a {destino} ({segmentos(cuerpo)} segmento(s))")
+        else:
+            self._log_error("SMS-SEND", f"Error enviando SMS a {destino}")
+        return exitoso
+
+    def detener(self):
+        self._stop_event.set()
+        self._hilo.join(timeout=3.0)
+        self._executor.shutdown(wait=True)
+        self.cliente.cerrar()
+
+    def _log_error(self, codigo: str, contexto: str):
+        if self.error_handler:
+            self.error_handler.log_error(codigo, contexto)
+        else:
+            self.logger.error(f"{codigo}: {contexto}")
@@ -0,0 +1,122 @@
+# Tesseract/Core/Network/StreamingMail.py
+
+import base64
+import os
+import smtplib
+import uuid
+from email.header import Header
+from email.utils import formataddr, formatdate, make_msgid, encode_rfc2231, parseaddr
+from typing import Iterator, List, Tuple
+
+# 57 bytes de entrada = una línea base64 de 76 caracteres; el bloque es múltiplo exacto
+BLOQUE_LECTURA = 57 * 1024
+CRLF = "\r\n"
+
+class MensajeStreaming:
+    """Mensaje MIME multipart/mixed que se genera por bloques leyendo los adjuntos de disco.
+
+    La memoria usada es constante (un bloque) sin importar el tamaño de los adjuntos.
+    """
+
+    def __init__(self, remitente: str, destinatarios: List[str], asunto: str,
+                 adjuntos: List[Tuple[str, str]]):
+        self.remitente = remitente
+        self.destinatarios = destinatarios
+        self.asunto = asunto
+        self.adjuntos = adjuntos  # (nombre mostrado, ruta en disco)
+        self.boundary = f"=_tesseract_{uuid.uuid4().hex}"
+
+    @staticmethod
+    def _direccion(valor: str) -> str:
+        """Dirección con el nombre visible codificado (RFC 2047) si no es ASCII"""
+        return formataddr(parseaddr(valor), charset="utf-8")
+
+    def _encabezados(self) -> bytes:
+        # Todo encabezado se codifica a ASCII; los plegados usan CRLF como el resto del mensaje
+        lineas = [
+            f"From: {self._direccion(self.remitente)}",
+            f"To: {', '.join(self._direccion(d) for d in self.destinatarios)}",
+            f"Subject: {Header(self.asunto, 'utf-8').encode(linesep=CRLF)}",
+            f"Date: {formatdate(localtime=True)}",
+            f"Message-ID: {make_msgid()}",
+            "MIME-Version: 1.0",
+            f'Content-Type: multipart/mixed; boundary="{self.boundary}"',
+            "",
+        ]
+        return ("\r\n".join(lineas) + "\r\n").encode("ascii")
+
+    @staticmethod
+    def _disposicion(nombre: str) -> str:
+        try:
+            nombre.encode("ascii")
+        except UnicodeEncodeError:
+            # RFC 2231: filename*=utf-8''<bytes %-codificados>
+            return f"attachment; filename*={encode_rfc2231(nombre, 'utf-8')}"
+        escapado = nombre.replace("\\", "\\\\").replace('"', '\\"')
+        return f'attachment; filename="{escapado}"'
+
+    def bloques(self) -> Iterator[bytes]:
+        yield self._encabezados()
+        for nombre, ruta in self.adjuntos:
+            yield (
+                f"--{self.boundary}\r\n"
+                "Content-Type: application/octet-stream\r\n"
+                "Content-Transfer-Encoding: base64\r\n"
+                f"Content-Disposition: {self._disposicion(nombre)}\r\n"
+                "\r\n"
+            ).encode("ascii")
+            with open(ruta, "rb") as f:
+                for bloque in iter(lambda: f.read(BLOQUE_LECTURA), b""):
+                    yield base64.encodebytes(bloque).replace(b"\n", b"\r\n")
+        yield f"--{self.boundary}--\r\n".encode("ascii")
+
+def tamano_estimado(adjuntos: List[Tuple[str, str]]) -> int:
+    """Tamaño aproximado del mensaje codificado (para SIZE de ESMTP)"""
+    total = 0
+    for _, ruta in adjuntos:
+        crudo = os.path.getsize(ruta)
+        total += (crudo + 2) // 3 * 4 + (crudo // 57 + 1) * 2 + 256
+    return total + 1024
+
+def enviar_streaming(server: smtplib.SMTP, mensaje: MensajeStreaming):
+    """MAIL/RCPT/DATA enviando el cuerpo por bloques al canal de datos SMTP.
+
+    Los bloques nunca empiezan una línea con '.', por lo que no requieren
+    dot-stuffing (base64 y encabezados generados aquí). Cualquier error una
+    vez aceptado DATA deja la sesión en un estado desconocido: se cierra (la
+    conexión no debe reutilizarse) y se propaga el error.
+    """
+    server.ehlo_or_helo_if_needed()
+    opciones = []
+    if server.has_extn("size"):
+        opciones.append(f"size={tamano_estimado(mensaje.adjuntos)}")
+
+    code, resp = server.mail(mensaje.remitente, opciones)
+    if code != 250:
+        server._rset()
+        raise smtplib.SMTPSenderRefused(code, resp, mensaje.remitente)
+
+    rechazados = {}
+    for destinatario in mensaje.destinatarios:
+        code, resp = server.rcpt(destinatario)
+        if code not in (250, 251):
+            rechazados[destinatario] = (code, resp)
+    if len(rechazados) == len(mensaje.destinatarios):
+        server._rset()
+        raise smtplib.SMTPRecipientsRefused(rechazados)
+
+    code, resp = server.docmd("DATA")
+    if code != 354:
+        server._rset()
+        raise smtplib.SMTPDataError(code, resp)
+    try:
+        for bloque in mensaje.bloques():
+            server.send(bloque)
+        server.send(b".\r\n")
+        code, resp = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, resp)
+    except Exception:
+        server.close()
+        raise
+    return rechazados
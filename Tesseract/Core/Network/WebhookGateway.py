@@ -0,0 +1,104 @@
+# Tesseract/Core/Network/WebhookGateway.py
+
+import logging
+import queue
+import random
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Dict, List, Any
+import requests
+from requests.adapters import HTTPAdapter
+
+class WebhookEndpoint:
+    """Envía alertas en lotes JSON a un endpoint HTTP.
+
+    Un hilo por endpoint toma lo que haya en cola (sin esperar ventanas), así
+    una alerta aislada sale en un solo viaje de red y una ráfaga se agrupa en
+    pocas peticiones. La sesión HTTP mantiene la conexión viva entre envíos.
+    """
+    MAX_LOTE = 50
+    MAX_REINTENTOS = 4
+    PAUSA_BASE = 0.5
+    PAUSA_MAXIMA = 30.0
+
+    def __init__(self, url: str, session: requests.Session, headers: Dict[str, str] = None,
+                 timeout: float = 5.0, max_cola: int = 1000, origen: str = ""):
+        self.url = url
+        self.session = session
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.origen = origen
+        self.logger = logging.getLogger(__name__)
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._stop_event = threading.Event()
+        self._hilo = threading.Thread(target=self._envio_task, name=f"Webhook-{url}", daemon=True)
+        self._hilo.start()
+
+    def encolar(self, mensaje: str, destino: str = None) -> Future:
+        future = Future()
+        alerta = {
+            "mensaje": mensaje,
+            "destino": destino,
+            "timestamp": datetime.now().isoformat(timespec="milliseconds")
+        }
+        try:
+            self._cola.put_nowait((alerta, future))
+        except queue.Full:
+            self.logger.warning(f"Cola de webhook llena ({self.url}), alerta descartada")
+            future.set_result(False)
+        return future
+
+    def _envio_task(self):
+        while not self._stop_event.is_set():
+            try:
+                primero = self._cola.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            lote = [primero]
+            while len(lote) < self.MAX_LOTE:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            exitoso = self._post([alerta for alerta, _ in lote])
+            for _, future in lote:
+                future.set_result(exitoso)
+
+    def _post(self, alertas: List[Dict[str, Any]]) -> bool:
+        cuerpo = {"origen": self.origen, "alertas": alertas}
+        for intento in range(self.MAX_REINTENTOS):
+            espera = None
+            try:
+                respuesta = self.session.post(self.url, json=cuerpo, headers=self.headers, timeout=self.timeout)
+                if respuesta.status_code < 300:
+                    return True
+                if respuesta.status_code != 429 and respuesta.status_code < 500:
+                    self.logger.error(f"Webhook {self.url} rechazó el lote ({respuesta.status_code})")
+                    return False
+                espera = respuesta.headers.get("Retry-After")
+                self.logger.warning(f"Webhook {self.url} respondió {respuesta.status_code}")
+            except requests.RequestException as e:
+                self.logger.warning(f"Error enviando webhook {self.url}: {e}")
+            if intento == self.MAX_REINTENTOS - 1:
+                break
+            try:
+                espera = float(espera)
+            except (TypeError, ValueError):
+                # Backoff exponencial con jitter
+                espera = random.uniform(0, min(self.PAUSA_MAXIMA, self.PAUSA_BASE * (2 ** intento)))
+            if self._stop_event.wait(min(espera, self.PAUSA_MAXIMA)):
+                break
+        return False
+
+    def detener(self):
+        self._stop_event.set()
+        self._hilo.join(timeout=3.0)
+
+def crear_sesion(conexiones: int = 4) -> requests.Session:
+    """Sesión HTTP con pool de conexiones keep-alive compartida por los endpoints"""
+    session = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=conexiones, pool_maxsize=conexiones)
+    session.mount("http://", adaptador)
+    session.mount("https://", adaptador)
+    return session
@@ -0,0 +1,100 @@
+# Tesseract/Core/System/AlertAggregator.py
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+class AlertAggregator:
+    """Agrupa alertas por (código, medidor) en ventanas de tiempo.
+
+    La primera alerta de un grupo sale de inmediato; las siguientes dentro de
+    la ventana se acumulan y al cerrarla se emite un único resumen. Mientras la
+    tormenta continúe se abre una ventana nueva tras cada resumen.
+    """
+
+    def __init__(self, emitir: Callable[[str], None], ventana: float = 60.0):
+        self.emitir = emitir
+        self.ventana = ventana
+        self.logger = logging.getLogger(__name__)
+        self._cond = threading.Condition()
+        self._grupos: Dict[Tuple[str, Optional[str]], Dict] = {}
+        self._detener = False
+        self._hilo = None
+
+    def agregar(self, codigo: str, mensaje: str, medidor: str = None):
+        """Nunca bloquea más que la actualización del grupo"""
+        if self.ventana <= 0:
+            self.emitir(mensaje)
+            return
+        clave = (codigo, medidor)
+        with self._cond:
+            grupo = self._grupos.get(clave)
+            if grupo is None:
+                self._grupos[clave] = {"cierre": time.monotonic() + self.ventana, "cuenta": 0, "ultimo": None}
+                inmediato = True
+            else:
+                grupo["cuenta"] += 1
+                grupo["ultimo"] = mensaje
+                inmediato = False
+            self._iniciar_hilo()
+            self._cond.notify()
+        if inmediato:
+            self.emitir(mensaje)
+
+    def _iniciar_hilo(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener = False
+            self._hilo = threading.Thread(target=self._cierre_task, name="AlertAggregator", daemon=True)
+            self._hilo.start()
+
+    def _resumen(self, clave: Tuple[str, Optional[str]], grupo: Dict) -> str:
+        codigo, medidor = clave
+        origen = f" [{medidor}]" if medidor else ""
+        return (f"RESUMEN KER-{codigo}{origen}: {grupo['cuenta']} alerta(s) más en "
+                f"{self.ventana:g}s | última: {grupo['ultimo']}")
+
+    def _cerrar_vencidos(self, forzar: bool = False):
+        """Cierra las ventanas vencidas; retorna (resúmenes, próximo cierre)"""
+        ahora = time.monotonic()
+        resumenes = []
+        for clave in list(self._grupos):
+            grupo = self._grupos[clave]
+            if not forzar and grupo["cierre"] > ahora:
+                continue
+            if grupo["cuenta"]:
+                resumenes.append(self._resumen(clave, grupo))
+            if grupo["cuenta"] and not forzar:
+                # La tormenta sigue: nueva ventana sin alerta inmediata
+                self._grupos[clave] = {"cierre": ahora + self.ventana, "cuenta": 0, "ultimo": None}
+            else:
+                del self._grupos[clave]
+        proximo = min((g["cierre"] for g in self._grupos.values()), default=None)
+        return resumenes, proximo
+
+    def _cierre_task(self):
+        while True:
+            with self._cond:
+                resumenes, proximo = self._cerrar_vencidos()
+                if not resumenes:
+                    if self._detener:
+                        return
+                    self._cond.wait(None if proximo is None else max(0.0, proximo - time.monotonic()))
+                    continue
+            for resumen in resumenes:
+                try:
+                    self.emitir(resumen)
+                except Exception as e:
+                    self.logger.error(f"Error emitiendo resumen de alertas: {e}")
+
+    def detener(self):
+        """Emite los resúmenes abiertos y detiene el hilo de cierre"""
+        with self._cond:
+            resumenes, _ = self._cerrar_vencidos(forzar=True)
+            self._detener = True
+            self._cond.notify_all()
+            hilo = self._hilo
+        for resumen in resumenes:
+            self.emitir(resumen)
+        if hilo:
+            hilo.join(timeout=2.0)
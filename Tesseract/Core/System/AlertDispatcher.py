@@ -0,0 +1,161 @@
+# Tesseract/Core/System/AlertDispatcher.py
+
+import logging
+import threading
+import functools
+from collections import deque
+from typing import Callable, Dict, List
+
+POLITICA_DESCARTAR_NUEVA = "descartar_nueva"
+POLITICA_DESCARTAR_ANTIGUA = "descartar_antigua"
+POLITICA_COALESCER = "coalescer"  # agrupa mensajes idénticos; si aún no hay cupo descarta la más antigua
+
+# Marca de los hilos que trabajan para el envío de una alerta, incluidos aquellos
+# en los que el notificador delega (fan-out, workers SMS): sus errores no alertan
+_despacho = threading.local()
+
+def en_despacho() -> bool:
+    return getattr(_despacho, "activo", False)
+
+def heredar_despacho(funcion: Callable, activo: bool = None) -> Callable:
+    """Envuelve 'funcion' para ejecutarla en otro hilo con la marca de despacho.
+
+    Por omisión se hereda la del hilo que llama; 'activo' la fija explícitamente
+    (p. ej. según quién encoló el trabajo).
+    """
+    if activo is None:
+        activo = en_despacho()
+    if not activo:
+        return funcion
+
+    @functools.wraps(funcion)
+    def envuelta(*args, **kwargs):
+        anterior = en_despacho()
+        _despacho.activo = True
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            _despacho.activo = anterior
+    return envuelta
+
+class _ColaCanal:
+    """Cola acotada de un notificador con su propio hilo de envío"""
+
+    def __init__(self, canal: object, nombre: str, capacidad: int, politica: str):
+        self.canal = canal
+        self.nombre = nombre
+        self.capacidad = max(1, capacidad)
+        self.politica = politica
+        self.logger = logging.getLogger(__name__)
+        self._cond = threading.Condition()
+        self._pendientes = deque()  # [mensaje, repeticiones]
+        self._descartadas = 0
+        self._detener = False
+        self._hilo = threading.Thread(target=self._worker_task, name=nombre, daemon=True)
+        self._hilo.start()
+
+    def encolar(self, mensaje: str) -> bool:
+        """Nunca bloquea: aplica la política de la cola si no hay cupo"""
+        with self._cond:
+            if self._detener:
+                return False
+            if self.politica == POLITICA_COALESCER:
+                for entrada in self._pendientes:
+                    if entrada[0] == mensaje:
+                        entrada[1] += 1
+                        return True
+            if len(self._pendientes) >= self.capacidad:
+                self._descartadas += 1
+                if self.politica == POLITICA_DESCARTAR_NUEVA:
+                    return False
+                self._pendientes.popleft()
+            self._pendientes.append([mensaje, 1])
+            self._cond.notify()
+            return True
+
+    @property
+    def descartadas(self) -> int:
+        with self._cond:
+            return self._descartadas
+
+    def detener(self, timeout: float):
+        with self._cond:
+            self._detener = True
+            self._cond.notify_all()
+        self._hilo.join(timeout)
+
+    def _worker_task(self):
+        _despacho.activo = True
+        informadas = 0
+        while True:
+            with self._cond:
+                while not self._pendientes and not self._detener:
+                    self._cond.wait()
+                if not self._pendientes:
+                    return
+                mensaje, repeticiones = self._pendientes.popleft()
+                descartadas = self._descartadas - informadas
+                informadas = self._descartadas
+
+            if repeticiones > 1:
+                mensaje = f"{mensaje}  (repetido {repeticiones} veces)"
+            if descartadas:
+                mensaje = f"{mensaje}  [+{descartadas} alertas descartadas por saturación]"
+            try:
+                self.canal.enviar_alerta(mensaje)
+            except Exception as e:
+                self.logger.error(f"Error en notificador {self.nombre}: {e}")
+
+class AlertDispatcher:
+    """Despacho asíncrono de alertas hacia los notificadores externos.
+
+    Cada notificador tiene una cola acotada y un hilo propio, de modo que un
+    canal lento (Twilio, SMTP) no retrasa a los demás ni a quien registró el
+    error: despachar() solo encola.
+    """
+
+    def __init__(self, capacidad: int = 100, politica: str = POLITICA_COALESCER):
+        self.capacidad = capacidad
+        self.politica = politica
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._colas: List[_ColaCanal] = []
+
+    def registrar_canal(self, canal: object, capacidad: int = None, politica: str = None):
+        if not hasattr(canal, 'enviar_alerta'):
+            self.logger.warning(f"Notificador sin enviar_alerta ignorado: {canal!r}")
+            return
+        with self._lock:
+            nombre = f"Alertas-{len(self._colas) + 1}"
+            self._colas.append(_ColaCanal(
+                canal,
+                nombre,
+                capacidad or self.capacidad,
+                politica or self.politica
+            ))
+
+    def despachar(self, mensaje: str):
+        """Encola la alerta en todos los canales sin esperar el envío"""
+        # Errores producidos por los propios notificadores no generan nuevas alertas
+        if self.en_hilo_despacho():
+            return
+        with self._lock:
+            colas = list(self._colas)
+        for cola in colas:
+            if not cola.encolar(mensaje):
+                self.logger.debug(f"Alerta descartada en {cola.nombre} (cola llena)")
+
+    def en_hilo_despacho(self) -> bool:
+        """Si el hilo actual envía una alerta (directamente o por delegación)"""
+        return en_despacho()
+
+    def descartadas(self) -> Dict[str, int]:
+        with self._lock:
+            return {cola.nombre: cola.descartadas for cola in self._colas}
+
+    def detener(self, timeout: float = 5.0):
+        """Envía lo pendiente (con el límite de tiempo dado) y detiene los hilos"""
+        with self._lock:
+            colas, self._colas = self._colas, []
+        for cola in colas:
+            cola.detener(timeout)
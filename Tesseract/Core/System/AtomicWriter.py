@@ -0,0 +1,146 @@
+# Tesseract/Core/System/AtomicWriter.py
+
+import os
+import logging
+import threading
+from typing import Dict, List
+from Core.System.ErrorHandler import ErrorHandler
+
+def _fsync_directorio(directorio: str):
+    """Persiste la entrada del directorio tras un rename (no disponible en Windows)"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directorio or ".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def ruta_temporal(ruta: str) -> str:
+    directorio, nombre = os.path.split(ruta)
+    return os.path.join(directorio, f".{nombre}.tmp")
+
+def escribir_atomico(ruta: str, contenido: str, encoding: str = "utf-8"):
+    """Escribe en un temporal, fsync, rename y fsync del directorio.
+
+    El archivo final queda completo o no existe; nunca truncado.
+    """
+    temporal = ruta_temporal(ruta)
+    try:
+        with open(temporal, "w", encoding=encoding) as f:
+            f.write(contenido)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except OSError:
+            pass
+        raise
+    _fsync_directorio(os.path.dirname(ruta))
+
+class AtomicWriter:
+    """Escritura atómica de archivos pendientes con diario de intenciones.
+
+    Cada archivo pasa por INICIO -> FIN (rename hecho) -> OK (registrado por el
+    consumidor). Al arrancar solo se revisan las entradas abiertas del diario, no
+    todo el directorio. Compactar conserva las intenciones aún abiertas.
+    """
+    INICIO = "INICIO"
+    FIN = "FIN"
+    OK = "OK"
+
+    def __init__(self, journal_path: str, error_handler: ErrorHandler = None):
+        self.journal_path = journal_path
+        self.error_handler = error_handler
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._abiertos: Dict[str, str] = {}   # ruta -> último estado sin confirmar
+        directorio = os.path.dirname(journal_path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+    def escribir(self, ruta: str, contenido: str, encoding: str = "utf-8") -> bool:
+        """Escribe el archivo de forma atómica dejando constancia en el diario"""
+        try:
+            self._anotar(self.INICIO, ruta)
+            escribir_atomico(ruta, contenido, encoding)
+            self._anotar(self.FIN, ruta)
+            return True
+        except Exception as e:
+            with self._lock:
+                self._abiertos.pop(ruta, None)
+            self._log_error("FILE-ATOMIC", f"Error escribiendo {ruta}: {e}")
+            return False
+
+    def confirmar(self, ruta: str):
+        """El consumidor ya registró el archivo; la intención queda cerrada"""
+        try:
+            self._anotar(self.OK, ruta)
+        except OSError as e:
+            self._log_error("FILE-JOURNAL", f"Error actualizando diario: {e}")
+
+    def recuperar(self) -> List[str]:
+        """Limpia escrituras interrumpidas y retorna archivos completos sin confirmar.
+
+        Los retornados quedan abiertos hasta que el consumidor los confirme.
+        """
+        estados = {}
+        with self._lock:
+            if not os.path.exists(self.journal_path):
+                return []
+            with open(self.journal_path, "r", encoding="utf-8", errors="replace") as f:
+                for linea in f:
+                    partes = linea.rstrip("\n").split("\t", 1)
+                    if len(partes) == 2:
+                        estados[partes[1]] = partes[0]
+
+        completos = []
+        for ruta, estado in estados.items():
+            if estado == self.OK:
+                continue
+            temporal = ruta_temporal(ruta)
+            if os.path.exists(temporal):
+                # Escritura interrumpida antes del rename: el temporal es basura
+                try:
+                    os.remove(temporal)
+                    self.logger.warning(f"Escritura incompleta descartada: {temporal}")
+                except OSError as e:
+                    self._log_error("FILE-JOURNAL", f"No se pudo eliminar {temporal}: {e}")
+            if os.path.exists(ruta):
+                completos.append(ruta)
+        with self._lock:
+            for ruta in completos:
+                self._abiertos[ruta] = self.FIN
+        return completos
+
+    def compactar(self):
+        """Reescribe el diario dejando solo las intenciones abiertas"""
+        with self._lock:
+            try:
+                escribir_atomico(
+                    self.journal_path,
+                    "".join(f"{estado}\t{ruta}\n" for ruta, estado in self._abiertos.items())
+                )
+            except OSError as e:
+                self._log_error("FILE-JOURNAL", f"Error compactando diario: {e}")
+
+    def _anotar(self, estado: str, ruta: str):
+        with self._lock:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(f"{estado}\t{ruta}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if estado == self.OK:
+                self._abiertos.pop(ruta, None)
+            else:
+                self._abiertos[ruta] = estado
+        if estado == self.OK and not self._abiertos:
+            self.compactar()
+
+    def _log_error(self, codigo: str, contexto: str):
+        if self.error_handler:
+            self.error_handler.log_error(codigo, contexto)
+        else:
+            self.logger.error(f"{codigo}: {contexto}")
@@ -12,6 +12,8 @@ class ConfigManager:
     SENSOR_CONFIG   = "Config/sensor_config.json"
     FTP_CONFIG      = "Config/ftp_config.json"
     SMS_CONFIG      = "Config/sms_config.json"
+    HTTP_CONFIG     = "Config/http_config.json"
+    METRICAS_CONFIG = "Config/metricas_config.json"
     LOGIN_CONFIG    = "Config/login_config.json"
     
     _cache = {}
@@ -109,6 +111,28 @@ class ConfigManager:
         cls._guardar_archivo(cls.SMS_CONFIG, config)
         cls._cache.pop('sms', None)
 
+    @classmethod
+    def cargar_config_http(cls) -> Dict[str, Any]:
+        """Transporte HTTP(S) opcional: {} si no está configurado"""
+        if 'http' in cls._cache:
+            return cls._cache['http']
+            
+        cfg = cls._cargar_archivo(cls.HTTP_CONFIG)
+        if cfg and "url_base" not in cfg:
+            raise ValueError(f"Falta 'url_base' en {cls.HTTP_CONFIG}")
+        cls._cache['http'] = cfg
+        return cfg
+
+    @classmethod
+    def cargar_config_metricas(cls) -> Dict[str, Any]:
+        """Endpoint de métricas opcional: {} si no está configurado"""
+        if 'metricas' in cls._cache:
+            return cls._cache['metricas']
+            
+        cfg = cls._cargar_archivo(cls.METRICAS_CONFIG)
+        cls._cache['metricas'] = cfg
+        return cfg
+
     @classmethod
     def cargar_config_login(cls) -> Dict[str, Any]:
         if 'login' in cls._cache:
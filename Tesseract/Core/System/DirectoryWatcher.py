@@ -0,0 +1,264 @@
+# Tesseract/Core/System/DirectoryWatcher.py
+
+import os
+import time
+import errno
+import select
+import struct
+import logging
+import threading
+import ctypes
+import ctypes.util
+from typing import Callable, Dict, List, Optional, Tuple
+from Core.System.ErrorHandler import ErrorHandler
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENTO = struct.Struct("iIII")   # wd, mask, cookie, len
+
+class _FuenteInotify:
+    """Eventos del kernel: archivo cerrado tras escritura o renombrado hacia el directorio"""
+    modo = "inotify"
+
+    def __init__(self, directorio: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        wd = libc.inotify_add_watch(self._fd, os.fsencode(directorio), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(error, f"inotify_add_watch falló en {directorio}")
+        self.directorio = directorio
+        self.activa = True
+
+    def esperar(self, timeout: float) -> List[str]:
+        try:
+            listos, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+            if not listos:
+                return []
+            datos = os.read(self._fd, 64 * 1024)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return []
+            raise
+
+        nombres = []
+        offset = 0
+        while offset + _EVENTO.size <= len(datos):
+            _, mascara, _, longitud = _EVENTO.unpack_from(datos, offset)
+            offset += _EVENTO.size
+            nombre = datos[offset:offset + longitud].rstrip(b"\0")
+            offset += longitud
+            if mascara & IN_Q_OVERFLOW:
+                # Se perdieron eventos: se informa todo el directorio
+                nombres.extend(os.listdir(self.directorio))
+            elif mascara & IN_IGNORED:
+                # El directorio fue eliminado o desmontado
+                self.activa = False
+            elif nombre:
+                nombres.append(os.fsdecode(nombre))
+        return nombres
+
+    def despertar(self):
+        pass   # select() vence en a lo sumo un segundo
+
+    def cerrar(self):
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+
+class _FuenteSondeo:
+    """Alternativa sin inotify: compara el listado periódicamente.
+
+    Un archivo se informa cuando su tamaño y fecha no cambian entre dos
+    listados consecutivos, para no tomarlo a medio escribir.
+    """
+    modo = "sondeo"
+
+    def __init__(self, directorio: str, intervalo: float):
+        self.directorio = directorio
+        self.intervalo = intervalo
+        self.activa = True
+        self._anterior = self._listar()
+        self._informados = dict(self._anterior)
+        self._proximo = time.monotonic() + intervalo
+        self._despertar = threading.Event()
+
+    def _listar(self) -> Dict[str, Tuple[int, int]]:
+        firmas = {}
+        try:
+            with os.scandir(self.directorio) as entradas:
+                for entrada in entradas:
+                    try:
+                        if entrada.is_file():
+                            info = entrada.stat()
+                            firmas[entrada.name] = (info.st_mtime_ns, info.st_size)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return firmas
+
+    def esperar(self, timeout: float) -> List[str]:
+        espera = min(timeout, self._proximo - time.monotonic())
+        if espera > 0:
+            self._despertar.wait(espera)
+        if time.monotonic() < self._proximo:
+            return []
+        self._proximo = time.monotonic() + self.intervalo
+
+        actual = self._listar()
+        nombres = [
+            nombre for nombre, firma in actual.items()
+            if self._anterior.get(nombre) == firma and self._informados.get(nombre) != firma
+        ]
+        for nombre in nombres:
+            self._informados[nombre] = actual[nombre]
+        self._informados = {n: f for n, f in self._informados.items() if n in actual}
+        self._anterior = actual
+        return nombres
+
+    def despertar(self):
+        self._despertar.set()
+
+    def cerrar(self):
+        self._despertar.set()
+
+class DirectoryWatcher:
+    """Vigila un directorio y entrega en lotes los archivos nuevos ya completos.
+
+    - debounce: segundos sin nuevos eventos antes de considerar listo un archivo.
+    - ventana_lote: segundos que se acumulan archivos listos antes de entregarlos
+      (0 = entrega inmediata).
+    Se ignoran archivos ocultos y temporales (.tmp), como los del escritor atómico.
+    Usa inotify cuando está disponible y, si no, sondeo periódico del directorio.
+    """
+    DEBOUNCE = 1.0
+    VENTANA_LOTE = 5.0
+    INTERVALO_SONDEO = 10.0
+
+    def __init__(self, directorio: str, callback: Callable[[List[str]], None],
+                 debounce: float = DEBOUNCE, ventana_lote: float = VENTANA_LOTE,
+                 intervalo_sondeo: float = INTERVALO_SONDEO, error_handler: ErrorHandler = None):
+        self.directorio = directorio
+        self.callback = callback
+        self.debounce = debounce
+        self.ventana_lote = ventana_lote
+        self.intervalo_sondeo = intervalo_sondeo
+        self.error_handler = error_handler
+        self.logger = logging.getLogger(__name__)
+
+        self._fuente = None
+        self._hilo = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def modo(self) -> Optional[str]:
+        return self._fuente.modo if self._fuente else None
+
+    @property
+    def running(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def iniciar(self):
+        with self._lock:
+            if self.running:
+                return
+            os.makedirs(self.directorio, exist_ok=True)
+            # Cada hilo recibe su propia fuente y evento: uno anterior que aún no
+            # terminó (callback lento) no puede cerrar ni reemplazar los del nuevo
+            self._stop_event = threading.Event()
+            self._fuente = self._crear_fuente()
+            self._hilo = threading.Thread(target=self._vigilar_task, args=(self._fuente, self._stop_event),
+                                          name="DirectoryWatcher", daemon=True)
+            self._hilo.start()
+        self.logger.info(f"Vigilando {self.directorio} ({self.modo})")
+
+    def detener(self):
+        with self._lock:
+            self._stop_event.set()
+            hilo, fuente = self._hilo, self._fuente
+            self._hilo = None
+        if fuente:
+            # El hilo cierra la fuente al salir; aquí solo se interrumpe la espera
+            fuente.despertar()
+        if hilo:
+            hilo.join(timeout=3.0)
+
+    def _crear_fuente(self):
+        try:
+            return _FuenteInotify(self.directorio)
+        except (OSError, AttributeError) as e:
+            # Sin inotify (otro sistema operativo, límite de watches agotado)
+            self.logger.warning(f"inotify no disponible, se usa sondeo: {e}")
+            return _FuenteSondeo(self.directorio, self.intervalo_sondeo)
+
+    def _ignorar(self, nombre: str) -> bool:
+        return nombre.startswith(".") or nombre.endswith(".tmp")
+
+    def _vigilar_task(self, fuente, stop_event: threading.Event):
+        recientes: Dict[str, float] = {}   # ruta -> último evento
+        listos: List[str] = []
+        inicio_lote = 0.0
+
+        while not stop_event.is_set():
+            ahora = time.monotonic()
+            plazos = [t + self.debounce for t in recientes.values()]
+            if listos:
+                plazos.append(inicio_lote + self.ventana_lote)
+            # Despierta al menos cada segundo para atender la detención
+            espera = min([1.0] + [max(0.0, p - ahora) for p in plazos])
+
+            try:
+                nombres = fuente.esperar(espera)
+            except OSError as e:
+                self._log_error("WATCH-001", f"Error leyendo eventos de {self.directorio}: {e}")
+                nombres = []
+                fuente.activa = False
+            if not fuente.activa and not stop_event.is_set():
+                fuente.cerrar()
+                stop_event.wait(1.0)
+                fuente = self._crear_fuente()
+                with self._lock:
+                    # Solo se publica si este hilo sigue siendo el del vigilante
+                    if self._hilo is threading.current_thread():
+                        self._fuente = fuente
+
+            ahora = time.monotonic()
+            for nombre in nombres:
+                if not self._ignorar(nombre):
+                    recientes[os.path.join(self.directorio, nombre)] = ahora
+
+            for ruta, ultimo in list(recientes.items()):
+                if ahora - ultimo >= self.debounce:
+                    del recientes[ruta]
+                    if not os.path.isfile(ruta) or ruta in listos:
+                        continue
+                    if not listos:
+                        inicio_lote = ahora
+                    listos.append(ruta)
+
+            if listos and ahora - inicio_lote >= self.ventana_lote:
+                lote, listos = listos, []
+                try:
+                    self.callback(lote)
+                except Exception as e:
+                    self._log_error("WATCH-002", f"Error procesando archivos detectados: {e}")
+
+        fuente.cerrar()
+
+    def _log_error(self, codigo: str, contexto: str):
+        if self.error_handler:
+            self.error_handler.log_error(codigo, contexto)
+        else:
+            self.logger.error(f"{codigo}: {contexto}")
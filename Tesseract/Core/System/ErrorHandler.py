@@ -3,8 +3,16 @@
 import logging, time
 from datetime import datetime
 from typing import List
+from Core.System.AlertDispatcher import AlertDispatcher
+from Core.System.AlertAggregator import AlertAggregator
+from Core.System.LogPipeline import ArchivoLotesHandler, configurar_pipeline
+from Core.System.StructuredLog import JSONLHandler, ArchivoSegmentos
 
 class ErrorHandler:
+    LOG_ESTRUCTURADO = "errores.jsonl"
+    DIRECTORIO_ARCHIVO = "logs"            # segmentos comprimidos y su manifiesto
+    LOG_TEXTO = "errores.log"              # solo si el log estructurado no puede abrirse
+    MAX_BYTES_LOG = 5 * 1024 * 1024
     KER_ERRORS = {
         "001": "Falta conexión a internet",
         "002": "Fallo en conexión FTP",
@@ -14,14 +22,22 @@ class ErrorHandler:
         "011": "Error en envío de SMS"
     }
 
-    def __init__(self, notificadores: List[object] = []):
+    def __init__(self, notificadores: List[object] = [], dispatcher: AlertDispatcher = None,
+                 ventana_agregacion: float = 60.0, capacidad_log: int = 10000):
         self.notificadores = notificadores
-        self.logger = self._configurar_logger()
+        self.logger = self._configurar_logger(capacidad_log)
+        # Las alertas externas se envían en hilos propios: log_error solo encola
+        self.dispatcher = dispatcher or AlertDispatcher()
+        for canal in notificadores:
+            self.dispatcher.registrar_canal(canal)
+        # Agrupa tormentas de alertas por código y medidor antes de despacharlas
+        self.agregador = AlertAggregator(self.dispatcher.despachar, ventana_agregacion)
         self._last_msg = None
+        self._last_extra = None
         self._last_time = 0.0
         self._repeat_count = 0
 
-    def _configurar_logger(self):
+    def _configurar_logger(self, capacidad: int):
         logger = logging.getLogger("TelemetríaApp")
         logger.setLevel(logging.DEBUG)
         formatter = logging.Formatter(
@@ -29,24 +45,45 @@ class ErrorHandler:
             datefmt='%Y-%m-%d %H:%M:%S'
         )
 
-        # 1) Archivo recoge todo
-        file_handler = logging.FileHandler('errores.log')
-        file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(formatter)
-        if not any(isinstance(h, logging.FileHandler) for h in logger.handlers):
-            logger.addHandler(file_handler)
-
-        # 2) Consola solo WARNING+
+        # 1) Consola solo WARNING+
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.WARNING)
         console_handler.setFormatter(formatter)
-        if not any(isinstance(h, logging.StreamHandler) for h in logger.handlers):
-            logger.addHandler(console_handler)
 
+        # 2) Log estructurado (JSON por línea) con índice por día y código: es el
+        #    único log en disco y rota solo por el archivo de segmentos y su manifiesto
+        handlers = [console_handler]
+        if not self._tiene_pipeline(logger):
+            try:
+                handlers.append(JSONLHandler(
+                    self.LOG_ESTRUCTURADO,
+                    archivo=ArchivoSegmentos(self.DIRECTORIO_ARCHIVO),
+                    max_bytes=self.MAX_BYTES_LOG
+                ))
+            except (OSError, ValueError) as e:
+                console_handler.handle(logging.makeLogRecord({
+                    "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"Log estructurado no disponible, se usa {self.LOG_TEXTO}: {e}"
+                }))
+                # Respaldo en texto plano para no quedar sin registro en disco
+                file_handler = ArchivoLotesHandler(self.LOG_TEXTO, delay=True)
+                file_handler.setFormatter(formatter)
+                handlers.append(file_handler)
+
+        # El hilo que registra (lecturas Modbus, GUI) solo encola; la E/S ocurre
+        # en un hilo aparte. La cola es acotada y ante desborde sacrifica primero
+        # los registros de menor nivel.
+        self.log_listener = configurar_pipeline(logger, handlers, capacidad)
         return logger
 
-    def log_error(self, codigo: str, contexto: str = ""):
+    @staticmethod
+    def _tiene_pipeline(logger: logging.Logger) -> bool:
+        return any(getattr(h, "listener", None) for h in logger.handlers)
+
+    def log_error(self, codigo: str, contexto: str = "", medidor: str = None):
         mensaje = f"KER-{codigo}: {self.KER_ERRORS.get(codigo,'Error desconocido')} | {contexto}"
+        if medidor:
+            mensaje = f"{mensaje} (medidor {medidor})"
         now = time.time()
         # Supresión de repeticiones en consola
         if mensaje == self._last_msg and (now - self._last_time) < 1.0:
@@ -55,16 +92,36 @@ class ErrorHandler:
         # Emitir resumen de repeticiones acumuladas
         if self._repeat_count:
             resumen = f"{self._last_msg}  (repetido {self._repeat_count} veces)"
-            self.logger.error(resumen)
+            self.logger.error(resumen, extra=self._last_extra, stacklevel=2)
             self._repeat_count = 0
-        # Log error normal
-        self.logger.error(mensaje)
+        # Log error normal; código y medidor viajan como campos del registro estructurado
+        extra = {"codigo": codigo, "medidor": medidor}
+        self.logger.error(mensaje, extra=extra, stacklevel=2)
+        self._last_extra = extra
         self._last_msg = mensaje
         self._last_time = now
-        # Notificadores externos
-        for canal in self.notificadores:
-            if hasattr(canal, 'enviar_alerta'):
-                canal.enviar_alerta(mensaje)
+        # Notificadores externos (agrupado y asíncrono); los errores de los
+        # propios notificadores no generan nuevas alertas
+        if self.notificadores and not self.dispatcher.en_hilo_despacho():
+            self.agregador.agregar(codigo, mensaje, medidor)
+
+    def agregar_notificador(self, canal: object, capacidad: int = None, politica: str = None):
+        self.notificadores = self.notificadores + [canal]
+        self.dispatcher.registrar_canal(canal, capacidad, politica)
+
+    def detener(self, timeout: float = 5.0):
+        self.agregador.detener()
+        self.dispatcher.detener(timeout)
+        self.log_listener.detener(timeout)
+
+    def limpiar_log(self):
+        """Archiva el log estructurado (comprimido) y empieza uno vacío; el historial se conserva.
+        El respaldo en texto plano, si está en uso, solo se vacía"""
+        for handler in self.log_listener.handlers:
+            if hasattr(handler, "rotar"):
+                handler.rotar()
+            elif hasattr(handler, "vaciar"):
+                handler.vaciar()
 
     def log_conexion(self, estado: bool, puerto: str):
         mensaje = f"Conexión {'exitosa' if estado else 'fallida'} en {puerto}"
@@ -74,4 +131,4 @@ class ErrorHandler:
 
     def log_evento(self, contexto: str, codigo_personalizado: str = "100"):
         mensaje = f"KER-{codigo_personalizado}: {contexto}"
-        self.logger.info(mensaje)
+        self.logger.info(mensaje, extra={"codigo": codigo_personalizado, "medidor": None}, stacklevel=2)
@@ -8,18 +8,54 @@ import json
 import smtplib
 import queue
 from datetime import datetime, timedelta
-from typing import Callable, Dict, Any
-from apscheduler.schedulers.background import BackgroundScheduler
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from Core.Network.IFileTransfer import IFileTransfer
+from Core.Network.StreamingMail import MensajeStreaming, enviar_streaming
+from Core.Network.InternetManager import registrar_actividad_red
 from Core.System.ErrorHandler import ErrorHandler
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
+from Core.System.OutboxManager import OutboxManager
+from Core.System.AtomicWriter import AtomicWriter
+from Core.System.SchedulerService import SchedulerService, desfase_flota
+from Core.System.DirectoryWatcher import DirectoryWatcher
+from Core.System.Metrics import REGISTRO
+from Core.System.UploadEngine import (
+    AdaptiveConcurrency, UploadPipeline, RESULTADO_OK, RESULTADO_ERROR, RESULTADO_CONGESTION
+)
+
+_ENVIOS = REGISTRO.contador(
+    "tesseract_envios_total", "Intentos de envío por canal y resultado", ("canal", "resultado"))
+_DURACION_SUBIDA = REGISTRO.histograma(
+    "tesseract_subida_segundos", "Duración de la subida de un archivo por transporte", ("transporte",))
+_DURACION_EMAIL = REGISTRO.histograma(
+    "tesseract_email_envio_segundos", "Duración del envío SMTP de un lote de archivos")
+_COLA_EMAIL = REGISTRO.indicador("tesseract_cola_email", "Archivos en la cola de email (_email_queue)")
+_LOTES_EMAIL = REGISTRO.indicador("tesseract_email_lotes_pendientes", "Lotes de email esperando un worker SMTP")
+_BANDEJA = REGISTRO.indicador(
+    "tesseract_bandeja_entradas", "Entradas de la bandeja de salida por canal y estado", ("canal", "estado"))
+_ANTIGUEDAD = REGISTRO.indicador(
+    "tesseract_bandeja_antiguedad_segundos", "Antigüedad de la entrada pendiente más vieja", ("canal",))
 
 class FileScheduler:
+    TRANSPORTE_FTP = "ftp"
+    TAREA_ENVIO = "envio_pendientes"
+    TAREA_VERIFICACION = "verificar_pendientes"
+    TAREA_REINTENTOS = "reintentar_vencidos"
+    INTERVALO_VERIFICACION = 900  # segundos
+    INTERVALO_REINTENTOS = 60     # los plazos reales los fija el retroceso de cada archivo
     MAX_QUEUE_SIZE = 100
     EMAIL_WORKERS = 3
+    EMAIL_VENTANA_LOTE = 2.0      # segundos para agrupar archivos en un mismo mensaje
+    EMAIL_MAX_ADJUNTOS = 20
+    ESPERA_EMAIL = 300.0          # segundos máximos esperando la cola de email en un ciclo
+    EMAIL_INACTIVIDAD = 120.0     # cierre de sesiones SMTP ociosas
+    REINTENTO_BASE = 60           # primera espera tras un fallo; se duplica en cada intento
+    REINTENTO_MAXIMO = 60 * 60
+    REINTENTO_CONGESTION = 5 * 60 # espera mínima cuando el servidor está saturado (421/429/503)
+    MAX_INTENTOS_CANAL = {OutboxManager.CANAL_SMS: 3}
     
     def __init__(
         self,
@@ -27,26 +63,73 @@ class FileScheduler:
         config: Dict[str, Any],
         get_plantilla_fn: Callable[[str], Dict[str, Any]],
         error_handler: ErrorHandler,
-        alert_manager: Any = None  # AlertManager opcional para SMS
+        alert_manager: Any = None,  # AlertManager opcional para SMS
+        transportes: Dict[str, IFileTransfer] = None,
+        scheduler: SchedulerService = None  # servicio compartido; si falta se crea uno propio
     ):
         self.transfer_service = transfer_service
+        # Transportes disponibles por nombre; la plantilla de cada archivo elige uno
+        self.transportes = {self.TRANSPORTE_FTP: transfer_service}
+        self.transportes.update(transportes or {})
         self.config = config
         self.get_plantilla = get_plantilla_fn
         self.error_handler = error_handler
         self.alert_manager = alert_manager
         self.logger = logging.getLogger(__name__)
         
-        self._scheduler = None
+        self._watcher = None
+        self._scheduler_propio = scheduler is None
+        self._scheduler = scheduler or SchedulerService(
+            config.get("estado_programador", "scheduler_estado.json"), error_handler
+        )
         self._lock = threading.Lock()
         
+        self.outbox = OutboxManager(config.get("db_pendientes", "pendientes.db"), error_handler)
+        self.outbox.liberar_reservas()
+        self.escritor = AtomicWriter(
+            os.path.join(config.get("directorio_pendientes", "pendientes_usb"), ".journal"),
+            error_handler
+        )
+        
         self.email_config = self._cargar_config_email()
         self.sms_config = self._cargar_config_sms()
         
+        # Un pipeline independiente por canal, con concurrencia adaptativa
+        self._pipelines = {
+            OutboxManager.CANAL_FTP: UploadPipeline(
+                OutboxManager.CANAL_FTP,
+                self._procesar_archivo_individual,
+                AdaptiveConcurrency(
+                    inicial=config.get("concurrencia_inicial", 3),
+                    maximo=self._concurrencia_maxima()
+                )
+            ),
+            OutboxManager.CANAL_SMS: UploadPipeline(
+                OutboxManager.CANAL_SMS, self._procesar_canal, AdaptiveConcurrency(inicial=1, maximo=4)
+            ),
+        }
+        
+        # Email: archivos -> agrupador -> lotes -> workers con sesión SMTP persistente
         self._email_queue = queue.Queue(maxsize=self.MAX_QUEUE_SIZE)
+        self._email_lotes = queue.Queue()
         self._email_workers = []
-        self._stop_event = threading.Event()
+        # Profundidades de cola y bandeja: se calculan solo al exponer métricas
+        REGISTRO.agregar_colector(self._actualizar_metricas)
         self._init_email_workers()
 
+    def _concurrencia_maxima(self) -> int:
+        """Tope del límite adaptativo: nunca más hilos que sesiones del transporte más acotado.
+
+        Con más workers que sesiones en el pool, los sobrantes esperarían
+        espera_sesion sin conseguir una y gastarían reintentos.
+        """
+        maximo = self.config.get("concurrencia_maxima", 8)
+        for transporte in self.transportes.values():
+            sesiones = getattr(transporte, "sesiones_maximas", lambda: None)()
+            if sesiones:
+                maximo = min(maximo, sesiones)
+        return maximo
+
     def _cargar_config_email(self) -> Dict[str, Any]:
         try:
             config_path = 'Config/email_config.json'
@@ -70,37 +153,145 @@ class FileScheduler:
             return None
 
     def _init_email_workers(self):
+        # Cada generación de hilos tiene su propio evento: un worker que siga
+        # ocupado tras detener() termina su lote y sale sin tocar los nuevos
+        self._stop_event = threading.Event()
+        agrupador = threading.Thread(
+            target=self._email_batcher_task,
+            args=(self._stop_event,),
+            name="EmailBatcher",
+            daemon=True
+        )
+        agrupador.start()
+        self._email_workers.append(agrupador)
         for i in range(self.EMAIL_WORKERS):
             worker = threading.Thread(
                 target=self._email_worker_task,
+                args=(self._stop_event,),
                 name=f"EmailWorker-{i}",
                 daemon=True
             )
             worker.start()
             self._email_workers.append(worker)
 
-    def _email_worker_task(self):
+    def encolar_email(self, ruta_local: str) -> Future:
+        """Encola un archivo para envío por email; el futuro se resuelve con True/False"""
+        future = Future()
+        if not self.email_config:
+            future.set_result(False)
+            return future
+        destinatarios = tuple(self.email_config.get('to', []))
+        try:
+            self._email_queue.put((ruta_local, destinatarios, future), timeout=5.0)
+        except queue.Full:
+            self.error_handler.log_error("EMAIL_QUEUE", f"Cola de email llena, se reintentará: {os.path.basename(ruta_local)}")
+            future.set_result(False)
+        return future
+
+    def _email_batcher_task(self, detener: threading.Event):
+        """Agrupa archivos con los mismos destinatarios en lotes de un solo mensaje"""
+        while not detener.is_set():
+            try:
+                primero = self._email_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+            grupos: Dict[Tuple[str, ...], List] = {primero[1]: [primero]}
+            limite = time.monotonic() + self.email_config.get("ventana_lote", self.EMAIL_VENTANA_LOTE)
+            max_adjuntos = self.email_config.get("max_adjuntos", self.EMAIL_MAX_ADJUNTOS)
+            while True:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._email_queue.get(timeout=restante)
+                except queue.Empty:
+                    break
+                grupo = grupos.setdefault(item[1], [])
+                grupo.append(item)
+                if len(grupo) >= max_adjuntos:
+                    self._email_lotes.put(grupos.pop(item[1]))
+
+            for lote in grupos.values():
+                self._email_lotes.put(lote)
+
+    def _email_worker_task(self, detener: threading.Event):
         server = None
-        while not self._stop_event.is_set():
-            file_path = None
+        ultimo_uso = 0.0
+        while not detener.is_set():
             try:
-                file_path = self._email_queue.get(timeout=5.0)
-                
-                if server is None:
-                    server = self._crear_smtp_server()
-                
-                if server:
-                    self._enviar_email(server, file_path)
-                    
+                lote = self._email_lotes.get(timeout=5.0)
             except queue.Empty:
+                # Sesión ociosa: se cierra antes de que el servidor la corte
+                if server and time.monotonic() - ultimo_uso > self.EMAIL_INACTIVIDAD:
+                    self._cerrar_smtp(server)
+                    server = None
                 continue
+            if lote is None:
+                break   # centinela de detener()
+            if detener.is_set():
+                self._cancelar_lote(lote)
+                break
+
+            exitoso = False
+            try:
+                for _ in range(2):
+                    if server is None:
+                        server = self._crear_smtp_server()
+                    if server is None:
+                        break
+                    try:
+                        with _DURACION_EMAIL.medir_tiempo():
+                            exitoso = self._enviar_email(server, [item[0] for item in lote], list(lote[0][1]))
+                        if server.sock is None:
+                            # Falló tras DATA y enviar_streaming cerró la sesión: no se reutiliza
+                            server = None
+                        break
+                    except smtplib.SMTPServerDisconnected:
+                        # La sesión persistente expiró: reconectar y reintentar una vez
+                        self.logger.warning("Reconectando SMTP...")
+                        server = None
+                ultimo_uso = time.monotonic()
             except Exception as e:
                 self.error_handler.log_error("EMAIL_WORKER", f"Error en worker: {e}")
+                self._cerrar_smtp(server)
                 server = None
             finally:
-                if file_path is not None:
+                for ruta, _, future in lote:
+                    if not future.done():
+                        future.set_result(exitoso)
                     self._email_queue.task_done()
 
+        self._cerrar_smtp(server)
+
+    def _cancelar_lote(self, lote: List):
+        """Devuelve a la bandeja un lote no enviado: los futuros se cancelan sin contar intento"""
+        for _, _, future in lote:
+            future.cancel()
+            self._email_queue.task_done()
+
+    def _vaciar_colas_email(self):
+        """Cancela lo que quedó en la cola de archivos y en la de lotes"""
+        while True:
+            try:
+                self._cancelar_lote([self._email_queue.get_nowait()])
+            except queue.Empty:
+                break
+        while True:
+            try:
+                lote = self._email_lotes.get_nowait()
+            except queue.Empty:
+                break
+            if lote is not None:
+                self._cancelar_lote(lote)
+
+    def _esperar_cola_email(self, timeout: float) -> bool:
+        """Queue.join() con límite de tiempo; False si quedaron envíos sin terminar"""
+        cola = self._email_queue
+        with cola.all_tasks_done:
+            return cola.all_tasks_done.wait_for(lambda: cola.unfinished_tasks == 0, timeout)
+
+    def _cerrar_smtp(self, server: smtplib.SMTP):
         if server:
             try:
                 server.quit()
@@ -130,52 +321,56 @@ class FileScheduler:
                 time.sleep(2)
         return None
 
-    def _enviar_email(self, server: smtplib.SMTP, file_path: str):
-        if not os.path.exists(file_path):
-            self.logger.warning(f"Archivo no encontrado: {file_path}")
+    @contextmanager
+    def _adjuntos(self, rutas: List[str]):
+        """(nombre, ruta en disco) de cada adjunto; opcionalmente un único zip temporal"""
+        if not (self.email_config.get("adjuntar_zip", False) and len(rutas) > 1):
+            yield [(os.path.basename(ruta), ruta) for ruta in rutas]
             return
-            
+        # El zip se arma en disco: la memoria no depende del tamaño del lote
+        fd, temporal = tempfile.mkstemp(prefix=".tesseract_", suffix=".zip")
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.email_config['from']
-            msg['To'] = ", ".join(self.email_config['to'])
-            msg['Subject'] = self.email_config['subject']
-            
-            with open(file_path, "rb") as f:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(f.read())
-                encoders.encode_base64(part)
-                filename = os.path.basename(file_path)
-                part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
-                msg.attach(part)
-            
-            server.sendmail(
-                self.email_config['from'],
-                self.email_config['to'],
-                msg.as_string()
-            )
-            self.logger.info(f"Email enviado: {filename}")
-            
-        except smtplib.SMTPServerDisconnected:
-            self.logger.warning("Reconectando SMTP...")
-            raise
-        except Exception as e:
-            self.error_handler.log_error("EMAIL_SEND", f"Error enviando email: {e}")
+            with os.fdopen(fd, "wb") as f, zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+                for ruta in rutas:
+                    zf.write(ruta, os.path.basename(ruta))
+            nombre = f"tesseract_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+            yield [(nombre, temporal)]
+        finally:
+            try:
+                os.remove(temporal)
+            except OSError:
+                pass
 
-    def _enviar_email_inmediato(self, ruta_local: str) -> bool:
-        """Intenta enviar el email inmediatamente para el archivo dado."""
-        if not self.email_config:
+    def _enviar_email(self, server: smtplib.SMTP, file_paths: List[str], destinatarios: List[str]) -> bool:
+        """Envía un solo mensaje con todos los archivos del lote adjuntos.
+
+        El cuerpo MIME se genera y transmite por bloques desde disco.
+        """
+        existentes = [ruta for ruta in file_paths if os.path.exists(ruta)]
+        for ruta in set(file_paths) - set(existentes):
+            self.logger.warning(f"Archivo no encontrado: {ruta}")
+        if not existentes:
             return False
             
         try:
-            server = self._crear_smtp_server()
-            if server is None:
-                return False
-            self._enviar_email(server, ruta_local)
-            server.quit()
+            with self._adjuntos(existentes) as adjuntos:
+                mensaje = MensajeStreaming(
+                    self.email_config['from'],
+                    destinatarios,
+                    self.email_config['subject'],
+                    adjuntos
+                )
+                rechazados = enviar_streaming(server, mensaje)
+            for destinatario, (codigo, _) in rechazados.items():
+                self.logger.warning(f"Destinatario rechazado {destinatario}: {codigo}")
+            self.logger.info(f"Email enviado con {len(existentes)} archivo(s)")
+            registrar_actividad_red()
             return True
+            
+        except smtplib.SMTPServerDisconnected:
+            raise
         except Exception as e:
-            self.error_handler.log_error("EMAIL_IMMEDIATE", f"Error enviando email inmediatamente: {e}")
+            self.error_handler.log_error("EMAIL_SEND", f"Error enviando email: {e}")
             return False
 
     def _enviar_sms_inmediato(self, ruta_local: str) -> bool:
@@ -215,151 +410,418 @@ class FileScheduler:
 
     def iniciar(self):
         try:
-            if self._scheduler is None or self._scheduler.state == 0:
-                self._scheduler = BackgroundScheduler(
-                    daemon=True,
-                    executors={'default': {'type': 'threadpool', 'max_workers': 4}},
-                    job_defaults={'misfire_grace_time': 3600}
-                )
-            
             hora_envio = self.config.get("hora_envio", "23:59")
             hora, minuto = self._validate_time_format(hora_envio)
             
-            self._scheduler.remove_all_jobs()
-            
-            self._scheduler.add_job(
+            # Cada equipo de la flota envía en su propio punto de la ventana, siempre el mismo
+            desfase = desfase_flota(
+                self.config.get("semilla_flota", ""),
+                self.config.get("ventana_envio", 0) * 60
+            )
+            # Un envío perdido con el equipo apagado se recupera al arrancar
+            self._scheduler.programar_diario(
+                self.TAREA_ENVIO,
+                f"{hora:02d}:{minuto:02d}",
                 self._enviar_archivos_pendientes,
-                "cron",
-                hour=hora,
-                minute=minuto
+                jitter=self.config.get("jitter_envio", 0),
+                desfase=desfase
             )
-            self._scheduler.add_job(
+            # Con la tarea diaria ya programada, lo recuperado puede esperar el turno del equipo
+            self._recuperar_pendientes()
+            self.logger.info(
+                f"Envío diario a las {hora:02d}:{minuto:02d} + {int(desfase // 60)} min {int(desfase % 60)} s"
+            )
+            self._scheduler.programar_intervalo(
+                self.TAREA_VERIFICACION,
+                self.INTERVALO_VERIFICACION,
                 self._verificar_pendientes,
-                "interval",
-                minutes=15
+                jitter=self.config.get("jitter_verificacion", 30)
+            )
+            self._scheduler.programar_intervalo(
+                self.TAREA_REINTENTOS,
+                self.INTERVALO_REINTENTOS,
+                self._reintentar_vencidos,
+                jitter=self.config.get("jitter_reintentos", 10)
             )
             
-            if self._scheduler.state == 0:
-                self._scheduler.start()
+            if not self._scheduler.running:
+                self._scheduler.iniciar()
                 self.logger.info("Scheduler iniciado correctamente")
             else:
                 self.logger.info("Scheduler ya está en ejecución")
             
+            if self.config.get("vigilar_directorio", True):
+                self._iniciar_vigilancia()
+            
         except Exception as e:
             self.error_handler.log_error("SCHED_INIT", f"Error iniciando scheduler: {e}")
 
-    def _procesar_archivo_individual(self, ruta_local):
+    def _iniciar_vigilancia(self):
+        """Los archivos nuevos se envían al detectarse, sin esperar a hora_envio"""
+        if self._watcher is None:
+            self._watcher = DirectoryWatcher(
+                self.config.get("directorio_pendientes", "pendientes_usb"),
+                self._procesar_detectados,
+                debounce=self.config.get("debounce_vigilancia", DirectoryWatcher.DEBOUNCE),
+                ventana_lote=self.config.get("ventana_vigilancia", DirectoryWatcher.VENTANA_LOTE),
+                error_handler=self.error_handler
+            )
+        self._watcher.iniciar()
+
+    def _procesar_detectados(self, rutas: List[str]):
+        """Registra y envía de inmediato los archivos detectados por el vigilante"""
+        with self._lock:
+            for ruta in rutas:
+                if not self.outbox.contiene(ruta):
+                    self._importar_archivo(ruta, OutboxManager.PRIORIDAD_NORMAL)
+            entradas = self.outbox.obtener_pendientes_rutas(rutas)
+            ftp = [e for e in entradas if e["canal"] == OutboxManager.CANAL_FTP]
+            if ftp:
+                self._precalentar_directorios(ftp)
+            for entrada in entradas:
+                self._despachar(entrada)
+            self._pipelines[OutboxManager.CANAL_FTP].esperar()
+        self.logger.info(f"{len(entradas)} envío(s) inmediatos por {len(rutas)} archivo(s) detectado(s)")
+
+    def esta_activo(self) -> bool:
+        return self._scheduler.running and self._scheduler.tiene_tarea(self.TAREA_ENVIO)
+
+    def registrar_archivo(self, ruta_local: str, prioridad: int = OutboxManager.PRIORIDAD_NORMAL) -> bool:
+        """Agrega un archivo recién generado a la bandeja de salida"""
+        return self.outbox.registrar_archivo(
+            ruta_local, [OutboxManager.CANAL_FTP], prioridad=prioridad, proximo_intento=self._turno_envio()
+        )
+
+    def _turno_envio(self) -> Optional[float]:
+        """Primer intento de un archivo nuevo: inmediato salvo con 'retener_hasta_turno'.
+
+        Por omisión la ventana de flota solo reparte el drenado diario y el
+        vigilante sube cada archivo en cuanto aparece. Con 'retener_hasta_turno'
+        (y ventana configurada) el archivo espera a hora_envio + desfase; solo
+        los fallos siguen el retroceso.
+        """
+        if not self.config.get("retener_hasta_turno", False) or self.config.get("ventana_envio", 0) <= 0:
+            return None
+        turno = self._scheduler.proxima_ejecucion(self.TAREA_ENVIO)
+        return turno.timestamp() if turno else None
+
+    def guardar_pendiente(self, ruta_local: str, contenido: str) -> bool:
+        """Escribe un archivo pendiente de forma atómica y lo registra en la bandeja"""
+        if not self.escritor.escribir(ruta_local, contenido):
+            return False
+        # El archivo del día se entrega antes que el rezago acumulado
+        registrado = self.registrar_archivo(ruta_local, OutboxManager.PRIORIDAD_ALTA)
+        if registrado:
+            self.escritor.confirmar(ruta_local)
+        return registrado
+
+    def _recuperar_pendientes(self):
+        """Recuperación al arrancar: solo revisa las intenciones abiertas del diario"""
+        for ruta in self.escritor.recuperar():
+            if self.registrar_archivo(ruta):
+                # Solo lo registrado se cierra; el resto sigue en el diario para el próximo arranque
+                self.escritor.confirmar(ruta)
+                self.logger.info(f"Archivo recuperado del diario: {os.path.basename(ruta)}")
+        self.escritor.compactar()
+        if self.outbox.esta_vacia():
+            self._importar_directorio()
+
+    def _importar_directorio(self):
+        """Migra al outbox archivos de versiones anteriores (solo con la bandeja vacía)"""
+        directorio = self.config.get("directorio_pendientes", "pendientes_usb")
+        if not os.path.isdir(directorio):
+            return
+        for archivo in os.listdir(directorio):
+            ruta = os.path.join(directorio, archivo)
+            if archivo.startswith(".") or not os.path.isfile(ruta) or self.outbox.contiene(ruta):
+                continue
+            self._importar_archivo(ruta)
+
+    def _importar_archivo(self, ruta: str, prioridad: int = OutboxManager.PRIORIDAD_BAJA):
+        archivo = os.path.basename(ruta)
+        creado = os.path.getctime(ruta)
+        if archivo.endswith(".txt"):
+            self.outbox.registrar_archivo(
+                ruta, [OutboxManager.CANAL_FTP], creado=creado, prioridad=prioridad,
+                proximo_intento=self._turno_envio()
+            )
+        elif archivo.endswith(".email_pending"):
+            # Estado heredado: FTP ya exitoso, email pendiente
+            self.outbox.registrar_enviado(ruta, OutboxManager.CANAL_FTP, creado=creado)
+            self.outbox.habilitar_canales(ruta, [OutboxManager.CANAL_EMAIL])
+
+    def _canales_posteriores(self) -> list:
+        """Canales que se habilitan una vez que el FTP fue exitoso"""
+        canales = []
+        if self.sms_config and self.alert_manager:
+            canales.append(OutboxManager.CANAL_SMS)
+        if self.email_config:
+            canales.append(OutboxManager.CANAL_EMAIL)
+        return canales
+
+    def _registrar_resultado(self, entrada: Dict[str, Any], exitoso: bool, error: str = "",
+                             congestion: bool = False, espera_minima: float = 0.0):
+        resultado = "exitoso" if exitoso else ("congestion" if congestion else "fallido")
+        _ENVIOS.etiquetas(entrada["canal"], resultado).incrementar()
+        if exitoso:
+            self.outbox.marcar_enviado(entrada["id"])
+        else:
+            base = self.config.get("reintento_base", self.REINTENTO_BASE)
+            if congestion:
+                # Servidor saturado: el retroceso parte de una espera mayor
+                base = max(base, self.config.get("reintento_congestion", self.REINTENTO_CONGESTION))
+            self.outbox.marcar_fallido(
+                entrada["id"],
+                error,
+                base,
+                self.MAX_INTENTOS_CANAL.get(entrada["canal"]),
+                self.config.get("reintento_maximo", self.REINTENTO_MAXIMO),
+                espera_minima
+            )
+
+    def _finalizar_si_completo(self, ruta_local: str):
+        """Elimina el archivo cuando ya no quedan canales pendientes"""
+        if self.outbox.canales_pendientes(ruta_local) == 0:
+            self._eliminar_archivo_seguro(ruta_local)
+            self.outbox.eliminar_archivo(ruta_local)
+
+    def _ruta_remota(self, archivo: str) -> str:
+        plantilla = self.get_plantilla(archivo)
+        ruta_base = self.config.get("ruta_remota", "/default_conagua").rstrip('/')
+        nombre_remoto = plantilla.get("nombre_remoto", archivo)
+        return f"{ruta_base}/{nombre_remoto}"
+
+    def _transporte(self, archivo: str) -> Tuple[str, IFileTransfer]:
+        """Nombre y transporte que la plantilla del archivo elige (FTP si no está configurado)"""
+        nombre = self.get_plantilla(archivo).get("transporte", self.TRANSPORTE_FTP)
+        transporte = self.transportes.get(nombre)
+        if transporte is None:
+            self.logger.warning(f"Transporte '{nombre}' no configurado para {archivo}; se usa FTP")
+            return self.TRANSPORTE_FTP, self.transfer_service
+        return nombre, transporte
+
+    def _precalentar_directorios(self, entradas):
+        """Un solo listado MLSD por lote en lugar de CWD/MKD por archivo"""
+        if not entradas or "ruta_remota" not in self.config:
+            return
+        try:
+            por_transporte = {}
+            for e in entradas:
+                archivo = os.path.basename(e["ruta"])
+                _, transporte = self._transporte(archivo)
+                if hasattr(transporte, "precalentar_directorios"):
+                    por_transporte.setdefault(id(transporte), (transporte, set()))[1].add(
+                        os.path.dirname(self._ruta_remota(archivo))
+                    )
+            for transporte, directorios in por_transporte.values():
+                transporte.precalentar_directorios(directorios)
+        except Exception as e:
+            self.logger.warning(f"No se pudo precargar directorios remotos: {e}")
+
+    def _procesar_archivo_individual(self, entrada: Dict[str, Any]) -> str:
+        ruta_local = entrada["ruta"]
         archivo = os.path.basename(ruta_local)
         try:
-            plantilla = self.get_plantilla(archivo)
-            ruta_base = self.config.get("ruta_remota", "/default_conagua").rstrip('/')
-            nombre_remoto = plantilla.get("nombre_remoto", archivo)
-            ruta_remota = os.path.join(ruta_base, nombre_remoto)
+            if not os.path.exists(ruta_local):
+                self.logger.warning(f"Archivo pendiente ya no existe: {archivo}")
+                self.outbox.eliminar_archivo(ruta_local)
+                return RESULTADO_ERROR
+
+            ruta_remota = self._ruta_remota(archivo)
+            nombre, transporte = self._transporte(archivo)
+            etiqueta = nombre.upper()
 
-            ftp_exitoso = False
+            exitoso = congestion = False
             if "/default_conagua" in ruta_remota:
                 self.error_handler.log_error("CONFIG_ERROR", f"Falta 'ruta_remota' para {archivo}")
             else:
-                ftp_exitoso = self.transfer_service.enviar_archivo(ruta_local, ruta_remota)
-                if ftp_exitoso:
-                    self.logger.info(f"FTP exitoso: {archivo}")
+                with _DURACION_SUBIDA.etiquetas(type(transporte).__name__).medir_tiempo():
+                    exitoso = transporte.enviar_archivo(ruta_local, ruta_remota)
+                if exitoso:
+                    self.logger.info(f"{etiqueta} exitoso: {archivo}")
                 else:
-                    self.logger.warning(f"Fallo FTP: {archivo}")
+                    self.logger.warning(f"Fallo {etiqueta}: {archivo}")
+                    congestion = getattr(transporte, "fue_congestion", lambda: False)()
+            if exitoso:
+                self._registrar_resultado(entrada, True)
+                self.outbox.habilitar_canales(ruta_local, self._canales_posteriores())
+                # SMS y email avanzan en sus propios pipelines, sin esperarse entre sí
+                self._despachar_posteriores(ruta_local)
+                return RESULTADO_OK
 
-            if ftp_exitoso:
-                # Enviar SMS inmediatamente después de FTP exitoso
-                sms_exitoso = self._enviar_sms_inmediato(ruta_local)
-                if sms_exitoso:
-                    self.logger.info(f"SMS enviado: {archivo}")
-                else:
-                    self.logger.warning(f"Fallo SMS: {archivo}")
-
-                # Luego procesar email
-                if self.email_config:
-                    # Intentar enviar email inmediatamente
-                    if self._enviar_email_inmediato(ruta_local):
-                        self._eliminar_archivo_seguro(ruta_local)
-                        self.logger.info(f"Email enviado y archivo eliminado: {archivo}")
-                    else:
-                        # Renombrar el archivo para indicar que FTP fue exitoso pero email falló
-                        nueva_ruta = ruta_local + ".email_pending"
-                        try:
-                            os.rename(ruta_local, nueva_ruta)
-                            self.logger.warning(f"Email falló, archivo renombrado a: {nueva_ruta}")
-                        except Exception as e:
-                            self.error_handler.log_error("RENAME_FAIL", f"No se pudo renombrar el archivo: {e}")
-                else:
-                    # Eliminar solo si no hay email configurado
-                    self._eliminar_archivo_seguro(ruta_local)
-            else:
-                self.logger.warning(f"Archivo retenido por fallo FTP: {archivo}")
+            self.logger.warning(f"Archivo retenido por fallo {etiqueta}: {archivo}")
+            # Si el servidor indicó cuándo volver (Retry-After), no se reintenta antes
+            sugerida = getattr(transporte, "espera_sugerida", lambda: None)() if congestion else None
+            self._registrar_resultado(
+                entrada, False, "Congestión del servidor" if congestion else f"Fallo {etiqueta}",
+                congestion, sugerida or 0.0
+            )
+            return RESULTADO_CONGESTION if congestion else RESULTADO_ERROR
                 
         except Exception as e:
             self.error_handler.log_error("SCHED_SEND", f"Error procesando {archivo}: {e}")
+            self.outbox.liberar(entrada["id"])
+            return RESULTADO_ERROR
+
+    def _despachar_posteriores(self, ruta_local: str):
+        posteriores = self.outbox.obtener_pendientes_archivo(ruta_local)
+        if not posteriores:
+            self._finalizar_si_completo(ruta_local)
+        for posterior in posteriores:
+            self._despachar(posterior)
+
+    def _despachar(self, entrada: Dict[str, Any]) -> bool:
+        """Email va a los workers SMTP agrupados; el resto a su pipeline.
+
+        La entrada se reserva antes de entregarla, de modo que ni el drenado
+        del FTP ni el vigilante la vuelvan a despachar mientras está en curso.
+        """
+        if not os.path.isfile(entrada["ruta"]):
+            self.outbox.eliminar_archivo(entrada["ruta"])
+            return False
+        if not self.outbox.reservar(entrada["id"], self.config.get("reserva_envio", OutboxManager.RESERVA_DEFECTO)):
+            return False
+        if entrada["canal"] == OutboxManager.CANAL_EMAIL:
+            future = self.encolar_email(entrada["ruta"])
+            future.add_done_callback(lambda f, e=entrada: self._email_completado(e, f))
+        else:
+            self._pipelines[entrada["canal"]].enviar(entrada)
+        return True
+
+    def _email_completado(self, entrada: Dict[str, Any], future: Future):
+        if future.cancelled():
+            # Cancelado al detener: vuelve a la bandeja para el próximo arranque
+            self.outbox.liberar(entrada["id"])
+            return
+        exitoso = future.result()
+        archivo = os.path.basename(entrada["ruta"])
+        if exitoso:
+            self.logger.info(f"EMAIL enviado: {archivo}")
+        else:
+            self.logger.warning(f"Fallo EMAIL: {archivo}")
+        self._registrar_resultado(entrada, exitoso, "" if exitoso else "Fallo EMAIL")
+        self._finalizar_si_completo(entrada["ruta"])
+
+    def _procesar_canal(self, entrada: Dict[str, Any]) -> str:
+        """Envía un archivo por un canal posterior al FTP con pipeline propio (SMS)"""
+        ruta_local = entrada["ruta"]
+        archivo = os.path.basename(ruta_local)
+        if not os.path.isfile(ruta_local):
+            self.outbox.eliminar_archivo(ruta_local)
+            return RESULTADO_ERROR
+        if entrada["canal"] == OutboxManager.CANAL_SMS:
+            exitoso = self._enviar_sms_inmediato(ruta_local)
+        else:
+            return RESULTADO_ERROR
+
+        canal = entrada["canal"].upper()
+        if exitoso:
+            self.logger.info(f"{canal} enviado: {archivo}")
+        else:
+            self.logger.warning(f"Fallo {canal}: {archivo}")
+        self._registrar_resultado(entrada, exitoso, "" if exitoso else f"Fallo {canal}")
+        self._finalizar_si_completo(ruta_local)
+        return RESULTADO_OK if exitoso else RESULTADO_ERROR
+
+    def _drenar_canal(self, canal: str):
+        """Envía todo el trabajo vencido del canal; termina cuando no quedan entradas nuevas"""
+        vistos = set()
+        while True:
+            entradas = [e for e in self.outbox.obtener_pendientes(canal) if e["id"] not in vistos]
+            if not entradas:
+                break
+            if canal == OutboxManager.CANAL_FTP:
+                self._precalentar_directorios(entradas)
+            for entrada in entradas:
+                vistos.add(entrada["id"])
+                self._despachar(entrada)
+            self._pipelines[canal].esperar()
+
+    def _esperar_pipelines(self):
+        for pipeline in self._pipelines.values():
+            pipeline.esperar()
+        if not self._esperar_cola_email(self.ESPERA_EMAIL):
+            self.logger.warning("Envíos de email aún en curso; se completarán en segundo plano")
             
     def _enviar_archivos_pendientes(self):
         with self._lock:
-            directorio = self.config.get("directorio_pendientes", "pendientes_usb")
-            archivos = [f for f in os.listdir(directorio) if f.endswith(".txt")]  # Solo .txt
-            
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                futures = {}
-                for archivo in archivos:
-                    ruta_local = os.path.join(directorio, archivo)
-                    future = executor.submit(self._procesar_archivo_individual, ruta_local)
-                    futures[future] = archivo
-                
-                for future in as_completed(futures):
-                    try:
-                        future.result()
-                    except Exception as e:
-                        archivo = futures[future]
-                        self.error_handler.log_error("SCHED_PARALLEL", f"Error en paralelo: {archivo} - {e}")
+            self._drenar_canal(OutboxManager.CANAL_FTP)
+            self._esperar_pipelines()
+
+    def _reintentar_vencidos(self):
+        """Reintenta solo las entradas cuyo retroceso ya venció, por prioridad"""
+        with self._lock:
+            self._drenar_canal(OutboxManager.CANAL_FTP)
+            # Canales posteriores vencidos (SMS y email), cada uno por su vía
+            for canal in (OutboxManager.CANAL_SMS, OutboxManager.CANAL_EMAIL):
+                for entrada in self.outbox.obtener_pendientes(canal):
+                    self._despachar(entrada)
+            self._esperar_pipelines()
+
+    def metricas_bandeja(self) -> Dict[str, Dict[str, float]]:
+        """Profundidad y antigüedad de la bandeja de salida por canal"""
+        return self.outbox.metricas()
+
+    def _actualizar_metricas(self):
+        _COLA_EMAIL.fijar(self._email_queue.qsize())
+        _LOTES_EMAIL.fijar(self._email_lotes.qsize())
+        for canal, valores in self.metricas_bandeja().items():
+            for estado in ("pendientes", "vencidos", "agotados"):
+                _BANDEJA.etiquetas(canal, estado).fijar(valores[estado])
+            _ANTIGUEDAD.etiquetas(canal).fijar(valores["antiguedad_max"])
 
     def _verificar_pendientes(self):
         with self._lock:
-            directorio = self.config.get("directorio_pendientes", "pendientes_usb")
             max_dias = max(self.config.get("retencion_dias", 7), 180)
             
-            # Procesar archivos .email_pending para reintentar email
-            for archivo in os.listdir(directorio):
-                if archivo.endswith(".email_pending"):
-                    ruta = os.path.join(directorio, archivo)
+            # Eliminar archivos antiguos según la fecha de registro en la bandeja
+            limite = (datetime.now() - timedelta(days=max_dias)).timestamp()
+            for ruta in self.outbox.obtener_antiguos(limite):
+                archivo = os.path.basename(ruta)
+                try:
                     if os.path.isfile(ruta):
-                        # Intentar enviar email
-                        if self._enviar_email_inmediato(ruta):
-                            self._eliminar_archivo_seguro(ruta)
-                            self.logger.info(f"Email enviado en reintento para: {archivo}")
-                        else:
-                            self.logger.warning(f"Reintento de email falló para: {archivo}")
-            
-            # Eliminar archivos antiguos (tanto .txt como .email_pending)
-            for archivo in os.listdir(directorio):
-                ruta = os.path.join(directorio, archivo)
-                if os.path.isfile(ruta):
-                    tiempo_creacion = datetime.fromtimestamp(os.path.getctime(ruta))
-                    if (datetime.now() - tiempo_creacion) > timedelta(days=max_dias):
-                        try:
-                            os.remove(ruta)
-                            self.logger.warning(f"Archivo antiguo eliminado: {archivo}")
-                        except Exception as e:
-                            self.error_handler.log_error("SCHED_CLEAN", f"Error eliminando {archivo}: {e}")
+                        os.remove(ruta)
+                    self.outbox.eliminar_archivo(ruta)
+                    self.logger.warning(f"Archivo antiguo eliminado: {archivo}")
+                except Exception as e:
+                    self.error_handler.log_error("SCHED_CLEAN", f"Error eliminando {archivo}: {e}")
 
     def detener(self):
+        if self._watcher:
+            self._watcher.detener()
+        
         try:
-            if self._scheduler and self._scheduler.running:
-                self._scheduler.shutdown(wait=True)
+            self._scheduler.eliminar(self.TAREA_ENVIO)
+            self._scheduler.eliminar(self.TAREA_VERIFICACION)
+            self._scheduler.eliminar(self.TAREA_REINTENTOS)
+            if self._scheduler_propio and self._scheduler.running:
+                self._scheduler.detener(esperar=True)
                 self.logger.info("Scheduler principal detenido")
         except Exception as e:
             self.error_handler.log_error("SCHED_TOP", f"Error detenido scheduler: {e}")
         
-        self._stop_event.set()
-        self._email_queue.join()
+        for pipeline in self._pipelines.values():
+            pipeline.esperar(timeout=30.0)
+        
+        for transporte in self.transportes.values():
+            if hasattr(transporte, "cerrar"):
+                transporte.cerrar()
         
-        for worker in self._email_workers:
-            worker.join(timeout=3.0)
+        # Los lotes sin enviar se devuelven a la bandeja; no se espera a la red
+        self._stop_event.set()
+        agrupador, workers = self._email_workers[0], self._email_workers[1:]
+        agrupador.join(timeout=3.0)
+        self._vaciar_colas_email()
+        for _ in workers:
+            self._email_lotes.put(None)
+        limite = time.monotonic() + 3.0
+        for worker in workers:
+            worker.join(timeout=max(0.0, limite - time.monotonic()))
+        self._vaciar_colas_email()
+        ocupados = sum(worker.is_alive() for worker in self._email_workers)
+        if ocupados:
+            self.logger.warning(f"{ocupados} worker(s) de email terminan su envío en segundo plano")
         
-        self._stop_event.clear()
         self._email_workers = []
         self._init_email_workers()
             
@@ -0,0 +1,186 @@
+# Tesseract/Core/System/LogPipeline.py
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from logging.handlers import QueueHandler
+from typing import List, Optional
+
+POLITICA_DESCARTAR_NUEVA = "descartar_nueva"
+POLITICA_DESCARTAR_ANTIGUA = "descartar_antigua"
+POLITICA_PRESERVAR_ERRORES = "preservar_errores"  # sacrifica primero registros por debajo de WARNING
+
+class _ColaAcotada:
+    """Cola de registros con capacidad fija; put_nowait nunca bloquea al llamador"""
+
+    def __init__(self, capacidad: int, politica: str):
+        self.capacidad = max(1, capacidad)
+        self.politica = politica
+        self._cond = threading.Condition()
+        self._registros = deque()
+        self._descartados = 0
+
+    def put_nowait(self, registro: logging.LogRecord):
+        with self._cond:
+            if len(self._registros) >= self.capacidad and not self._hacer_lugar(registro):
+                self._descartados += 1
+                return
+            self._registros.append(registro)
+            self._cond.notify()
+
+    def _hacer_lugar(self, registro: logging.LogRecord) -> bool:
+        """Aplica la política de desborde; False si el registro nuevo se descarta"""
+        if self.politica == POLITICA_DESCARTAR_NUEVA:
+            return False
+        if self.politica == POLITICA_PRESERVAR_ERRORES:
+            for i, encolado in enumerate(self._registros):
+                if encolado.levelno < logging.WARNING:
+                    del self._registros[i]
+                    self._descartados += 1
+                    return True
+            if registro.levelno < logging.WARNING:
+                return False
+        self._registros.popleft()
+        self._descartados += 1
+        return True
+
+    def obtener_lote(self, maximo: int, timeout: float) -> List[logging.LogRecord]:
+        with self._cond:
+            if not self._registros:
+                self._cond.wait(timeout)
+            lote = []
+            while self._registros and len(lote) < maximo:
+                lote.append(self._registros.popleft())
+            return lote
+
+    def despertar(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def tomar_descartados(self) -> int:
+        with self._cond:
+            descartados, self._descartados = self._descartados, 0
+            return descartados
+
+    def __len__(self):
+        with self._cond:
+            return len(self._registros)
+
+class ManejadorCola(QueueHandler):
+    """QueueHandler sobre una cola acotada: el hilo que registra solo encola"""
+
+    def __init__(self, capacidad: int = 10000, politica: str = POLITICA_PRESERVAR_ERRORES):
+        super().__init__(_ColaAcotada(capacidad, politica))
+        self.listener: Optional["ListenerLotes"] = None
+
+    def enqueue(self, record: logging.LogRecord):
+        self.queue.put_nowait(record)
+
+class ArchivoLotesHandler(logging.FileHandler):
+    """FileHandler que escribe un lote completo con una sola escritura y un flush"""
+
+    def emitir_lote(self, registros: List[logging.LogRecord]):
+        lineas = []
+        for registro in registros:
+            if registro.levelno < self.level:
+                continue
+            try:
+                lineas.append(self.format(registro) + self.terminator)
+            except Exception:
+                self.handleError(registro)
+        if not lineas:
+            return
+        with self.lock:
+            try:
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write("".join(lineas))
+                self.stream.flush()
+            except Exception:
+                self.handleError(registros[-1])
+
+    def vaciar(self):
+        """Trunca el archivo sin competir con un lote en curso"""
+        with self.lock:
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            open(self.baseFilename, "w").close()
+
+class ListenerLotes:
+    """Hilo único que vacía la cola por lotes hacia los handlers de destino.
+
+    Los handlers con emitir_lote() reciben el lote completo; el resto, registro
+    por registro. Los descartes por desborde se informan como un aviso.
+    """
+    TAMANO_LOTE = 500
+    ESPERA = 0.5   # segundos máximos que un registro espera en la cola
+
+    def __init__(self, cola: _ColaAcotada, handlers: List[logging.Handler],
+                 tamano_lote: int = TAMANO_LOTE, espera: float = ESPERA):
+        self.cola = cola
+        self.handlers = list(handlers)
+        self.tamano_lote = tamano_lote
+        self.espera = espera
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._vaciar_task, name="LogListener", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 5.0):
+        """Detiene el hilo tras escribir lo que quede en la cola"""
+        self._detener.set()
+        self.cola.despertar()
+        if self._hilo:
+            self._hilo.join(timeout)
+            self._hilo = None
+
+    def agregar_handler(self, handler: logging.Handler):
+        self.handlers = self.handlers + [handler]
+
+    def _vaciar_task(self):
+        while True:
+            lote = self.cola.obtener_lote(self.tamano_lote, self.espera)
+            descartados = self.cola.tomar_descartados()
+            if descartados:
+                lote.append(logging.makeLogRecord({
+                    "name": "LogPipeline",
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": f"Cola de log llena: {descartados} registro(s) descartado(s)",
+                    "created": time.time(),
+                }))
+            if lote:
+                self._escribir(lote)
+            elif self._detener.is_set():
+                break
+
+    def _escribir(self, lote: List[logging.LogRecord]):
+        for handler in self.handlers:
+            if hasattr(handler, "emitir_lote"):
+                handler.emitir_lote(lote)
+            else:
+                for registro in lote:
+                    if registro.levelno >= handler.level:
+                        handler.handle(registro)
+
+def configurar_pipeline(logger: logging.Logger, handlers: List[logging.Handler],
+                        capacidad: int = 10000, politica: str = POLITICA_PRESERVAR_ERRORES) -> ListenerLotes:
+    """Conecta el logger a una cola acotada vaciada en segundo plano (idempotente)"""
+    for handler in logger.handlers:
+        if isinstance(handler, ManejadorCola) and handler.listener:
+            return handler.listener
+    manejador = ManejadorCola(capacidad, politica)
+    manejador.listener = ListenerLotes(manejador.queue, handlers)
+    manejador.listener.iniciar()
+    logger.addHandler(manejador)
+    # Al salir se escribe lo pendiente en la cola
+    atexit.register(manejador.listener.detener)
+    return manejador.listener
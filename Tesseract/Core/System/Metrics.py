@@ -0,0 +1,317 @@
+# Tesseract/Core/System/Metrics.py
+
+import bisect
+import logging
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Límites por defecto para duraciones (segundos): de lecturas Modbus a subidas lentas
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor))
+
+def _etiquetas_texto(nombres: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+class SerieContador:
+    """Valor monótono de un contador para una combinación de etiquetas"""
+    __slots__ = ("_lock", "valor")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.valor = 0.0
+
+    def incrementar(self, cantidad: float = 1.0):
+        with self._lock:
+            self.valor += cantidad
+
+class SerieIndicador:
+    """Valor instantáneo (puede subir y bajar) para una combinación de etiquetas"""
+    __slots__ = ("_lock", "valor")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.valor = 0.0
+
+    def fijar(self, valor: float):
+        self.valor = float(valor)   # una asignación no necesita lock
+
+    def incrementar(self, cantidad: float = 1.0):
+        with self._lock:
+            self.valor += cantidad
+
+    def decrementar(self, cantidad: float = 1.0):
+        self.incrementar(-cantidad)
+
+class SerieHistograma:
+    """Conteo por cubetas fijas, suma y cantidad de observaciones"""
+    __slots__ = ("_lock", "limites", "cubetas", "suma", "cuenta")
+
+    def __init__(self, limites: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self.limites = limites
+        self.cubetas = [0] * (len(limites) + 1)   # la última es +Inf
+        self.suma = 0.0
+        self.cuenta = 0
+
+    def observar(self, valor: float):
+        indice = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            self.cubetas[indice] += 1
+            self.suma += valor
+            self.cuenta += 1
+
+    @contextmanager
+    def medir_tiempo(self):
+        """Observa la duración del bloque en segundos (también si lanza excepción)"""
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observar(time.monotonic() - inicio)
+
+    def instantanea(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.cubetas), self.suma, self.cuenta
+
+class _Familia:
+    """Métrica con nombre y etiquetas; cada combinación de valores es una serie"""
+    TIPO = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.nombres_etiquetas = tuple(etiquetas)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _nueva_serie(self):
+        raise NotImplementedError
+
+    def etiquetas(self, *valores) -> object:
+        """Serie para los valores dados, en el orden de las etiquetas declaradas"""
+        clave = tuple(str(v) for v in valores)
+        serie = self._series.get(clave)
+        if serie is None:
+            if len(clave) != len(self.nombres_etiquetas):
+                raise ValueError(f"{self.nombre} espera etiquetas {self.nombres_etiquetas}")
+            with self._lock:
+                serie = self._series.setdefault(clave, self._nueva_serie())
+        return serie
+
+    def _sin_etiquetas(self):
+        return self.etiquetas()
+
+    def exponer(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {_escapar(self.ayuda)}", f"# TYPE {self.nombre} {self.TIPO}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for valores, serie in series:
+            lineas.extend(self._exponer_serie(valores, serie))
+        return lineas
+
+    def _exponer_serie(self, valores, serie) -> List[str]:
+        return [f"{self.nombre}{_etiquetas_texto(self.nombres_etiquetas, valores)} {_numero(serie.valor)}"]
+
+class Contador(_Familia):
+    TIPO = "counter"
+
+    def _nueva_serie(self):
+        return SerieContador()
+
+    def incrementar(self, cantidad: float = 1.0):
+        self._sin_etiquetas().incrementar(cantidad)
+
+class Indicador(_Familia):
+    TIPO = "gauge"
+
+    def _nueva_serie(self):
+        return SerieIndicador()
+
+    def fijar(self, valor: float):
+        self._sin_etiquetas().fijar(valor)
+
+    def incrementar(self, cantidad: float = 1.0):
+        self._sin_etiquetas().incrementar(cantidad)
+
+    def decrementar(self, cantidad: float = 1.0):
+        self._sin_etiquetas().decrementar(cantidad)
+
+class Histograma(_Familia):
+    TIPO = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                 limites: Sequence[float] = LIMITES_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = tuple(sorted(limites))
+
+    def _nueva_serie(self):
+        return SerieHistograma(self.limites)
+
+    def observar(self, valor: float):
+        self._sin_etiquetas().observar(valor)
+
+    def medir_tiempo(self):
+        return self._sin_etiquetas().medir_tiempo()
+
+    def _exponer_serie(self, valores, serie) -> List[str]:
+        cubetas, suma, cuenta = serie.instantanea()
+        lineas, acumulado = [], 0
+        for limite, cantidad in zip(self.limites + (float("inf"),), cubetas):
+            acumulado += cantidad
+            le = _etiquetas_texto(self.nombres_etiquetas, valores, f'le="{_numero(limite)}"')
+            lineas.append(f"{self.nombre}_bucket{le} {acumulado}")
+        etiquetas = _etiquetas_texto(self.nombres_etiquetas, valores)
+        lineas.append(f"{self.nombre}_sum{etiquetas} {_numero(suma)}")
+        lineas.append(f"{self.nombre}_count{etiquetas} {cuenta}")
+        return lineas
+
+class RegistroMetricas:
+    """Registro de métricas del proceso.
+
+    Crear una métrica ya existente devuelve la misma instancia, de modo que
+    cada módulo puede declarar las suyas al importarse. Los colectores se
+    invocan antes de cada exposición para refrescar indicadores derivados
+    (profundidad de colas, estado de la bandeja) sin costo en el camino caliente.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._familias: Dict[str, _Familia] = {}
+        self._colectores: List[Callable] = []   # referencias a funciones
+        self._lock = threading.Lock()
+
+    def _obtener(self, clase, nombre: str, ayuda: str, etiquetas: Sequence[str], **kwargs) -> _Familia:
+        with self._lock:
+            familia = self._familias.get(nombre)
+            if familia is None:
+                familia = self._familias[nombre] = clase(nombre, ayuda, etiquetas, **kwargs)
+            elif type(familia) is not clase or familia.nombres_etiquetas != tuple(etiquetas):
+                raise ValueError(f"Métrica {nombre} ya registrada con otro tipo o etiquetas")
+            return familia
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Contador:
+        return self._obtener(Contador, nombre, ayuda, etiquetas)
+
+    def indicador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Indicador:
+        return self._obtener(Indicador, nombre, ayuda, etiquetas)
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                   limites: Sequence[float] = LIMITES_SEGUNDOS) -> Histograma:
+        return self._obtener(Histograma, nombre, ayuda, etiquetas, limites=limites)
+
+    def agregar_colector(self, funcion: Callable[[], None]):
+        """Registra una función a invocar antes de exponer.
+
+        Los métodos de instancia se guardan por referencia débil: el registro
+        no mantiene vivo al objeto que los aporta.
+        """
+        if hasattr(funcion, "__self__"):
+            referencia = weakref.WeakMethod(funcion)
+        else:
+            referencia = lambda: funcion
+        with self._lock:
+            self._colectores.append(referencia)
+
+    def _ejecutar_colectores(self):
+        with self._lock:
+            colectores = list(self._colectores)
+        muertos = []
+        for referencia in colectores:
+            funcion = referencia()
+            if funcion is None:
+                muertos.append(referencia)
+                continue
+            try:
+                funcion()
+            except Exception as e:
+                self.logger.warning(f"Colector de métricas falló: {e}")
+        if muertos:
+            with self._lock:
+                self._colectores = [r for r in self._colectores if r not in muertos]
+
+    def exponer(self) -> str:
+        """Todas las métricas en formato de texto de Prometheus (0.0.4)"""
+        self._ejecutar_colectores()
+        with self._lock:
+            familias = sorted(self._familias.values(), key=lambda f: f.nombre)
+        lineas = []
+        for familia in familias:
+            lineas.extend(familia.exponer())
+        return "\n".join(lineas) + "\n"
+
+# Registro compartido por todos los módulos del proceso
+REGISTRO = RegistroMetricas()
+
+class ServidorMetricas:
+    """Endpoint HTTP local opcional: GET /metrics devuelve el registro en formato Prometheus"""
+    PUERTO = 9105
+    TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, registro: RegistroMetricas = REGISTRO, puerto: int = PUERTO,
+                 host: str = "127.0.0.1", error_handler=None):
+        self.registro = registro
+        self.puerto = puerto
+        self.host = host
+        self.error_handler = error_handler
+        self.logger = logging.getLogger(__name__)
+        self._servidor = None
+        self._hilo = None
+
+    def _log_error(self, codigo: str, mensaje: str):
+        if self.error_handler:
+            self.error_handler.log_error(codigo, mensaje)
+        else:
+            self.logger.error(mensaje)
+
+    def iniciar(self) -> bool:
+        if self._servidor:
+            return True
+        registro, logger = self.registro, self.logger
+
+        class _Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                cuerpo = registro.exponer().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", ServidorMetricas.TIPO_CONTENIDO)
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, formato, *args):
+                logger.debug(f"{self.address_string()} {formato % args}")
+
+        try:
+            self._servidor = ThreadingHTTPServer((self.host, self.puerto), _Manejador)
+        except OSError as e:
+            self._log_error("MET-001", f"No se pudo abrir el endpoint de métricas en {self.host}:{self.puerto}: {e}")
+            return False
+        self._servidor.daemon_threads = True
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, name="MetricsHTTP", daemon=True)
+        self._hilo.start()
+        self.logger.info(f"Métricas disponibles en http://{self.host}:{self.puerto}/metrics")
+        return True
+
+    def detener(self):
+        if not self._servidor:
+            return
+        self._servidor.shutdown()
+        self._servidor.server_close()
+        self._hilo.join(timeout=5)
+        self._servidor = self._hilo = None
@@ -0,0 +1,340 @@
+# Tesseract/Core/System/OutboxManager.py
+
+import time
+import random
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Iterable
+from Core.System.ErrorHandler import ErrorHandler
+
+class OutboxManager:
+    """Bandeja de salida persistente (SQLite) con estado por archivo y por canal"""
+    CANAL_FTP = "ftp"
+    CANAL_EMAIL = "email"
+    CANAL_SMS = "sms"
+
+    ESTADO_PENDIENTE = "pendiente"
+    ESTADO_ENVIADO = "enviado"
+    ESTADO_AGOTADO = "agotado"
+
+    PRIORIDAD_BAJA = 0      # rezago migrado de versiones anteriores
+    PRIORIDAD_NORMAL = 1
+    PRIORIDAD_ALTA = 2      # archivo del día recién generado
+
+    RESERVA_DEFECTO = 15 * 60   # segundos que una entrada entregada a un envío queda fuera de las consultas
+
+    _ESQUEMA = (
+        """CREATE TABLE IF NOT EXISTS outbox (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               ruta TEXT NOT NULL,
+               canal TEXT NOT NULL,
+               estado TEXT NOT NULL DEFAULT 'pendiente',
+               intentos INTEGER NOT NULL DEFAULT 0,
+               proximo_intento REAL NOT NULL,
+               hash TEXT,
+               creado REAL NOT NULL,
+               ultimo_error TEXT,
+               prioridad INTEGER NOT NULL DEFAULT 1,
+               en_curso_hasta REAL NOT NULL DEFAULT 0,
+               UNIQUE (ruta, canal))""",
+        "CREATE INDEX IF NOT EXISTS idx_outbox_creado ON outbox (creado)",
+    )
+    # Se crean tras migrar columnas: bandejas antiguas aún no tienen 'prioridad'
+    _INDICES = (
+        # Trabajo vencido de un canal en el orden de obtener_pendientes, sin ordenar aparte
+        "CREATE INDEX IF NOT EXISTS idx_outbox_cola ON outbox (canal, estado, prioridad DESC, proximo_intento)",
+        # Reemplazado por idx_outbox_cola
+        "DROP INDEX IF EXISTS idx_outbox_vencidos",
+    )
+
+    def __init__(self, db_path: str = "pendientes.db", error_handler: ErrorHandler = None):
+        self.db_path = db_path
+        self.error_handler = error_handler
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        self._inicializar_esquema()
+
+    def _inicializar_esquema(self):
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for sentencia in self._ESQUEMA:
+                self._conn.execute(sentencia)
+            columnas = {fila["name"] for fila in self._conn.execute("PRAGMA table_info(outbox)")}
+            if "prioridad" not in columnas:
+                # Bandejas creadas antes de existir la prioridad
+                self._conn.execute(
+                    f"ALTER TABLE outbox ADD COLUMN prioridad INTEGER NOT NULL DEFAULT {self.PRIORIDAD_NORMAL}"
+                )
+            if "en_curso_hasta" not in columnas:
+                self._conn.execute("ALTER TABLE outbox ADD COLUMN en_curso_hasta REAL NOT NULL DEFAULT 0")
+            for sentencia in self._INDICES:
+                self._conn.execute(sentencia)
+
+    @staticmethod
+    def calcular_hash(ruta: str) -> Optional[str]:
+        """SHA-256 del contenido del archivo (None si no se puede leer)"""
+        try:
+            digest = hashlib.sha256()
+            with open(ruta, "rb") as f:
+                for bloque in iter(lambda: f.read(65536), b""):
+                    digest.update(bloque)
+            return digest.hexdigest()
+        except OSError:
+            return None
+
+    def registrar_archivo(self, ruta: str, canales: Iterable[str] = (CANAL_FTP,),
+                          creado: float = None, prioridad: int = PRIORIDAD_NORMAL,
+                          proximo_intento: float = None) -> bool:
+        """Registra un archivo pendiente. Si el contenido cambió, reinicia su entrega.
+
+        proximo_intento fija el primer envío (por omisión, de inmediato).
+        """
+        contenido_hash = self.calcular_hash(ruta)
+        if contenido_hash is None:
+            self._log_error("OUTBOX-001", f"No se pudo leer {ruta} para registrarlo")
+            return False
+
+        ahora = time.time()
+        creado = creado if creado is not None else ahora
+        proximo_intento = proximo_intento if proximo_intento is not None else ahora
+        try:
+            with self._lock, self._conn:
+                fila = self._conn.execute(
+                    "SELECT hash FROM outbox WHERE ruta = ? LIMIT 1", (ruta,)
+                ).fetchone()
+                if fila is not None and fila["hash"] != contenido_hash:
+                    # El archivo fue regenerado: se descarta el estado anterior
+                    self._conn.execute("DELETE FROM outbox WHERE ruta = ?", (ruta,))
+                self._conn.executemany(
+                    """INSERT OR IGNORE INTO outbox (ruta, canal, estado, proximo_intento, hash, creado, prioridad)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    [(ruta, canal, self.ESTADO_PENDIENTE, proximo_intento, contenido_hash, creado, prioridad)
+                     for canal in canales]
+                )
+            return True
+        except sqlite3.Error as e:
+            self._log_error("OUTBOX-002", f"Error registrando {ruta}: {e}")
+            return False
+
+    def registrar_enviado(self, ruta: str, canal: str, creado: float = None):
+        """Registra un canal ya completado (migración de estados heredados)"""
+        ahora = time.time()
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    """INSERT OR IGNORE INTO outbox (ruta, canal, estado, proximo_intento, hash, creado)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (ruta, canal, self.ESTADO_ENVIADO, ahora, self.calcular_hash(ruta),
+                     creado if creado is not None else ahora)
+                )
+        except sqlite3.Error as e:
+            self._log_error("OUTBOX-002", f"Error registrando {ruta}: {e}")
+
+    def habilitar_canales(self, ruta: str, canales: Iterable[str]):
+        """Agrega canales dependientes (p. ej. email/SMS tras un FTP exitoso)"""
+        ahora = time.time()
+        try:
+            with self._lock, self._conn:
+                base = self._conn.execute(
+                    "SELECT hash, creado, prioridad FROM outbox WHERE ruta = ? LIMIT 1", (ruta,)
+                ).fetchone()
+                if base is None:
+                    return
+                self._conn.executemany(
+                    """INSERT OR IGNORE INTO outbox (ruta, canal, estado, proximo_intento, hash, creado, prioridad)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    [(ruta, canal, self.ESTADO_PENDIENTE, ahora, base["hash"], base["creado"], base["prioridad"])
+                     for canal in canales]
+                )
+        except sqlite3.Error as e:
+            self._log_error("OUTBOX-003", f"Error habilitando canales para {ruta}: {e}")
+
+    def obtener_pendientes(self, canal: str, limite: int = 500, ahora: float = None) -> List[Dict[str, Any]]:
+        """Trabajo vencido de un canal: primero la prioridad más alta y, dentro de ella, lo que
+        lleva más tiempo vencido, para que los reintentos no queden detrás de lo nuevo"""
+        ahora = ahora if ahora is not None else time.time()
+        try:
+            with self._lock:
+                filas = self._conn.execute(
+                    """SELECT id, ruta, canal, intentos, hash, creado, prioridad FROM outbox
+                       WHERE canal = ? AND estado = ? AND proximo_intento <= ? AND en_curso_hasta <= ?
+                       ORDER BY prioridad DESC, proximo_intento ASC LIMIT ?""",
+                    (canal, self.ESTADO_PENDIENTE, ahora, ahora, limite)
+                ).fetchall()
+            return [dict(fila) for fila in filas]
+        except sqlite3.Error as e:
+            self._log_error("OUTBOX-004", f"Error consultando pendientes de {canal}: {e}")
+            return []
+
+    def obtener_pendientes_archivo(self, ruta: str) -> List[Dict[str, Any]]:
+        """Canales pendientes de un archivo, sin contar el FTP ni los ya en curso, en orden de habilitación"""
+        with self._lock:
+            filas = self._conn.execute(
+                """SELECT id, ruta, canal, intentos, hash, creado, prioridad FROM outbox
+                   WHERE ruta = ? AND canal != ? AND estado = ? AND en_curso_hasta <= ? ORDER BY id""",
+                (ruta, self.CANAL_FTP, self.ESTADO_PENDIENTE, time.time())
+            ).fetchall()
+        return [dict(fila) for fila in filas]
+
+    def obtener_pendientes_rutas(self, rutas: Iterable[str], ahora: float = None) -> List[Dict[str, Any]]:
+        """Trabajo vencido, de cualquier canal, de los archivos indicados"""
+        rutas = list(rutas)
+        ahora = ahora if ahora is not None else time.time()
+        filas = []
+        try:
+            with self._lock:
+                # Por tramos, para no exceder el límite de parámetros de SQLite
+                for i in range(0, len(rutas), 500):
+                    tramo = rutas[i:i + 500]
+                    filas.extend(self._conn.execute(
+                        f"""SELECT id, ruta, canal, intentos, hash, creado, prioridad FROM outbox
+                            WHERE ruta IN ({",".join("?" * len(tramo))}) AND estado = ?
+                            AND proximo_intento <= ? AND en_curso_hasta <= ? ORDER BY id""",
+                        (*tramo, self.ESTADO_PENDIENTE, ahora, ahora)
+                    ).fetchall())
+            return [dict(fila) for fila in filas]
+        except sqlite3.Error as e:
+            self._log_error("OUTBOX-004", f"Error consultando pendientes de {len(rutas)} archivo(s): {e}")
+            return []
+
+    def reservar(self, entrada_id: int, duracion: float = RESERVA_DEFECTO) -> bool:
+        """Marca una entrada pendiente como en curso antes de entregarla a un envío.
+
+        Devuelve False si otra ruta de despacho ya la tiene reservada. La
+        reserva vence sola tras `duracion` por si el envío nunca informa su
+        resultado; marcar_enviado, marcar_fallido y liberar la sueltan antes.
+        """
+        ahora = time.time()
+        try:
+            with self._lock, self._conn:
+                cursor = self._conn.execute(
+                    """UPDATE outbox SET en_curso_hasta = ?
+                       WHERE id = ? AND estado = ? AND en_curso_hasta <= ?""",
+                    (ahora + duracion, entrada_id, self.ESTADO_PENDIENTE, ahora)
+                )
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            self._log_error("OUTBOX-005", f"Error reservando entrada {entrada_id}: {e}")
+            return False
+
+    def liberar(self, entrada_id: int):
+        """Suelta la reserva sin contar un intento (envío cancelado, p. ej. al detener)"""
+        self._actualizar("UPDATE outbox SET en_curso_hasta = 0 WHERE id = ?", (entrada_id,))
+
+    def liberar_reservas(self):
+        """Al arrancar no hay envíos en curso: las reservas que queden son de un cierre abrupto"""
+        self._actualizar("UPDATE outbox SET en_curso_hasta = 0 WHERE en_curso_hasta > ?", (0,))
+
+    def marcar_enviado(self, entrada_id: int):
+        self._actualizar(
+            """UPDATE outbox SET estado = ?, intentos = intentos + 1, ultimo_error = NULL, en_curso_hasta = 0
+               WHERE id = ?""",
+            (self.ESTADO_ENVIADO, entrada_id)
+        )
+
+    def marcar_fallido(self, entrada_id: int, error: str, reintento_base: float,
+                       max_intentos: int = None, reintento_maximo: float = None,
+                       espera_minima: float = 0.0):
+        """Programa el siguiente intento con retroceso exponencial y jitter.
+
+        La espera se duplica con cada fallo (base, 2*base, 4*base... hasta
+        reintento_maximo) y se toma al azar entre la mitad y el total, para que
+        los archivos que fallaron juntos no se reintenten a la vez. Nunca es
+        menor que espera_minima (p. ej. lo indicado por el servidor). Con
+        max_intentos el canal se da por agotado.
+        """
+        with self._lock:
+            fila = self._conn.execute("SELECT intentos FROM outbox WHERE id = ?", (entrada_id,)).fetchone()
+        if fila is None:
+            return
+        intentos = fila["intentos"] + 1
+        estado = self.ESTADO_PENDIENTE
+        if max_intentos is not None and intentos >= max_intentos:
+            estado = self.ESTADO_AGOTADO
+        espera = reintento_base * (2 ** min(intentos - 1, 20))
+        if reintento_maximo is not None:
+            espera = min(espera, reintento_maximo)
+        espera = max(random.uniform(espera / 2, espera), espera_minima)
+        self._actualizar(
+            """UPDATE outbox SET estado = ?, intentos = ?, proximo_intento = ?, ultimo_error = ?,
+                      en_curso_hasta = 0
+               WHERE id = ?""",
+            (estado, intentos, time.time() + espera, error, entrada_id)
+        )
+
+    def metricas(self, ahora: float = None) -> Dict[str, Dict[str, float]]:
+        """Por canal: entradas pendientes, vencidas, agotadas y antigüedad (s) de la más vieja"""
+        ahora = ahora if ahora is not None else time.time()
+        with self._lock:
+            filas = self._conn.execute(
+                """SELECT canal,
+                          SUM(estado = :pendiente) AS pendientes,
+                          SUM(estado = :pendiente AND proximo_intento <= :ahora) AS vencidos,
+                          SUM(estado = :agotado) AS agotados,
+                          MIN(CASE WHEN estado = :pendiente THEN creado END) AS mas_antiguo
+                   FROM outbox GROUP BY canal""",
+                {"pendiente": self.ESTADO_PENDIENTE, "agotado": self.ESTADO_AGOTADO, "ahora": ahora}
+            ).fetchall()
+        return {
+            fila["canal"]: {
+                "pendientes": fila["pendientes"] or 0,
+                "vencidos": fila["vencidos"] or 0,
+                "agotados": fila["agotados"] or 0,
+                "antiguedad_max": ahora - fila["mas_antiguo"] if fila["mas_antiguo"] else 0.0,
+            }
+            for fila in filas
+        }
+
+    def canales_pendientes(self, ruta: str) -> int:
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE ruta = ? AND estado = ?",
+                (ruta, self.ESTADO_PENDIENTE)
+            ).fetchone()
+        return fila[0]
+
+    def eliminar_archivo(self, ruta: str):
+        self._actualizar("DELETE FROM outbox WHERE ruta = ?", (ruta,))
+
+    def obtener_antiguos(self, limite_creado: float) -> List[str]:
+        """Archivos registrados antes de limite_creado (para la política de retención)"""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT DISTINCT ruta FROM outbox WHERE creado < ?", (limite_creado,)
+            ).fetchall()
+        return [fila["ruta"] for fila in filas]
+
+    def contiene(self, ruta: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM outbox WHERE ruta = ? LIMIT 1", (ruta,)
+            ).fetchone() is not None
+
+    def esta_vacia(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM outbox LIMIT 1").fetchone() is None
+
+    def cerrar(self):
+        with self._lock:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+
+    def _actualizar(self, sql: str, parametros: tuple):
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(sql, parametros)
+        except sqlite3.Error as e:
+            self._log_error("OUTBOX-005", f"Error actualizando bandeja de salida: {e}")
+
+    def _log_error(self, codigo: str, contexto: str):
+        if self.error_handler:
+            self.error_handler.log_error(codigo, contexto)
+        else:
+            self.logger.error(f"{codigo}: {contexto}")
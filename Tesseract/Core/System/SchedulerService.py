@@ -0,0 +1,279 @@
+# Tesseract/Core/System/SchedulerService.py
+
+import json
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+from Core.System.ErrorHandler import ErrorHandler
+from Core.System.AtomicWriter import escribir_atomico
+
+def desfase_flota(semilla: str, ventana: float) -> float:
+    """Desfase estable en [0, ventana) segundos derivado de un identificador del equipo.
+
+    Reparte los equipos de la flota de forma uniforme dentro de la ventana y
+    cada equipo conserva el mismo horario entre reinicios.
+    """
+    if ventana <= 0 or not semilla:
+        return 0.0
+    valor = int.from_bytes(hashlib.sha256(semilla.encode("utf-8")).digest()[:8], "big")
+    return (valor / 2 ** 64) * ventana
+
+class _Tarea:
+    def __init__(self, id_tarea: str, funcion: Callable[[], None], hora: tuple = None,
+                 intervalo: float = None, jitter: float = 0.0, recuperar: bool = True,
+                 desfase: float = 0.0):
+        self.id = id_tarea
+        self.funcion = funcion
+        self.hora = hora              # (hora, minuto) para tareas diarias
+        self.desfase = desfase        # segundos fijos después de 'hora'
+        self.intervalo = intervalo    # segundos para tareas periódicas
+        self.jitter = jitter
+        self.recuperar = recuperar
+        self.vencimiento = 0.0        # plazo en reloj monotónico
+        self.en_ejecucion = False
+        self.fallos = 0               # ejecuciones fallidas seguidas
+
+    def proxima_pared(self, desde: datetime) -> datetime:
+        """Próxima ocurrencia en hora de pared (solo tareas diarias)"""
+        hora, minuto = self.hora
+        candidata = desde.replace(hour=hora, minute=minuto, second=0, microsecond=0)
+        candidata += timedelta(seconds=self.desfase)
+        # Con desfases de más de un día la ocurrencia de hoy puede caer mañana
+        while candidata - timedelta(days=1) > desde:
+            candidata -= timedelta(days=1)
+        if candidata <= desde:
+            candidata += timedelta(days=1)
+        return candidata
+
+    def ultima_programada(self, ahora: datetime) -> datetime:
+        """Ocurrencia más reciente que ya debió ejecutarse"""
+        return self.proxima_pared(ahora) - timedelta(days=1)
+
+class SchedulerService:
+    """Servicio único de tareas programadas del núcleo (envíos, reintentos, reportes, retención).
+
+    Los plazos se miden con el reloj monotónico; la hora de pared solo se usa
+    para calcular la siguiente ocurrencia de las tareas diarias, que se
+    recalculan si el reloj del sistema salta (p. ej. sincronización NTP al
+    arrancar). La última ejecución exitosa de cada tarea se persiste para
+    recuperar las ejecuciones perdidas mientras el equipo estuvo apagado; una
+    tarea que lanza una excepción o devuelve False no cuenta como ejecutada.
+    """
+    SALTO_RELOJ = 30.0   # segundos de desfase pared/monotónico que se consideran un salto
+    REINTENTO_FALLIDA = 300.0        # primer reintento de una tarea diaria fallida; se duplica
+    REINTENTO_FALLIDA_MAXIMO = 3600.0
+
+    def __init__(self, ruta_estado: str = "scheduler_estado.json", error_handler: ErrorHandler = None,
+                 max_workers: int = 4):
+        self.ruta_estado = ruta_estado
+        self.error_handler = error_handler
+        self.max_workers = max_workers
+        self.logger = logging.getLogger(__name__)
+
+        self._cond = threading.Condition()
+        self._lock_estado = threading.Lock()
+        self._tareas: Dict[str, _Tarea] = {}
+        self._estado = self._cargar_estado()
+        self._executor = None
+        self._hilo = None
+        self._detener = False
+        self._desfase = self._desfase_reloj()
+
+    @property
+    def running(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    # --- Registro de tareas ---
+
+    def programar_diario(self, id_tarea: str, hora: str, funcion: Callable[[], None],
+                         jitter: float = 0.0, recuperar: bool = True, desfase: float = 0.0):
+        """Ejecuta 'funcion' cada día a la hora 'HH:MM' más 'desfase' segundos fijos
+        (y un retraso aleatorio de hasta 'jitter' s)"""
+        hora_num, minuto = map(int, hora.split(":"))
+        if not (0 <= hora_num <= 23 and 0 <= minuto <= 59):
+            raise ValueError(f"Hora fuera de rango: {hora}")
+        self._registrar(_Tarea(id_tarea, funcion, hora=(hora_num, minuto), jitter=jitter,
+                               recuperar=recuperar, desfase=desfase))
+
+    def programar_intervalo(self, id_tarea: str, segundos: float, funcion: Callable[[], None],
+                            jitter: float = 0.0, recuperar: bool = True):
+        """Ejecuta 'funcion' cada 'segundos'"""
+        if segundos <= 0:
+            raise ValueError("El intervalo debe ser positivo")
+        self._registrar(_Tarea(id_tarea, funcion, intervalo=segundos, jitter=jitter, recuperar=recuperar))
+
+    def eliminar(self, id_tarea: str):
+        with self._cond:
+            self._tareas.pop(id_tarea, None)
+            self._cond.notify_all()
+
+    def tiene_tarea(self, id_tarea: str) -> bool:
+        with self._cond:
+            return id_tarea in self._tareas
+
+    def ejecutar_ahora(self, id_tarea: str):
+        with self._cond:
+            tarea = self._tareas.get(id_tarea)
+            if tarea:
+                tarea.vencimiento = time.monotonic()
+                self._cond.notify_all()
+
+    def proxima_ejecucion(self, id_tarea: str) -> Optional[datetime]:
+        with self._cond:
+            tarea = self._tareas.get(id_tarea)
+            if tarea is None:
+                return None
+            return datetime.now() + timedelta(seconds=max(0.0, tarea.vencimiento - time.monotonic()))
+
+    def _registrar(self, tarea: _Tarea):
+        with self._cond:
+            anterior = self._tareas.get(tarea.id)
+            tarea.en_ejecucion = anterior.en_ejecucion if anterior else False
+            if tarea.recuperar and self._perdida(tarea):
+                # Se perdió al menos una ejecución mientras el sistema estaba detenido
+                self.logger.info(f"Recuperando ejecución perdida de '{tarea.id}'")
+                tarea.vencimiento = time.monotonic() + random.uniform(0, tarea.jitter)
+            else:
+                tarea.vencimiento = self._calcular_vencimiento(tarea)
+            self._tareas[tarea.id] = tarea
+            # Primera vez que se ve la tarea: desde ahora cuentan las ejecuciones perdidas
+            nueva = tarea.id not in self._estado
+            if nueva:
+                self._estado[tarea.id] = time.time()
+            estado = dict(self._estado)
+            self._cond.notify_all()
+        if nueva:
+            self._guardar_estado(estado)
+
+    def _perdida(self, tarea: _Tarea) -> bool:
+        ultima = self._estado.get(tarea.id)
+        if ultima is None:
+            return False
+        if tarea.hora:
+            return ultima < tarea.ultima_programada(datetime.now()).timestamp()
+        return time.time() - ultima >= tarea.intervalo
+
+    def _calcular_vencimiento(self, tarea: _Tarea) -> float:
+        if tarea.hora:
+            ahora = datetime.now()
+            espera = (tarea.proxima_pared(ahora) - ahora).total_seconds()
+        else:
+            espera = tarea.intervalo
+        return time.monotonic() + espera + random.uniform(0, tarea.jitter)
+
+    # --- Ciclo principal ---
+
+    def iniciar(self):
+        with self._cond:
+            if self.running:
+                return
+            self._detener = False
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="Tarea")
+            self._hilo = threading.Thread(target=self._ciclo, name="SchedulerService", daemon=True)
+            self._hilo.start()
+        self.logger.info("Servicio de programación iniciado")
+
+    def detener(self, esperar: bool = True):
+        with self._cond:
+            self._detener = True
+            self._cond.notify_all()
+            hilo, executor = self._hilo, self._executor
+            self._hilo = self._executor = None
+        if hilo:
+            hilo.join(timeout=3.0)
+        if executor:
+            executor.shutdown(wait=esperar)
+        self.logger.info("Servicio de programación detenido")
+
+    def _ciclo(self):
+        with self._cond:
+            while not self._detener:
+                self._revisar_salto_reloj()
+                ahora = time.monotonic()
+                for tarea in list(self._tareas.values()):
+                    if tarea.vencimiento <= ahora:
+                        self._lanzar(tarea)
+                proximo = min((t.vencimiento for t in self._tareas.values()), default=None)
+                espera = 60.0 if proximo is None else max(0.0, proximo - time.monotonic())
+                # Despertar al menos cada minuto para detectar saltos del reloj de pared
+                self._cond.wait(min(espera, 60.0))
+
+    def _lanzar(self, tarea: _Tarea):
+        """Se llama con el lock tomado; reprograma antes de ejecutar"""
+        tarea.vencimiento = self._calcular_vencimiento(tarea)
+        if tarea.en_ejecucion:
+            # La ejecución anterior sigue en curso: no se acumulan ejecuciones
+            self.logger.warning(f"Tarea '{tarea.id}' omitida: la ejecución anterior no ha terminado")
+            return
+        tarea.en_ejecucion = True
+        self._executor.submit(self._ejecutar, tarea)
+
+    def _ejecutar(self, tarea: _Tarea):
+        inicio = time.monotonic()
+        exitosa = False
+        try:
+            exitosa = tarea.funcion() is not False
+        except Exception as e:
+            self._log_error("SCHED_JOB", f"Error en tarea '{tarea.id}': {e}")
+        finally:
+            estado = None
+            with self._cond:
+                tarea.en_ejecucion = False
+                if exitosa:
+                    tarea.fallos = 0
+                    self._estado[tarea.id] = time.time()
+                    estado = dict(self._estado)
+                elif tarea.hora and tarea.recuperar and self._tareas.get(tarea.id) is tarea:
+                    # Sin esperar al día siguiente: reintento con retroceso hasta que funcione
+                    espera = min(self.REINTENTO_FALLIDA * 2 ** tarea.fallos, self.REINTENTO_FALLIDA_MAXIMO)
+                    tarea.fallos += 1
+                    tarea.vencimiento = min(tarea.vencimiento, time.monotonic() + espera)
+                    self._cond.notify_all()
+                    self.logger.warning(f"Tarea '{tarea.id}' fallida; se reintenta en {espera:.0f}s")
+            if estado is not None:
+                self._guardar_estado(estado)
+            self.logger.debug(f"Tarea '{tarea.id}' terminada en {time.monotonic() - inicio:.1f}s")
+
+    def _revisar_salto_reloj(self):
+        desfase = self._desfase_reloj()
+        if abs(desfase - self._desfase) > self.SALTO_RELOJ:
+            self.logger.warning("Cambio del reloj del sistema detectado; recalculando tareas diarias")
+            for tarea in self._tareas.values():
+                if tarea.hora:
+                    tarea.vencimiento = self._calcular_vencimiento(tarea)
+        self._desfase = desfase
+
+    @staticmethod
+    def _desfase_reloj() -> float:
+        return time.time() - time.monotonic()
+
+    # --- Persistencia ---
+
+    def _cargar_estado(self) -> Dict[str, float]:
+        if not os.path.exists(self.ruta_estado):
+            return {}
+        try:
+            with open(self.ruta_estado, "r", encoding="utf-8") as f:
+                return {k: float(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError, AttributeError) as e:
+            self._log_error("SCHED_STORE", f"Estado de tareas ilegible, se reinicia: {e}")
+            return {}
+
+    def _guardar_estado(self, estado: Dict[str, float]):
+        try:
+            with self._lock_estado:
+                escribir_atomico(self.ruta_estado, json.dumps(estado, indent=2))
+        except OSError as e:
+            self._log_error("SCHED_STORE", f"No se pudo guardar el estado de tareas: {e}")
+
+    def _log_error(self, codigo: str, contexto: str):
+        if self.error_handler:
+            self.error_handler.log_error(codigo, contexto)
+        else:
+            self.logger.error(f"{codigo}: {contexto}")
@@ -0,0 +1,577 @@
+# Tesseract/Core/System/StructuredLog.py
+
+import os
+import re
+import gzip
+import json
+import sqlite3
+import logging
+import threading
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_PALABRA = re.compile(r"[^\W_]+", re.UNICODE)
+MAX_TEXTO = 2000   # caracteres indexados por registro; acota mensajes muy largos
+
+def tokenizar(texto: str) -> List[str]:
+    """Términos en minúsculas y sin tildes, sin repetir y en orden de aparición.
+
+    Sigue las reglas del tokenizador unicode61 de FTS5 para que el filtrado en
+    memoria (cola del log, segmentos archivados) coincida con el índice.
+    """
+    plano = "".join(c for c in unicodedata.normalize("NFKD", (texto or "").lower())
+                    if not unicodedata.combining(c))
+    return list(dict.fromkeys(_PALABRA.findall(plano)))
+
+def texto_busqueda(datos: Dict[str, Any]) -> str:
+    """Texto buscable de un registro: código, origen y mensaje"""
+    return " ".join((datos.get("codigo") or "", datos.get("origen") or "", datos.get("mensaje", "")))[:MAX_TEXTO]
+
+def coincide_texto(datos: Dict[str, Any], consulta: List[str]) -> bool:
+    """True si cada término de la consulta es prefijo de algún término del registro"""
+    terminos = tokenizar(texto_busqueda(datos))
+    return all(any(t.startswith(q) for t in terminos) for q in consulta)
+
+class IndiceLog:
+    """Índice SQLite del log estructurado: una fila por registro con su offset en el archivo.
+
+    Además mantiene un índice invertido sobre código, origen y mensaje con
+    búsqueda por prefijo: una tabla FTS5 (rowid = offset) si SQLite la incluye
+    o, si no, una tabla término -> offset recorrida por rango de clave.
+    """
+    VERSION = 2   # 2: agrega el índice de texto
+
+    _ESQUEMA = (
+        """CREATE TABLE IF NOT EXISTS registros (
+               offset INTEGER PRIMARY KEY,
+               longitud INTEGER NOT NULL,
+               ts REAL NOT NULL,
+               dia TEXT NOT NULL,
+               nivel TEXT NOT NULL,
+               codigo TEXT,
+               medidor TEXT)""",
+        "CREATE INDEX IF NOT EXISTS idx_registros_dia ON registros (dia, ts)",
+        "CREATE INDEX IF NOT EXISTS idx_registros_codigo ON registros (codigo, ts)",
+    )
+    _ESQUEMA_FTS = (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS busqueda USING fts5("
+        "texto, prefix='2 3', tokenize='unicode61 remove_diacritics 1')"
+    )
+    _ESQUEMA_TERMINOS = (
+        """CREATE TABLE IF NOT EXISTS terminos (
+               termino TEXT NOT NULL,
+               offset INTEGER NOT NULL,
+               PRIMARY KEY (termino, offset)) WITHOUT ROWID"""
+    )
+
+    def __init__(self, ruta_db: str):
+        self.ruta_db = ruta_db
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta_db, check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for sentencia in self._ESQUEMA:
+                self._conn.execute(sentencia)
+            self.fts = self._crear_indice_texto()
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] < self.VERSION:
+                # Índice anterior sin texto: se vacía y el handler lo reconstruye al abrir
+                self._conn.execute("DELETE FROM registros")
+                self._conn.execute(f"PRAGMA user_version = {self.VERSION}")
+
+    def _crear_indice_texto(self) -> bool:
+        """True si se usa FTS5; False si se recurre a la tabla de términos"""
+        existentes = {fila[0] for fila in self._conn.execute("SELECT name FROM sqlite_master")}
+        if "terminos" not in existentes:
+            try:
+                self._conn.execute(self._ESQUEMA_FTS)
+                return True
+            except sqlite3.OperationalError:
+                pass   # SQLite compilado sin FTS5
+        self._conn.execute(self._ESQUEMA_TERMINOS)
+        return False
+
+    def agregar(self, filas: Iterable[Tuple], textos: Iterable[Tuple[int, str]] = ()):
+        """filas: (offset, longitud, ts, dia, nivel, codigo, medidor); textos: (offset, texto buscable)"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO registros VALUES (?, ?, ?, ?, ?, ?, ?)", filas
+            )
+            if self.fts:
+                self._conn.executemany("INSERT OR REPLACE INTO busqueda (rowid, texto) VALUES (?, ?)", textos)
+            else:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO terminos VALUES (?, ?)",
+                    ((termino, offset) for offset, texto in textos for termino in tokenizar(texto))
+                )
+
+    def fin_indexado(self) -> int:
+        """Byte del archivo hasta el que llega el índice"""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT offset + longitud FROM registros ORDER BY offset DESC LIMIT 1"
+            ).fetchone()
+        return fila[0] if fila else 0
+
+    def truncar(self, desde_offset: int = 0):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM registros WHERE offset >= ?", (desde_offset,))
+            if self.fts:
+                self._conn.execute("DELETE FROM busqueda WHERE rowid >= ?", (desde_offset,))
+            else:
+                self._conn.execute("DELETE FROM terminos WHERE offset >= ?", (desde_offset,))
+
+    def buscar(self, dia: str = None, desde: float = None, hasta: float = None,
+               codigo: str = None, nivel: str = None, limite: int = None,
+               dia_prefijo: str = None, hasta_offset: int = None,
+               texto: str = None, recientes: bool = False) -> List[Tuple[int, int]]:
+        """(offset, longitud) de los registros que cumplen los filtros, en orden cronológico.
+
+        dia_prefijo acepta fechas parciales ('2025-06'); hasta_offset limita la
+        consulta a lo ya escrito en un momento dado. Cada palabra de 'texto' debe
+        ser prefijo de algún término del registro. Con 'recientes' el límite
+        conserva los registros más nuevos en lugar de los más antiguos.
+        """
+        origen, orden = "registros", "offset"
+        condiciones, parametros = [], []
+        consulta = tokenizar(texto)
+        if consulta and self.fts:
+            # La tabla FTS5 guía la consulta y entrega los offsets ya ordenados
+            origen = "busqueda JOIN registros ON registros.offset = busqueda.rowid"
+            orden = "busqueda.rowid"
+            condiciones.append("busqueda MATCH ?")
+            # Cada término como prefijo ('*'), unidos por AND; solo contienen letras y dígitos
+            parametros.append(" ".join(f'"{prefijo}"*' for prefijo in consulta))
+        elif consulta:
+            for prefijo in consulta:
+                condiciones.append("offset IN (SELECT offset FROM terminos WHERE termino >= ? AND termino < ?)")
+                parametros.extend((prefijo, prefijo[:-1] + chr(ord(prefijo[-1]) + 1)))
+        for columna, operador, valor in (("dia", "=", dia), ("ts", ">=", desde), ("ts", "<", hasta),
+                                         ("codigo", "=", codigo), ("nivel", "=", nivel),
+                                         ("dia", "LIKE", f"{dia_prefijo}%" if dia_prefijo else None),
+                                         ("offset", "<", hasta_offset)):
+            if valor is not None:
+                condiciones.append(f"{columna} {operador} ?")
+                parametros.append(valor)
+        sql = f"SELECT offset, longitud FROM {origen}"
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+        sql += f" ORDER BY {orden} DESC" if recientes else f" ORDER BY {orden}"
+        if limite:
+            sql += " LIMIT ?"
+            parametros.append(limite)
+        with self._lock:
+            filas = self._conn.execute(sql, parametros).fetchall()
+        return filas[::-1] if recientes else filas
+
+    def contar(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM registros").fetchone()[0]
+
+    def valores(self, columna: str) -> List[str]:
+        """Valores distintos de 'dia' o 'codigo' (para poblar filtros)"""
+        if columna not in ("dia", "codigo"):
+            raise ValueError(f"Columna no indexada: {columna}")
+        with self._lock:
+            filas = self._conn.execute(
+                f"SELECT DISTINCT {columna} FROM registros WHERE {columna} IS NOT NULL ORDER BY {columna}"
+            ).fetchall()
+        return [fila[0] for fila in filas]
+
+    def cerrar(self):
+        with self._lock:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+
+def registro_a_dict(registro: logging.LogRecord) -> Dict[str, Any]:
+    """Campos del log estructurado a partir de un LogRecord"""
+    return {
+        "ts": round(registro.created, 3),
+        "fecha": datetime.fromtimestamp(registro.created).strftime("%Y-%m-%d %H:%M:%S"),
+        "nivel": registro.levelname,
+        "codigo": getattr(registro, "codigo", None),
+        "origen": registro.module,
+        "medidor": getattr(registro, "medidor", None),
+        "mensaje": registro.getMessage(),
+    }
+
+class ArchivoSegmentos:
+    """Segmentos comprimidos (gzip) del log estructurado y su manifiesto.
+
+    Cada entrada del manifiesto guarda el rango de tiempo, los días cubiertos y
+    los conteos por código y nivel, de modo que una consulta por fecha solo
+    descomprime los segmentos que la contienen. El espacio total se acota
+    eliminando los segmentos más antiguos.
+    """
+    MANIFIESTO = "manifiesto.json"
+    MAX_BYTES_TOTAL = 100 * 1024 * 1024
+
+    def __init__(self, directorio: str = "logs", max_bytes_total: int = MAX_BYTES_TOTAL):
+        self.directorio = directorio
+        self.max_bytes_total = max_bytes_total
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    @property
+    def ruta_manifiesto(self) -> str:
+        return os.path.join(self.directorio, self.MANIFIESTO)
+
+    def _cargar(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self.ruta_manifiesto, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Manifiesto de log ilegible: {e}")
+            return []
+
+    def archivar(self, ruta_activa: str) -> Optional[Dict[str, Any]]:
+        """Comprime el archivo activo como nuevo segmento (no lo vacía)"""
+        with self._lock:
+            entrada = {"desde": None, "hasta": None, "registros": 0, "dias": [], "codigos": {}, "niveles": {}}
+            temporal = os.path.join(self.directorio, ".segmento.tmp")
+            with open(ruta_activa, "rb") as origen, gzip.open(temporal, "wb") as destino:
+                for linea in origen:
+                    if not linea.endswith(b"\n"):
+                        break
+                    try:
+                        datos = json.loads(linea)
+                    except ValueError:
+                        continue
+                    destino.write(linea)
+                    self._acumular(entrada, datos)
+            if not entrada["registros"]:
+                os.remove(temporal)
+                return None
+
+            inicio = datetime.fromtimestamp(entrada["desde"]).strftime("%Y%m%d_%H%M%S")
+            entrada["archivo"] = f"errores_{inicio}_{entrada['registros']}.jsonl.gz"
+            os.replace(temporal, os.path.join(self.directorio, entrada["archivo"]))
+            entrada["bytes"] = os.path.getsize(os.path.join(self.directorio, entrada["archivo"]))
+
+            manifiesto = self._cargar() + [entrada]
+            manifiesto = self._aplicar_retencion(manifiesto)
+            self._guardar(manifiesto)
+            return entrada
+
+    def _guardar(self, manifiesto: List[Dict[str, Any]]):
+        # Escritura atómica local: AtomicWriter depende de ErrorHandler, que usa este módulo
+        temporal = f"{self.ruta_manifiesto}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.ruta_manifiesto)
+
+    @staticmethod
+    def _acumular(entrada: Dict[str, Any], datos: Dict[str, Any]):
+        ts = datos.get("ts", 0.0)
+        entrada["desde"] = ts if entrada["desde"] is None else min(entrada["desde"], ts)
+        entrada["hasta"] = ts if entrada["hasta"] is None else max(entrada["hasta"], ts)
+        entrada["registros"] += 1
+        dia = datos.get("fecha", "")[:10]
+        if dia and dia not in entrada["dias"]:
+            entrada["dias"].append(dia)
+        codigo = datos.get("codigo") or ""
+        entrada["codigos"][codigo] = entrada["codigos"].get(codigo, 0) + 1
+        nivel = datos.get("nivel", "")
+        entrada["niveles"][nivel] = entrada["niveles"].get(nivel, 0) + 1
+
+    def _aplicar_retencion(self, manifiesto: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        total = sum(e.get("bytes", 0) for e in manifiesto)
+        while manifiesto and total > self.max_bytes_total and len(manifiesto) > 1:
+            antiguo = manifiesto.pop(0)
+            total -= antiguo.get("bytes", 0)
+            try:
+                os.remove(os.path.join(self.directorio, antiguo["archivo"]))
+            except OSError:
+                pass
+            self.logger.info(f"Segmento de log eliminado por retención: {antiguo['archivo']}")
+        return manifiesto
+
+    def segmentos(self, dia_prefijo: str = None, desde: float = None, hasta: float = None,
+                  codigo: str = None, nivel: str = None) -> List[Dict[str, Any]]:
+        """Entradas del manifiesto que pueden contener registros del filtro (sin abrirlas)"""
+        with self._lock:
+            manifiesto = self._cargar()
+        return [
+            e for e in manifiesto
+            if (not dia_prefijo or any(d.startswith(dia_prefijo) for d in e["dias"]))
+            and (desde is None or e["hasta"] >= desde)
+            and (hasta is None or e["desde"] < hasta)
+            and (codigo is None or codigo in e["codigos"])
+            and (nivel is None or nivel in e["niveles"])
+        ]
+
+    def leer(self, entrada: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Registros de un segmento; uno eliminado por retención tras consultar el manifiesto no rinde nada"""
+        try:
+            with gzip.open(os.path.join(self.directorio, entrada["archivo"]), "rb") as f:
+                for linea in f:
+                    try:
+                        yield json.loads(linea)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            self.logger.warning(f"Segmento de log ya no existe: {entrada['archivo']}")
+        except (OSError, EOFError) as e:
+            self.logger.error(f"Segmento de log ilegible {entrada['archivo']}: {e}")
+
+class JSONLHandler(logging.Handler):
+    """Escribe cada registro como una línea JSON e indexa su offset por día y código.
+
+    Pensado para el ListenerLotes: emitir_lote() hace una escritura y una
+    transacción del índice por lote. Si el proceso se interrumpe entre ambas,
+    la cola sin indexar se recupera al abrir.
+
+    Con un ArchivoSegmentos el archivo activo rota al cambiar de día o al
+    superar max_bytes: se comprime como segmento y se empieza vacío.
+    """
+    MAX_BYTES = 5 * 1024 * 1024
+
+    def __init__(self, ruta: str = "errores.jsonl", ruta_indice: str = None, level=logging.NOTSET,
+                 archivo: ArchivoSegmentos = None, max_bytes: int = MAX_BYTES):
+        super().__init__(level)
+        self.ruta = ruta
+        self.archivo = archivo
+        self.max_bytes = max_bytes
+        self.indice = IndiceLog(ruta_indice or f"{os.path.splitext(ruta)[0]}_idx.db")
+        self._archivo = open(ruta, "ab")
+        self._dia_activo = self._primer_dia()
+        self._reconciliar()
+
+    def _primer_dia(self) -> Optional[str]:
+        for _, datos in leer_desde(self.ruta, 0):
+            return datos.get("fecha", "")[:10] or None
+        return None
+
+    def _reconciliar(self):
+        """Alinea el índice con el archivo tras un cierre abrupto"""
+        tamano = os.path.getsize(self.ruta)
+        fin = self.indice.fin_indexado()
+        if fin > tamano:
+            # El archivo fue truncado o reemplazado: se reindexa completo
+            self.indice.truncar(0)
+            fin = 0
+        if fin < tamano:
+            filas, textos = [], []
+            for fila, datos in leer_desde(self.ruta, fin):
+                filas.append(fila)
+                textos.append((fila[0], texto_busqueda(datos)))
+            self.indice.agregar(filas, textos)
+
+    def emit(self, record: logging.LogRecord):
+        self.emitir_lote([record])
+
+    def _vaciar(self):
+        self._archivo.truncate(0)
+        self._archivo.seek(0)
+        self.indice.truncar(0)
+        self._dia_activo = None
+
+    def rotar(self):
+        """Archiva el contenido actual como segmento comprimido y empieza un archivo vacío"""
+        with self.lock:
+            self._rotar()
+
+    def _rotar(self):
+        if self.archivo is None:
+            return
+        self._archivo.flush()
+        try:
+            self.archivo.archivar(self.ruta)
+        except OSError as e:
+            # Sin espacio o sin permisos: se conserva el archivo activo tal cual
+            logging.getLogger(__name__).error(f"No se pudo archivar {self.ruta}: {e}")
+            return
+        self._vaciar()
+
+    def emitir_lote(self, registros: List[logging.LogRecord]):
+        lineas, filas, textos = [], [], []
+        with self.lock:
+            try:
+                offset = self._archivo.tell()
+                for registro in registros:
+                    if registro.levelno < self.level:
+                        continue
+                    datos = registro_a_dict(registro)
+                    dia = datos["fecha"][:10]
+                    if self.archivo and self._dia_activo and (
+                            dia != self._dia_activo or offset >= self.max_bytes):
+                        self._escribir(lineas, filas, textos)
+                        lineas, filas, textos = [], [], []
+                        self._rotar()
+                        offset = self._archivo.tell()
+                    self._dia_activo = self._dia_activo or dia
+                    linea = (json.dumps(datos, ensure_ascii=False) + "\n").encode("utf-8")
+                    filas.append(_fila_indice(offset, len(linea), datos))
+                    textos.append((offset, texto_busqueda(datos)))
+                    lineas.append(linea)
+                    offset += len(linea)
+                self._escribir(lineas, filas, textos)
+            except Exception:
+                self.handleError(registros[-1])
+
+    def _escribir(self, lineas: List[bytes], filas: List[Tuple], textos: List[Tuple[int, str]]):
+        if not lineas:
+            return
+        self._archivo.write(b"".join(lineas))
+        self._archivo.flush()
+        self.indice.agregar(filas, textos)
+
+    def close(self):
+        with self.lock:
+            try:
+                self._archivo.close()
+            finally:
+                self.indice.cerrar()
+        super().close()
+
+def _fila_indice(offset: int, longitud: int, datos: Dict[str, Any]) -> Tuple:
+    return (offset, longitud, datos["ts"], datos["fecha"][:10], datos["nivel"],
+            datos.get("codigo"), datos.get("medidor"))
+
+def leer_desde(ruta: str, offset: int = 0) -> Iterator[Tuple[Tuple, Dict[str, Any]]]:
+    """Recorre el archivo desde 'offset' devolviendo (fila de índice, registro).
+
+    Se detiene en la primera línea incompleta (escritura en curso).
+    """
+    with open(ruta, "rb") as f:
+        f.seek(offset)
+        for linea in f:
+            if not linea.endswith(b"\n"):
+                break
+            try:
+                datos = json.loads(linea)
+            except ValueError:
+                offset += len(linea)
+                continue
+            yield _fila_indice(offset, len(linea), datos), datos
+            offset += len(linea)
+
+class LectorIncremental:
+    """Lee solo lo agregado al log desde la última lectura.
+
+    Recuerda el offset en bytes; si el archivo se vació o fue reemplazado
+    (rotación) lo indica para que el consumidor recargue desde cero.
+    """
+
+    def __init__(self, ruta: str = "errores.jsonl", offset: int = 0):
+        self.ruta = ruta
+        self.offset = offset
+        self._identidad = None
+
+    def posicionar(self, offset: int):
+        self.offset = offset
+        try:
+            info = os.stat(self.ruta)
+            self._identidad = (info.st_dev, info.st_ino)
+        except OSError:
+            self._identidad = None
+
+    def leer_nuevos(self) -> Tuple[bool, List[Tuple[int, int, Dict[str, Any]]]]:
+        """(reiniciado, [(offset, longitud, registro)]) de las líneas completas nuevas"""
+        try:
+            info = os.stat(self.ruta)
+        except OSError:
+            reiniciado = self.offset > 0
+            self.offset, self._identidad = 0, None
+            return reiniciado, []
+
+        identidad = (info.st_dev, info.st_ino)
+        reiniciado = (self._identidad is not None and identidad != self._identidad) or info.st_size < self.offset
+        if reiniciado:
+            self.offset = 0
+        self._identidad = identidad
+        if info.st_size == self.offset:
+            return reiniciado, []
+
+        nuevos = [(fila[0], fila[1], datos) for fila, datos in leer_desde(self.ruta, self.offset)]
+        if nuevos:
+            self.offset = nuevos[-1][0] + nuevos[-1][1]
+        return reiniciado, nuevos
+
+class LectorLog:
+    """Consultas sobre el log estructurado sin recorrer el archivo completo"""
+
+    def __init__(self, ruta: str = "errores.jsonl", ruta_indice: str = None,
+                 archivo: ArchivoSegmentos = None):
+        self.ruta = ruta
+        self.ruta_indice = ruta_indice or f"{os.path.splitext(ruta)[0]}_idx.db"
+        self.archivo = archivo
+        self._indice: Optional[IndiceLog] = None
+
+    @property
+    def indice(self) -> IndiceLog:
+        if self._indice is None:
+            self._indice = IndiceLog(self.ruta_indice)
+        return self._indice
+
+    def consultar(self, dia: str = None, desde: float = None, hasta: float = None,
+                  codigo: str = None, nivel: str = None, limite: int = None,
+                  texto: str = None) -> List[Dict[str, Any]]:
+        """Registros filtrados por día ('YYYY-MM-DD'), rango de tiempo, código, nivel o texto"""
+        if not os.path.exists(self.ruta):
+            return []
+        ubicaciones = self.indice.buscar(dia, desde, hasta, codigo, nivel, limite, texto=texto)
+        registros = []
+        with open(self.ruta, "rb") as f:
+            for offset, longitud in ubicaciones:
+                f.seek(offset)
+                try:
+                    registros.append(json.loads(f.read(longitud)))
+                except ValueError:
+                    continue
+        return registros
+
+    def consultar_archivados(self, dia_prefijo: str = None, desde: float = None, hasta: float = None,
+                             codigo: str = None, nivel: str = None, texto: str = None) -> List[Dict[str, Any]]:
+        """Registros de los segmentos archivados; solo se abren los que el manifiesto señala"""
+        if self.archivo is None:
+            return []
+        coincide = self._filtro_archivados(dia_prefijo, desde, hasta, codigo, nivel, texto)
+        return [
+            datos
+            for entrada in self.archivo.segmentos(dia_prefijo, desde, hasta, codigo, nivel)
+            for datos in self.archivo.leer(entrada) if coincide(datos)
+        ]
+
+    def iterar_archivados(self, dia_prefijo: str = None, desde: float = None, hasta: float = None,
+                          codigo: str = None, nivel: str = None, texto: str = None) -> Iterator[Dict[str, Any]]:
+        """Como consultar_archivados, del más reciente al más antiguo y bajo demanda:
+        cada segmento se descomprime solo cuando se piden sus registros"""
+        if self.archivo is None:
+            return
+        coincide = self._filtro_archivados(dia_prefijo, desde, hasta, codigo, nivel, texto)
+        for entrada in reversed(self.archivo.segmentos(dia_prefijo, desde, hasta, codigo, nivel)):
+            registros = [datos for datos in self.archivo.leer(entrada) if coincide(datos)]
+            yield from reversed(registros)
+
+    @staticmethod
+    def _filtro_archivados(dia_prefijo, desde, hasta, codigo, nivel, texto):
+        consulta = tokenizar(texto)
+
+        def coincide(datos: Dict[str, Any]) -> bool:
+            return ((not dia_prefijo or datos.get("fecha", "").startswith(dia_prefijo))
+                    and (desde is None or datos.get("ts", 0) >= desde)
+                    and (hasta is None or datos.get("ts", 0) < hasta)
+                    and (codigo is None or datos.get("codigo") == codigo)
+                    and (nivel is None or datos.get("nivel") == nivel)
+                    and (not consulta or coincide_texto(datos, consulta)))
+        return coincide
+
+    def dias(self) -> List[str]:
+        return self.indice.valores("dia")
+
+    def codigos(self) -> List[str]:
+        return self.indice.valores("codigo")
+
+    def cerrar(self):
+        if self._indice:
+            self._indice.cerrar()
+            self._indice = None
@@ -0,0 +1,73 @@
+# Tesseract/Core/System/TokenBucket.py
+
+import threading
+import time
+from typing import Dict, Hashable
+
+class TokenBucket:
+    """Cubeta de tokens: 'tasa' tokens por segundo con ráfagas de hasta 'capacidad'"""
+
+    def __init__(self, tasa: float, capacidad: float):
+        self.tasa = max(tasa, 1e-9)
+        self.capacidad = max(capacidad, 1.0)
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _rellenar(self, ahora: float):
+        self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    def consumir(self, tokens: float = 1.0) -> bool:
+        """Consume sin esperar; False si no hay tokens suficientes"""
+        with self._lock:
+            self._rellenar(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def tiempo_espera(self, tokens: float = 1.0) -> float:
+        """Segundos hasta que haya 'tokens' disponibles"""
+        with self._lock:
+            self._rellenar(time.monotonic())
+            faltan = tokens - self._tokens
+            return 0.0 if faltan <= 0 else faltan / self.tasa
+
+    def esperar(self, tokens: float = 1.0, timeout: float = None,
+                detener: threading.Event = None) -> bool:
+        """Bloquea hasta consumir 'tokens' (o hasta timeout / detener)"""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.consumir(tokens):
+                return True
+            espera = self.tiempo_espera(tokens)
+            if limite is not None:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                espera = min(espera, restante)
+            if detener is not None:
+                if detener.wait(espera):
+                    return False
+            else:
+                time.sleep(espera)
+
+class RateLimiter:
+    """Una cubeta de tokens independiente por clave (p. ej. canal y destino)"""
+
+    def __init__(self, tasa: float, capacidad: float):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._lock = threading.Lock()
+        self._cubetas: Dict[Hashable, TokenBucket] = {}
+
+    def cubeta(self, clave: Hashable) -> TokenBucket:
+        with self._lock:
+            cubeta = self._cubetas.get(clave)
+            if cubeta is None:
+                cubeta = self._cubetas[clave] = TokenBucket(self.tasa, self.capacidad)
+            return cubeta
+
+    def consumir(self, clave: Hashable, tokens: float = 1.0) -> bool:
+        return self.cubeta(clave).consumir(tokens)
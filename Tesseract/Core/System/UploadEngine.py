@@ -0,0 +1,152 @@
+# Tesseract/Core/System/UploadEngine.py
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, Any
+
+RESULTADO_OK = "ok"
+RESULTADO_ERROR = "error"
+RESULTADO_CONGESTION = "congestion"  # 421, timeouts: el servidor o el enlace están saturados
+
+class AdaptiveConcurrency:
+    """Límite de concurrencia adaptativo (AIMD).
+
+    Crece de uno en uno mientras el rendimiento observado mejore y se reduce a
+    la mitad, con una pausa creciente, ante señales de congestión.
+    """
+
+    def __init__(self, inicial: int = 3, minimo: int = 1, maximo: int = 8,
+                 pausa_base: float = 5.0, pausa_maxima: float = 120.0):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.pausa_base = pausa_base
+        self.pausa_maxima = pausa_maxima
+        self.logger = logging.getLogger(__name__)
+
+        self._cond = threading.Condition()
+        self._limite = min(max(inicial, self.minimo), self.maximo)
+        self._activos = 0
+        self._exitos = 0
+        self._congestiones = 0
+        self._pausa_hasta = 0.0
+        # Rendimiento (envíos/s) de la ventana actual y de la anterior al último aumento
+        self._inicio_ventana = time.monotonic()
+        self._rendimiento_previo = 0.0
+
+    @property
+    def limite(self) -> int:
+        with self._cond:
+            return self._limite
+
+    def adquirir(self, detener: threading.Event = None):
+        with self._cond:
+            while True:
+                if detener is not None and detener.is_set():
+                    return False
+                espera = self._pausa_hasta - time.monotonic()
+                if espera <= 0 and self._activos < self._limite:
+                    self._activos += 1
+                    return True
+                self._cond.wait(espera if espera > 0 else 1.0)
+
+    def liberar(self, resultado: str):
+        with self._cond:
+            self._activos -= 1
+            if resultado == RESULTADO_CONGESTION:
+                self._congestiones += 1
+                self._exitos = 0
+                anterior = self._limite
+                self._limite = max(self.minimo, self._limite // 2)
+                pausa = min(self.pausa_maxima, self.pausa_base * (2 ** (self._congestiones - 1)))
+                self._pausa_hasta = time.monotonic() + pausa
+                self._reiniciar_ventana()
+                self.logger.warning(f"Congestión detectada: concurrencia {anterior} -> {self._limite}, pausa {pausa:.0f}s")
+            elif resultado == RESULTADO_OK:
+                self._congestiones = 0
+                self._exitos += 1
+                # Una ventana equivale a 'limite' envíos completados
+                if self._exitos >= self._limite:
+                    self._ajustar_por_rendimiento()
+            self._cond.notify_all()
+
+    def _ajustar_por_rendimiento(self):
+        duracion = max(time.monotonic() - self._inicio_ventana, 1e-6)
+        rendimiento = self._exitos / duracion
+        if rendimiento >= self._rendimiento_previo * 1.05 or self._rendimiento_previo == 0.0:
+            # Más concurrencia sigue mejorando el rendimiento: aumento aditivo
+            if self._limite < self.maximo:
+                self._limite += 1
+                self.logger.debug(f"Concurrencia aumentada a {self._limite} ({rendimiento:.2f} envíos/s)")
+        elif self._limite > self.minimo:
+            # El enlace está saturado: el último aumento no aportó, se revierte
+            self._limite -= 1
+        self._rendimiento_previo = rendimiento
+        self._reiniciar_ventana()
+
+    def _reiniciar_ventana(self):
+        self._exitos = 0
+        self._inicio_ventana = time.monotonic()
+
+class UploadPipeline:
+    """Pipeline de un canal de entrega con concurrencia adaptativa.
+
+    Cada canal (FTP, email, SMS) tiene su propio pipeline, de modo que un
+    canal lento no retrasa a los demás.
+    """
+
+    def __init__(self, nombre: str, funcion: Callable[[Dict[str, Any]], str],
+                 control: AdaptiveConcurrency):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.control = control
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=control.maximo, thread_name_prefix=f"Pipeline-{nombre}")
+        self._cond = threading.Condition()
+        self._en_curso = 0
+        self._detener = threading.Event()
+
+    def enviar(self, entrada: Dict[str, Any]) -> Future:
+        with self._cond:
+            self._en_curso += 1
+        try:
+            return self._executor.submit(self._ejecutar, entrada)
+        except RuntimeError:
+            self._terminar()
+            raise
+
+    def _ejecutar(self, entrada: Dict[str, Any]) -> str:
+        resultado = RESULTADO_ERROR
+        try:
+            if not self.control.adquirir(self._detener):
+                return resultado
+            try:
+                resultado = self.funcion(entrada) or RESULTADO_ERROR
+            except Exception as e:
+                self.logger.error(f"Error en pipeline {self.nombre}: {e}")
+            finally:
+                self.control.liberar(resultado)
+            return resultado
+        finally:
+            self._terminar()
+
+    def _terminar(self):
+        with self._cond:
+            self._en_curso -= 1
+            self._cond.notify_all()
+
+    def esperar(self, timeout: float = None) -> bool:
+        """Espera a que terminen todas las tareas enviadas al pipeline"""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._en_curso > 0:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return False
+                self._cond.wait(restante)
+            return True
+
+    def cerrar(self):
+        self._detener.set()
+        self._executor.shutdown(wait=True)
@@ -3,6 +3,7 @@
 import sys
 import os
 import logging
+import fnmatch
 from PyQt5.QtWidgets import QApplication, QMessageBox
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -18,10 +19,13 @@ class TesseractApp(QApplication):
         super().__init__(argv)
         self.error_handler = ErrorHandler()
         self.config_manager = ConfigManager()
+        # Entregar las alertas aún encoladas antes de salir
+        self.aboutToQuit.connect(self.error_handler.detener)
         
         self.init_state_manager()
         self.init_usb_storage()
         self.init_scheduler()
+        self.init_metricas()
         
         try:
             self.sensor_profiles = ConfigManager.obtener_perfiles_sensores()
@@ -48,34 +52,107 @@ class TesseractApp(QApplication):
     def init_scheduler(self):
         from Core.Network.FTPManager import FTPManager
         from Core.System.FileScheduler import FileScheduler
+        from Core.System.SchedulerService import SchedulerService
+        from Core.DataProcessing.ReportGenerator import ReportGenerator
+        
+        # Servicio único de tareas programadas (envíos, reintentos, reportes)
+        self.scheduler_service = SchedulerService("scheduler_estado.json", self.error_handler)
         
         ftp_config = ConfigManager.cargar_config_ftp()
         ftp_manager = FTPManager(ftp_config, self.error_handler)
         
+        # Transporte HTTP(S) opcional para oficinas que lo aceptan
+        transportes = {}
+        destinos_http = []
+        try:
+            http_config = ConfigManager.cargar_config_http()
+            if http_config:
+                from Core.Network.HTTPTransferManager import HTTPTransferManager
+                transportes["http"] = HTTPTransferManager(http_config, self.error_handler)
+                # Patrones de nombre de archivo (p. ej. "*.csv") que se suben por HTTP; el resto va por FTP
+                destinos_http = http_config.get("destinos", [])
+        except Exception as e:
+            self.error_handler.log_error("APP_INIT_HTTP", f"Configuración HTTP inválida, se usa solo FTP: {e}")
+        
         # ✅ Cargar configuración SMS 
         sms_config = ConfigManager.cargar_config_sms()  # Asegúrate de tener este método en ConfigManager
         alert_manager = AlertManager(sms_config, self.error_handler) if sms_config else None
         
+        # Semilla estable por equipo para repartir la flota dentro de la ventana de envío
+        try:
+            general = ConfigManager.cargar_config_general()
+            semilla_flota = f"{general['RFC']}:{general['NSUE']}"
+        except Exception:
+            semilla_flota = ""
+        
         sched_config = {
-            "hora_envio": "23:59",
+            "hora_envio": ftp_config.get("hora_envio", "23:59"),
+            # Minutos a partir de hora_envio en los que la flota reparte el drenado diario
+            "ventana_envio": ftp_config.get("ventana_envio", 120),
+            # Solo si se activa, los archivos nuevos esperan el turno del equipo en lugar de subirse al detectarse
+            "retener_hasta_turno": ftp_config.get("retener_hasta_turno", False),
+            "semilla_flota": semilla_flota,
             "directorio_pendientes": "pendientes_usb",
             "retencion_dias": 30,
+            "vigilar_directorio": True,   # envío inmediato al detectar archivos nuevos (sin retener_hasta_turno)
+            "debounce_vigilancia": 1.0,
+            "ventana_vigilancia": 5.0,
             "enable": True
         }
         
         def get_plantilla(nombre_archivo):
-            return {"nombre_remoto": nombre_archivo}
+            transporte = "ftp"
+            if any(fnmatch.fnmatch(nombre_archivo, patron) for patron in destinos_http):
+                transporte = "http"
+            return {"nombre_remoto": nombre_archivo, "transporte": transporte}
         
         self.file_scheduler = FileScheduler(
             transfer_service=ftp_manager,
             config=sched_config,
             get_plantilla_fn=get_plantilla,
             error_handler=self.error_handler,
-            alert_manager=alert_manager  # ✅ Pasar AlertManager al FileScheduler
+            alert_manager=alert_manager,  # ✅ Pasar AlertManager al FileScheduler
+            transportes=transportes,
+            scheduler=self.scheduler_service
         )
         
+        # El reporte diario vive en el núcleo, exista o no la pestaña de reportes, pero
+        # solo se programa si el usuario lo activó desde ella (reporte_programado)
+        self.report_generator = ReportGenerator(
+            self.error_handler,
+            self.file_scheduler.guardar_pendiente,
+            sched_config["directorio_pendientes"]
+        )
+        try:
+            general = ConfigManager.cargar_config_general()
+            if general.get("reporte_programado", False):
+                self.report_generator.programar(self.scheduler_service, general.get("hora_reporte"))
+        except Exception as e:
+            self.error_handler.log_error("APP_INIT_REP", f"Error programando reporte diario: {e}")
+        self.scheduler_service.iniciar()
+        self.aboutToQuit.connect(self.scheduler_service.detener)
+        
         logging.info("FileScheduler configurado con AlertManager")
 
+    def init_metricas(self):
+        """Endpoint local opcional en formato Prometheus (Config/metricas_config.json)"""
+        from Core.System.Metrics import ServidorMetricas
+        
+        self.servidor_metricas = None
+        try:
+            config = ConfigManager.cargar_config_metricas()
+            if not config.get("habilitado", False):
+                return
+            self.servidor_metricas = ServidorMetricas(
+                puerto=config.get("puerto", ServidorMetricas.PUERTO),
+                host=config.get("host", "127.0.0.1"),   # "0.0.0.0" para que lo consulte la flota
+                error_handler=self.error_handler
+            )
+            if self.servidor_metricas.iniciar():
+                self.aboutToQuit.connect(self.servidor_metricas.detener)
+        except Exception as e:
+            self.error_handler.log_error("APP_INIT_MET", f"Error iniciando endpoint de métricas: {e}")
+
     def on_login_success(self, user):
         from GUI.Windows.MainWindow import MainWindow
         
@@ -102,9 +179,7 @@ class TesseractApp(QApplication):
     def start_system_services(self):
         try:
             if self.file_scheduler.config.get("enabled", True):
-                if not (hasattr(self.file_scheduler, '_scheduler') 
-                        and self.file_scheduler._scheduler 
-                        and self.file_scheduler._scheduler.running):
+                if not self.file_scheduler.esta_activo():
                     self.file_scheduler.iniciar()
                     logging.info("FileScheduler iniciado")
         except Exception as e:
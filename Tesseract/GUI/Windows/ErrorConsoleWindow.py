@@ -1,85 +1,210 @@
 # GUI/Windows/ErrorConsoleWindow.py
 import os
-import time
+import re
+import json
+from array import array
+from collections import OrderedDict
+from itertools import islice
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, 
+    QWidget, QVBoxLayout, QHBoxLayout, QTableView,
     QPushButton, QComboBox, QLabel, QHeaderView, QAbstractItemView, QLineEdit
 )
-from PyQt5.QtCore import Qt, QTimer, QDate
+from PyQt5.QtCore import Qt, QTimer, QAbstractTableModel, QModelIndex
 from PyQt5.QtGui import QColor, QFont, QBrush
 from Core.System.ErrorHandler import ErrorHandler
+from Core.System.StructuredLog import LectorLog, LectorIncremental, ArchivoSegmentos, tokenizar, coincide_texto
+
+class ErrorTableModel(QAbstractTableModel):
+    """Modelo virtual: guarda solo offsets y materializa las filas visibles bajo demanda.
+
+    Las filas se presentan de la más reciente a la más antigua: primero las del
+    archivo activo y después las de segmentos archivados, que se leen por
+    tramos (fetchMore) a medida que la vista se desplaza hasta el final.
+    """
+    COLUMNAS = ["Fecha/Hora", "Nivel", "Código", "Descripción", "Origen"]
+    NIVELES = {"WARNING": "ADVERTENCIA", "CRITICAL": "CRÍTICO"}
+    MAX_CACHE = 5000
+    TRAMO_ARCHIVADOS = 500
+
+    def __init__(self, log_file: str, level_colors: dict):
+        super().__init__()
+        self.log_file = log_file
+        self.level_colors = level_colors
+        self._offsets = array("q")
+        self._longitudes = array("q")
+        self._archivados = []         # registros de segmentos ya leídos, del más reciente al más antiguo
+        self._fuente_archivados = None   # iterador con los que faltan por leer
+        self._cache = OrderedDict()   # offset -> registro
+        self._archivo = None
+        self._fuente_negrita = QFont("Arial", 9, QFont.Bold)
+
+    def cargar(self, ubicaciones, archivados=None):
+        """archivados: iterador de registros del más reciente al más antiguo (se consume bajo demanda)"""
+        self.beginResetModel()
+        self._offsets = array("q", (offset for offset, _ in ubicaciones))
+        self._longitudes = array("q", (longitud for _, longitud in ubicaciones))
+        self._archivados = []
+        self._fuente_archivados = iter(archivados) if archivados is not None else None
+        self._cache.clear()
+        self._cerrar_archivo()
+        self.endResetModel()
+
+    def agregar(self, nuevos):
+        """nuevos: [(offset, longitud, registro)] en orden cronológico; aparecen arriba"""
+        if not nuevos:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(nuevos) - 1)
+        for offset, longitud, registro in nuevos:
+            self._offsets.append(offset)
+            self._longitudes.append(longitud)
+            self._guardar_cache(offset, registro)
+        self.endInsertRows()
+
+    def registro(self, fila: int) -> dict:
+        if fila >= len(self._offsets):
+            return self._archivados[fila - len(self._offsets)]
+        indice = len(self._offsets) - 1 - fila
+        offset = self._offsets[indice]
+        registro = self._cache.get(offset)
+        if registro is not None:
+            self._cache.move_to_end(offset)
+            return registro
+        try:
+            if self._archivo is None:
+                self._archivo = open(self.log_file, "rb")
+            self._archivo.seek(offset)
+            registro = json.loads(self._archivo.read(self._longitudes[indice]))
+        except (OSError, ValueError):
+            registro = {}
+        self._guardar_cache(offset, registro)
+        return registro
+
+    def _guardar_cache(self, offset: int, registro: dict):
+        self._cache[offset] = registro
+        if len(self._cache) > self.MAX_CACHE:
+            self._cache.popitem(last=False)
+
+    def _cerrar_archivo(self):
+        if self._archivo:
+            self._archivo.close()
+            self._archivo = None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._fuente_archivados is not None
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._fuente_archivados is None:
+            return
+        tramo = list(islice(self._fuente_archivados, self.TRAMO_ARCHIVADOS))
+        if len(tramo) < self.TRAMO_ARCHIVADOS:
+            self._fuente_archivados = None
+        if not tramo:
+            return
+        inicio = self.rowCount()
+        self.beginInsertRows(QModelIndex(), inicio, inicio + len(tramo) - 1)
+        self._archivados.extend(tramo)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._offsets) + len(self._archivados)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNAS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.COLUMNAS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        registro = self.registro(index.row())
+        nivel = self.NIVELES.get(registro.get("nivel", ""), registro.get("nivel", ""))
+        columna = index.column()
+        if role == Qt.DisplayRole:
+            return (
+                registro.get("fecha", ""),
+                nivel,
+                registro.get("codigo") or "",
+                registro.get("mensaje", ""),
+                registro.get("origen") or "",
+            )[columna]
+        if columna == 1 and nivel in self.level_colors:
+            if role == Qt.ForegroundRole:
+                return QBrush(self.level_colors[nivel])
+            if role == Qt.FontRole:
+                return self._fuente_negrita
+        return None
 
 class ErrorConsoleWindow(QWidget):
+    NIVELES_INDICE = {"INFO": "INFO", "ADVERTENCIA": "WARNING", "ERROR": "ERROR", "CRÍTICO": "CRITICAL"}
+    LIMITE_BUSQUEDA = 5000   # coincidencias más recientes que se muestran al buscar texto
+    ESPERA_BUSQUEDA = 250    # ms sin teclear antes de consultar el índice
+    # Los segmentos archivados se consultan sin fecha o con un día o un mes completos
+    FECHA_COMPLETA = re.compile(r"\d{4}-\d{2}(-\d{2})?")
+
     def __init__(self, error_handler):
         super().__init__()
         self.error_handler = error_handler
-        self.log_file = "errores.log"
-        self.last_modified = 0
+        self.log_file = ErrorHandler.LOG_ESTRUCTURADO
+        self.lector = LectorLog(self.log_file, archivo=ArchivoSegmentos(ErrorHandler.DIRECTORIO_ARCHIVO))
+        self.tail = LectorIncremental(self.log_file)
+        self.total = 0
+        self.truncado = False
         self.setup_ui()
         self.load_errors()
-        
+
     def setup_ui(self):
         # Configuración principal
         main_layout = QVBoxLayout()
         main_layout.setContentsMargins(10, 10, 10, 10)
         main_layout.setSpacing(10)
-        
+
         # -- Barra de controles --
         control_layout = QHBoxLayout()
-        
+
         # Filtro de nivel
         control_layout.addWidget(QLabel("Nivel:"))
         self.cmb_level = QComboBox()
         self.cmb_level.addItems(["TODOS", "INFO", "ADVERTENCIA", "ERROR", "CRÍTICO"])
         self.cmb_level.currentIndexChanged.connect(self.filter_errors)
         control_layout.addWidget(self.cmb_level)
-        
+
         # Filtro de fecha
         control_layout.addWidget(QLabel("Fecha:"))
         self.txt_date = QLineEdit()
         self.txt_date.setPlaceholderText("YYYY-MM-DD")
         self.txt_date.setMaximumWidth(100)
-        self.txt_date.textChanged.connect(self.filter_errors)
+        self.txt_date.textChanged.connect(self.filter_text)
         control_layout.addWidget(self.txt_date)
-        
+
         # Filtro de texto
         control_layout.addWidget(QLabel("Buscar:"))
         self.txt_search = QLineEdit()
         self.txt_search.setPlaceholderText("Código o texto")
-        self.txt_search.textChanged.connect(self.filter_errors)
+        self.txt_search.textChanged.connect(self.filter_text)
         control_layout.addWidget(self.txt_search)
-        
+
+        # La búsqueda se lanza cuando se deja de teclear, no en cada tecla
+        self.search_timer = QTimer()
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.ESPERA_BUSQUEDA)
+        self.search_timer.timeout.connect(self.load_errors)
+
         # Botones de acción
         self.btn_clear = QPushButton("Limpiar Log")
         self.btn_clear.setStyleSheet("background-color: #E74C3C; color: white;")
         self.btn_clear.clicked.connect(self.clear_log)
         control_layout.addWidget(self.btn_clear)
-        
+
         self.btn_refresh = QPushButton("Actualizar")
         self.btn_refresh.clicked.connect(self.load_errors)
         control_layout.addWidget(self.btn_refresh)
-        
+
         control_layout.addStretch()
         main_layout.addLayout(control_layout)
-        
-        # -- Tabla de errores --
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels([
-            "Fecha/Hora", 
-            "Nivel", 
-            "Código", 
-            "Descripción", 
-            "Origen"
-        ])
-        
-        # Configurar tabla
-        self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
-        self.table.verticalHeader().setVisible(False)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        self.table.setSortingEnabled(True)
-        
+
         # Colores por nivel
         self.level_colors = {
             "INFO": QColor(52, 152, 219),
@@ -87,176 +212,123 @@ class ErrorConsoleWindow(QWidget):
             "ERROR": QColor(231, 76, 60),
             "CRÍTICO": QColor(155, 89, 182)
         }
-        
+
+        # -- Tabla de errores (modelo virtual) --
+        self.model = ErrorTableModel(self.log_file, self.level_colors)
+        # Los tramos archivados llegan al desplazarse: el contador se actualiza con ellos
+        self.model.rowsInserted.connect(lambda *_: self.update_count())
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+
+        # Configurar tabla; filas de altura fija para no medir cada una
+        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+
         main_layout.addWidget(self.table)
-        
+
         # -- Contador --
         self.lbl_count = QLabel("0 errores mostrados")
         self.lbl_count.setFont(QFont("Arial", 9))
         self.lbl_count.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
         main_layout.addWidget(self.lbl_count)
-        
+
         self.setLayout(main_layout)
-        
+
         # Timer para actualización automática
         self.update_timer = QTimer()
         self.update_timer.setInterval(5000)  # 5 segundos
         self.update_timer.timeout.connect(self.check_log_changes)
         self.update_timer.start()
 
+    def _criterios(self):
+        nivel = self.NIVELES_INDICE.get(self.cmb_level.currentText())
+        fecha = self.txt_date.text().strip()
+        texto = self.txt_search.text().strip()
+        return nivel, fecha, texto
+
     def check_log_changes(self):
-        """Verifica si el archivo de log ha cambiado"""
-        if not os.path.exists(self.log_file):
-            return
-            
-        current_modified = os.path.getmtime(self.log_file)
-        if current_modified > self.last_modified:
-            self.last_modified = current_modified
+        """Incorpora solo las líneas agregadas desde la última lectura"""
+        reiniciado, nuevos = self.tail.leer_nuevos()
+        if reiniciado:
             self.load_errors()
+            return
+        if not nuevos:
+            return
+        self.total += len(nuevos)
+        nivel, fecha, texto = self._criterios()
+        consulta = tokenizar(texto)
+        self.model.agregar([
+            (offset, longitud, registro) for offset, longitud, registro in nuevos
+            if (not nivel or registro.get("nivel") == nivel)
+            and registro.get("fecha", "").startswith(fecha)
+            and (not consulta or coincide_texto(registro, consulta))
+        ])
+        self.update_count()
 
     def load_errors(self):
-        """Carga errores desde el archivo log con manejo de codificación"""
+        """Consulta el índice con los filtros de nivel, fecha y texto; las filas se leen al mostrarse"""
         if not os.path.exists(self.log_file):
-            self.table.setRowCount(0)
+            self.model.cargar([])
+            self.tail.posicionar(0)
             self.lbl_count.setText("Archivo de log no encontrado")
             return
-            
+
         try:
-            # INTENTAR DIFERENTES CODIFICACIONES
-            for enconding in ['utf-8', 'latin-1', 'cp1252']:
-                try:
-                    with open(self.log_file, "r", encoding=enconding) as f:
-                        lines = f.readlines()
-                    break  # Salir del loop si funciona
-                except UnicodeDecodeError:
-                    continue
-            else:
-                # Si todas fallan, usar utf-8 con manejo de errores
-                with open(self.log_file, 'r', encoding='utf-8', errors='replace') as f:
-                    lines = f.readline()
-            
-            # Procesar líneas
-            errors = []
-            for line in lines:
-                if not line.strip():
-                    continue
-                    
-                # Parsear formato: [fecha] nivel: descripción
-                parts = line.split("]", 1)
-                if len(parts) < 2:
-                    continue
-                    
-                timestamp = parts[0][1:].strip()
-                rest = parts[1].split(":", 1)
-                if len(rest) < 2:
-                    continue
-                    
-                level = rest[0].strip()
-                description = rest[1].strip()
-                
-                # Extraer código de error si existe
-                code = ""
-                if "KER-" in description:
-                    code_start = description.find("KER-")
-                    code_end = description.find(":", code_start)
-                    if code_end != -1:
-                        code = description[code_start+4:code_end]
-                
-                # Extraer origen (último componente antes de descripción)
-                origin = ""
-                if "-" in level:
-                    origin = level.split("-")[-1].strip()
-                    level = level.split("-")[0].strip()
-                
-                errors.append({
-                    "timestamp": timestamp,
-                    "level": level,
-                    "code": code,
-                    "description": description,
-                    "origin": origin
-                })
-                
-            # Almacenar todos los errores y aplicar filtros
-            self.all_errors = errors
-            self.filter_errors()
-            
+            nivel, fecha, texto = self._criterios()
+            # Lo escrito después de este punto lo incorpora la lectura incremental
+            fin = min(self.lector.indice.fin_indexado(), os.path.getsize(self.log_file))
+            # Con texto se muestran solo las coincidencias más recientes
+            limite = self.LIMITE_BUSQUEDA if texto else None
+            ubicaciones = self.lector.indice.buscar(
+                nivel=nivel,
+                dia_prefijo=fecha or None,
+                hasta_offset=fin,
+                texto=texto or None,
+                limite=limite,
+                recientes=True
+            )
+            self.truncado = bool(limite) and len(ubicaciones) >= limite
+            self.total = self.lector.indice.contar()
+            # Tras lo activo siguen los segmentos archivados (todos sin fecha, o los que
+            # contienen la fecha completa), uno a uno a medida que se desplaza la tabla,
+            # para que el historial no desaparezca con la rotación diaria.
+            # Con una fecha a medio escribir se espera a que se complete.
+            archivados = None
+            if not fecha or self.FECHA_COMPLETA.fullmatch(fecha):
+                dia = fecha or None
+                archivados = self.lector.iterar_archivados(dia_prefijo=dia, nivel=nivel, texto=texto or None)
+                self.total += sum(e["registros"] for e in self.lector.archivo.segmentos(dia_prefijo=dia))
+            self.model.cargar(ubicaciones, archivados)
+            self.tail.posicionar(fin)
+            self.check_log_changes()
+            self.update_count()
+
         except Exception as e:
             print(f"Error loading log: {e}")
 
     def filter_errors(self):
-        """Aplica filtros seleccionados a los errores"""
-        if not hasattr(self, 'all_errors'):
-            return
-            
-        # Obtener criterios de filtrado
-        level_filter = self.cmb_level.currentText()
-        date_filter = self.txt_date.text().strip()
-        text_filter = self.txt_search.text().strip().lower()
-        
-        # Filtrar errores
-        filtered = []
-        for error in self.all_errors:
-            # Filtrar por nivel
-            if level_filter != "TODOS" and level_filter != error["level"]:
-                continue
-                
-            # Filtrar por fecha
-            if date_filter and not error["timestamp"].startswith(date_filter):
-                continue
-                
-            # Filtrar por texto
-            if text_filter:
-                text_match = (
-                    text_filter in error["code"].lower() or
-                    text_filter in error["description"].lower() or
-                    text_filter in error["origin"].lower()
-                )
-                if not text_match:
-                    continue
-                    
-            filtered.append(error)
-            
-        # Actualizar tabla
-        self.table.setRowCount(len(filtered))
-        
-        for row, error in enumerate(filtered):
-            # Fecha/Hora
-            item_time = QTableWidgetItem(error["timestamp"])
-            item_time.setData(Qt.UserRole, error["timestamp"])  # Para ordenamiento
-            
-            # Nivel con color
-            item_level = QTableWidgetItem(error["level"])
-            if error["level"] in self.level_colors:
-                item_level.setForeground(QBrush(self.level_colors[error["level"]]))
-                item_level.setFont(QFont("Arial", 9, QFont.Bold))
-                
-            # Código
-            item_code = QTableWidgetItem(error["code"])
-            
-            # Descripción
-            item_desc = QTableWidgetItem(error["description"])
-            
-            # Origen
-            item_origin = QTableWidgetItem(error["origin"])
-            
-            # Añadir a tabla
-            self.table.setItem(row, 0, item_time)
-            self.table.setItem(row, 1, item_level)
-            self.table.setItem(row, 2, item_code)
-            self.table.setItem(row, 3, item_desc)
-            self.table.setItem(row, 4, item_origin)
-            
-        # Ordenar por fecha más reciente primero
-        self.table.sortItems(0, Qt.DescendingOrder)
-        
-        # Actualizar contador
-        self.lbl_count.setText(f"{len(filtered)} de {len(self.all_errors)} errores mostrados")
+        """Nivel, fecha y texto se resuelven en el índice"""
+        self.load_errors()
+
+    def filter_text(self):
+        # Texto y fecha: reinicia la espera en cada tecla; consulta al dejar de escribir
+        self.search_timer.start()
+
+    def update_count(self):
+        mostrados = self.model.rowCount()
+        if self.truncado:
+            self.lbl_count.setText(f"{mostrados} coincidencias más recientes de {self.total} errores")
+        else:
+            self.lbl_count.setText(f"{mostrados} de {self.total} errores mostrados")
 
     def clear_log(self):
-        """Borra el contenido del archivo de log"""
+        """Archiva el log actual (sigue consultable por fecha) y empieza uno vacío"""
         try:
-            open(self.log_file, "w").close()
-            self.last_modified = os.path.getmtime(self.log_file)
+            self.error_handler.limpiar_log()
             self.load_errors()
             self.error_handler.log_evento("LOG limpiado manualmente")
         except Exception as e:
@@ -264,4 +336,6 @@ class ErrorConsoleWindow(QWidget):
 
     def closeEvent(self, event):
         self.update_timer.stop()
-        super().closeEvent(event)
\ No newline at end of file
+        self.search_timer.stop()
+        self.lector.cerrar()
+        super().closeEvent(event)
@@ -1,17 +1,10 @@
 # Tesseract/GUI/Windows/ReportsWindow.py 
 
 import os
-import json
-import schedule
-import threading
-import time
-from datetime import datetime
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QComboBox, QPushButton, QLabel
-from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QComboBox, QPushButton, QLabel
 from Core.System.ConfigManager import ConfigManager
-from Core.System.StateManager import StateManager
 from Core.System.ErrorHandler import ErrorHandler
-from Core.DataProcessing.Services import RecordFormatter, ConfigProvider, BitmaskConverter, FileNameGenerator
+from Core.DataProcessing.ReportGenerator import ReportGenerator
 
 class ReportsWindow(QWidget):
     def __init__(self, medidor, error_handler: ErrorHandler):
@@ -36,11 +29,13 @@ class ReportsWindow(QWidget):
         # Conexiones
         self.btn_generar.clicked.connect(self.iniciar_proceso_reportes)
         
-        # Timer para scheduler
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.verificar_tareas_programadas)
-        self.timer.start(60000)
-        self.scheduler_thread = None
+        # La generación programada vive en el núcleo (SchedulerService); esta
+        # pestaña la activa (o reprograma) y permite generar bajo demanda
+        app = QApplication.instance()
+        self.generador = getattr(app, 'report_generator', None) or ReportGenerator(
+            error_handler,
+            getattr(getattr(app, 'file_scheduler', None), 'guardar_pendiente', None)
+        )
 
     def iniciar_proceso_reportes(self):
         try:
@@ -61,8 +56,12 @@ class ReportsWindow(QWidget):
                 self.lbl_status.setText("❌ Ruta USB no existe")
                 return
 
-            # Programar tarea diaria (SIN pasar archivos histórico)
+            # Programar tarea diaria (SIN pasar archivos histórico); se guarda la
+            # activación y la hora para reprogramarla al iniciar la aplicación
             self.programar_tarea_diaria(hora_programada)
+            config["reporte_programado"] = True
+            config["hora_reporte"] = hora_programada
+            ConfigManager.guardar_config_general(config)
             
             # Generar reporte inmediato
             self.generar_reporte_diario()
@@ -73,54 +72,10 @@ class ReportsWindow(QWidget):
             self.error_handler.log_error("REP-INIT", str(e))
 
     def programar_tarea_diaria(self, hora: str):
-        schedule.clear()
-        schedule.every().day.at(hora).do(self.generar_reporte_diario)
+        scheduler = getattr(QApplication.instance(), 'scheduler_service', None)
+        if scheduler is None:
+            raise RuntimeError("Servicio de programación no disponible")
+        self.generador.programar(scheduler, hora)
 
     def generar_reporte_diario(self):
-        try:
-            config = ConfigManager.cargar_config_general()
-            tipo_reporte = config.get("report_type", "Medidor")
-            usb_path = config.get("storage_path", "")
-            
-            # Validacíón crítica de USB
-            if not usb_path or not os.path.exists(usb_path):
-                raise ValueError("Ruta USB no configurada o inválida")
-            
-            # Obtener medidor desde StateManager
-            medidor = StateManager.get_state('medidor')
-            if not medidor:
-                raise ValueError("Medidor no configurado")
-            
-            # Obtener datos del medidor
-            datos = medidor.leer_registros()
-            perfil = medidor.perfil
-            
-            # Generar contenido con formato
-            config_provider = ConfigProvider(ConfigManager())
-            bitmask_converter = BitmaskConverter()
-            formatter = RecordFormatter(config_provider, bitmask_converter)
-            contenido = formatter.format(tipo_reporte, datos, perfil)
-            
-            name_gen = FileNameGenerator(config_provider)
-            
-            # 1. Archivo historico (USB) - SIN FECHA
-            nombre_historico = name_gen.generate_historic_name(tipo_reporte)
-            ruta_historico = os.path.join(usb_path, nombre_historico)
-            
-            with open(ruta_historico, 'a') as f:
-                f.write(contenido + "\n")
-            
-            # 2. Crear archivo diario (pendientes_usb) - CON FECHA
-            nombre_diario = name_gen.generate_daily_name(tipo_reporte)
-            ruta_diario = os.path.join("pendientes_usb", nombre_diario)
-            
-            os.makedirs("pendientes_usb", exist_ok=True)
-            with open(ruta_diario, 'w') as f:
-                f.write(contenido)
-                
-        except Exception as e:
-            self.error_handler.log_error("REP-GEN", f"Error generando reporte: {str(e)}")
-    
-    def verificar_tareas_programadas(self):
-        """Ejecuta las tareas programadas pendientes."""
-        schedule.run_pending()
\ No newline at end of file
+        return self.generador.generar_reporte_diario()
\ No newline at end of file
@@ -0,0 +1,97 @@
+# Tesseract/tests/conftest.py
+
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Los módulos se importan como en la aplicación: Core.*, GUI.*
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class ErroresRegistrados:
+    """Sustituto de ErrorHandler que solo guarda (código, mensaje)"""
+
+    def __init__(self):
+        self.errores = []
+
+    def log_error(self, codigo, mensaje, *args, **kwargs):
+        self.errores.append((codigo, mensaje))
+
+    def codigos(self):
+        return [codigo for codigo, _ in self.errores]
+
+@pytest.fixture
+def error_handler():
+    return ErroresRegistrados()
+
+class ServidorHTTP:
+    """Servidor HTTP local para sustituir APIs remotas (Twilio, webhooks del NOC).
+
+    `responder(peticion)` recibe un dict con metodo, ruta, cabeceras y cuerpo
+    y devuelve (código, cuerpo, cabeceras). Todas las peticiones quedan en
+    `peticiones`, y `conexiones` cuenta las conexiones TCP aceptadas.
+    """
+
+    def __init__(self, responder):
+        self.responder = responder
+        self.peticiones = []
+        self.conexiones = 0
+        servidor = self
+
+        class _Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive
+
+            def setup(self):
+                super().setup()
+                servidor.conexiones += 1
+
+            def do_POST(self):
+                longitud = int(self.headers.get("Content-Length", 0))
+                peticion = {
+                    "metodo": "POST", "ruta": self.path,
+                    "cabeceras": dict(self.headers), "cuerpo": self.rfile.read(longitud)
+                }
+                servidor.peticiones.append(peticion)
+                codigo, cuerpo, cabeceras = servidor.responder(peticion)
+                try:
+                    self.send_response(codigo)
+                    for nombre, valor in (cabeceras or {}).items():
+                        self.send_header(nombre, valor)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(cuerpo)))
+                    self.end_headers()
+                    self.wfile.write(cuerpo)
+                except OSError:
+                    pass   # el cliente ya cerró (p. ej. tras un timeout)
+
+            def log_message(self, formato, *args):
+                pass
+
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), _Manejador)
+        self._http.daemon_threads = True
+        self._hilo = threading.Thread(target=self._http.serve_forever, daemon=True)
+        self._hilo.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._http.server_address[1]}"
+
+    def detener(self):
+        self._http.shutdown()
+        self._http.server_close()
+
+@pytest.fixture
+def servidor_http():
+    """Fábrica de servidores HTTP locales; se detienen al terminar la prueba"""
+    servidores = []
+
+    def iniciar(responder=lambda peticion: (200, b"{}", None)):
+        servidor = ServidorHTTP(responder)
+        servidores.append(servidor)
+        return servidor
+
+    yield iniciar
+    for servidor in servidores:
+        servidor.detener()
@@ -0,0 +1,132 @@
+# Tesseract/tests/test_ftp_manager.py
+
+import threading
+import zlib
+
+import pytest
+
+pytest.importorskip("pyftpdlib")
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import FTPHandler
+from pyftpdlib.servers import ThreadedFTPServer
+
+from Core.Network import FTPManager as modulo_ftp
+from Core.Network.FTPManager import FTPManager
+
+CONTENIDO = b"M|" + b"".join(b"%06d|1.234|5.678|20261019\n" % i for i in range(4000))
+
+class ManejadorXCRC(FTPHandler):
+    """pyftpdlib no implementa XCRC; se agrega para probar la verificación por hash"""
+    proto_cmds = dict(FTPHandler.proto_cmds, XCRC={
+        "perm": "r", "auth": True, "arg": True, "help": "Syntax: XCRC <SP> file-name (CRC32 del archivo)."
+    })
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._extra_feats.append("XCRC")
+
+    def ftp_XCRC(self, ruta):
+        try:
+            with open(ruta, "rb") as f:
+                self.respond(f"250 {zlib.crc32(f.read()):08X}")
+        except OSError as e:
+            self.respond(f"550 {e.strerror}.")
+
+@pytest.fixture
+def servidor_ftp(request, tmp_path):
+    """Servidor local; con parámetro True anuncia y atiende XCRC"""
+    raiz = tmp_path / "remoto"
+    raiz.mkdir()
+    autorizador = DummyAuthorizer()
+    autorizador.add_user("tesseract", "clave", str(raiz), perm="elradfmwMT")
+    base = ManejadorXCRC if getattr(request, "param", False) else FTPHandler
+    manejador = type("Manejador", (base,), {"authorizer": autorizador})
+    servidor = ThreadedFTPServer(("127.0.0.1", 0), manejador)
+    hilo = threading.Thread(target=servidor.serve_forever, kwargs={"timeout": 0.2}, daemon=True)
+    hilo.start()
+    yield raiz, servidor.address[1]
+    servidor.close_all()
+    hilo.join(timeout=5)
+
+@pytest.fixture
+def manager(servidor_ftp, error_handler):
+    _, puerto = servidor_ftp
+    ftp = FTPManager({
+        "host": "127.0.0.1", "puerto": puerto, "usuario": "tesseract", "clave": "clave",
+        "secure": False, "timeout": 5, "keepalive": 0
+    }, error_handler)
+    yield ftp
+    ftp.cerrar()
+
+@pytest.fixture
+def archivo(tmp_path):
+    ruta = tmp_path / "M_20261019.txt"
+    ruta.write_bytes(CONTENIDO)
+    return ruta
+
+def _bytes_enviados():
+    return modulo_ftp._BYTES.etiquetas().valor
+
+def test_envio_completo_verificado(servidor_ftp, manager, archivo):
+    raiz, _ = servidor_ftp
+    assert manager.enviar_archivo(str(archivo), "/conagua/2026/M_20261019.txt")
+    assert (raiz / "conagua" / "2026" / "M_20261019.txt").read_bytes() == CONTENIDO
+
+@pytest.mark.parametrize("servidor_ftp", [True], indirect=True)
+def test_reanuda_desde_el_tamano_remoto(servidor_ftp, manager, archivo):
+    raiz, _ = servidor_ftp
+    parcial = len(CONTENIDO) // 3
+    (raiz / "M_20261019.txt").write_bytes(CONTENIDO[:parcial])
+    reanudaciones = modulo_ftp._REANUDACIONES.etiquetas().valor
+    enviados = _bytes_enviados()
+
+    assert manager.enviar_archivo(str(archivo), "/M_20261019.txt")
+
+    assert (raiz / "M_20261019.txt").read_bytes() == CONTENIDO
+    assert modulo_ftp._REANUDACIONES.etiquetas().valor == reanudaciones + 1
+    assert _bytes_enviados() - enviados == len(CONTENIDO) - parcial
+
+def test_sin_hash_no_se_reanuda(servidor_ftp, manager, archivo):
+    raiz, _ = servidor_ftp
+    # Sin HASH/XCRC el resultado solo se comprobaría por tamaño: se sube completo
+    (raiz / "M_20261019.txt").write_bytes(CONTENIDO[:len(CONTENIDO) // 3])
+    reanudaciones = modulo_ftp._REANUDACIONES.etiquetas().valor
+    enviados = _bytes_enviados()
+
+    assert manager.enviar_archivo(str(archivo), "/M_20261019.txt")
+
+    assert (raiz / "M_20261019.txt").read_bytes() == CONTENIDO
+    assert modulo_ftp._REANUDACIONES.etiquetas().valor == reanudaciones
+    assert _bytes_enviados() - enviados == len(CONTENIDO)
+
+@pytest.mark.parametrize("servidor_ftp", [True], indirect=True)
+def test_parcial_ajeno_se_reenvia_completo(servidor_ftp, manager, archivo):
+    raiz, _ = servidor_ftp
+    # Un parcial que no es prefijo del archivo: el CRC tras reanudar no coincide
+    (raiz / "M_20261019.txt").write_bytes(b"X" * (len(CONTENIDO) // 2))
+
+    assert manager.enviar_archivo(str(archivo), "/M_20261019.txt")
+    assert (raiz / "M_20261019.txt").read_bytes() == CONTENIDO
+
+@pytest.mark.parametrize("servidor_ftp", [True], indirect=True)
+def test_archivo_ya_presente_no_se_transfiere(servidor_ftp, manager, archivo):
+    raiz, _ = servidor_ftp
+    (raiz / "M_20261019.txt").write_bytes(CONTENIDO)
+    enviados = _bytes_enviados()
+
+    assert manager.enviar_archivo(str(archivo), "/M_20261019.txt")
+    assert _bytes_enviados() == enviados
+
+@pytest.mark.parametrize("servidor_ftp", [True], indirect=True)
+def test_verificacion_por_xcrc(servidor_ftp, manager, archivo):
+    assert manager.enviar_archivo(str(archivo), "/M_20261019.txt")
+    assert "XCRC" in manager._features
+
+def test_formato_invalido_no_se_envia(servidor_ftp, manager, tmp_path, error_handler):
+    raiz, _ = servidor_ftp
+    ruta = tmp_path / "otro.txt"
+    ruta.write_bytes(b"sin cabecera\n")
+
+    assert not manager.enviar_archivo(str(ruta), "/otro.txt")
+    assert not (raiz / "otro.txt").exists()
+    assert "FTP-010" in error_handler.codigos()
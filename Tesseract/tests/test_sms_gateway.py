@@ -0,0 +1,119 @@
+# Tesseract/tests/test_sms_gateway.py
+
+import socket
+import time
+from urllib.parse import parse_qs
+
+import pytest
+
+from Core.Network.SMSGateway import SMSPipeline, TwilioHTTPClient, empaquetar_lineas, segmentos
+
+def _config(url, **extra):
+    config = {
+        "account_sid": "AC123", "auth_token": "secreto", "numero_twilio": "+15550000000",
+        "twilio_base_url": url, "timeout_http": 1.0
+    }
+    config.update(extra)
+    return config
+
+def _cuerpo(peticion):
+    return parse_qs(peticion["cuerpo"].decode("utf-8"))["Body"][0]
+
+def _twilio(rechazar=()):
+    """Responde como la API de Messages: 201, o 400 si el cuerpo contiene una palabra rechazada"""
+    def responder(peticion):
+        if any(palabra in _cuerpo(peticion) for palabra in rechazar):
+            return 400, b'{"code": 21211}', None
+        return 201, b'{"sid": "SM1"}', None
+    return responder
+
+@pytest.fixture
+def pipeline_factory():
+    pipelines = []
+
+    def crear(url, **kwargs):
+        kwargs.setdefault("ventana", 0.2)
+        kwargs.setdefault("segmentos_por_segundo", 1000)
+        pipeline = SMSPipeline(TwilioHTTPClient(_config(url)), **kwargs)
+        pipelines.append(pipeline)
+        return pipeline
+
+    yield crear
+    for pipeline in pipelines:
+        pipeline.detener()
+
+def test_empaquetar_no_parte_lineas():
+    lineas = [f"M|{i:04d}|123.456|20261019" for i in range(40)]
+    mensajes = empaquetar_lineas(lineas, max_segmentos=2)
+    assert all(segmentos(mensaje) <= 2 for mensaje in mensajes)
+    assert "\n".join(mensajes).split("\n") == lineas
+
+def test_envio_usa_la_api_de_mensajes(servidor_http):
+    servidor = servidor_http(_twilio())
+    cliente = TwilioHTTPClient(_config(servidor.url))
+
+    assert cliente.enviar("hola", "+525500000000")
+
+    peticion = servidor.peticiones[0]
+    assert peticion["ruta"] == "/2010-04-01/Accounts/AC123/Messages.json"
+    assert parse_qs(peticion["cuerpo"].decode()) == {
+        "From": ["+15550000000"], "To": ["+525500000000"], "Body": ["hola"]
+    }
+    cliente.cerrar()
+
+def test_llamadas_distintas_no_se_mezclan(servidor_http, pipeline_factory):
+    servidor = servidor_http(_twilio(rechazar=("rechazada",)))
+    pipeline = pipeline_factory(servidor.url)
+
+    buena = pipeline.encolar("+52", ["linea buena"])
+    mala = pipeline.encolar("+52", ["linea rechazada"])
+
+    # Cada llamada recibe su propio resultado, aunque compartan destino y ventana
+    assert buena.result(timeout=5) is True
+    assert mala.result(timeout=5) is False
+    assert sorted(_cuerpo(p) for p in servidor.peticiones) == ["linea buena", "linea rechazada"]
+
+def test_misma_clave_se_empaqueta(servidor_http, pipeline_factory):
+    servidor = servidor_http(_twilio())
+    pipeline = pipeline_factory(servidor.url)
+
+    primera = pipeline.encolar("+52", ["M|0001"], clave="M_20261019.txt")
+    segunda = pipeline.encolar("+52", ["M|0002"], clave="M_20261019.txt")
+
+    assert primera.result(timeout=5) and segunda.result(timeout=5)
+    assert [_cuerpo(p) for p in servidor.peticiones] == ["M|0001\nM|0002"]
+
+def test_timeout_de_lectura_no_se_reintenta(servidor_http):
+    def lento(peticion):
+        time.sleep(1.0)
+        return 201, b"{}", None
+
+    servidor = servidor_http(lento)
+    cliente = TwilioHTTPClient(_config(servidor.url, timeout_http=0.2))
+
+    # Twilio pudo haber creado el mensaje: reenviar duplicaría el SMS
+    assert cliente.enviar("hola", "+52") is False
+    assert len(servidor.peticiones) == 1
+    cliente.cerrar()
+
+def test_error_5xx_se_reintenta(servidor_http, monkeypatch):
+    monkeypatch.setattr("Core.Network.SMSGateway.time.sleep", lambda segundos: None)
+    respuestas = iter([(503, b"{}", {"Retry-After": "0"}), (201, b"{}", None)])
+    servidor = servidor_http(lambda peticion: next(respuestas))
+    cliente = TwilioHTTPClient(_config(servidor.url))
+
+    assert cliente.enviar("hola", "+52")
+    assert len(servidor.peticiones) == 2
+    cliente.cerrar()
+
+def test_conexion_rechazada_se_reintenta(monkeypatch):
+    esperas = []
+    monkeypatch.setattr("Core.Network.SMSGateway.time.sleep", esperas.append)
+    with socket.socket() as libre:
+        libre.bind(("127.0.0.1", 0))
+        puerto = libre.getsockname()[1]
+    cliente = TwilioHTTPClient(_config(f"http://127.0.0.1:{puerto}"))
+
+    assert cliente.enviar("hola", "+52") is False
+    assert len(esperas) == TwilioHTTPClient.MAX_REINTENTOS
+    cliente.cerrar()
@@ -0,0 +1,102 @@
+# Tesseract/tests/test_streaming_mail.py
+
+import smtplib
+import socketserver
+import threading
+from email import message_from_bytes, policy
+
+import pytest
+
+from Core.Network.StreamingMail import MensajeStreaming, enviar_streaming
+
+class ServidorSMTP(socketserver.ThreadingTCPServer):
+    """SMTP mínimo (sin TLS) que guarda cada mensaje; respuesta_data fija la respuesta final"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _ManejadorSMTP)
+        self.mensajes = []
+        self.respuesta_data = "250 ok"
+
+class _ManejadorSMTP(socketserver.StreamRequestHandler):
+    def handle(self):
+        responder = lambda linea: self.wfile.write((linea + "\r\n").encode("ascii"))
+        responder("220 prueba")
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            comando = linea.decode("ascii", "replace").strip().upper()
+            if comando.startswith("EHLO"):
+                responder("250-prueba")
+                responder("250 SIZE 10000000")
+            elif comando.startswith("DATA"):
+                responder("354 adelante")
+                cuerpo = bytearray()
+                while True:
+                    linea = self.rfile.readline()
+                    if linea in (b".\r\n", b""):
+                        break
+                    cuerpo += linea
+                self.server.mensajes.append(bytes(cuerpo))
+                responder(self.server.respuesta_data)
+            elif comando.startswith("QUIT"):
+                responder("221 adios")
+                return
+            else:
+                responder("250 ok")
+
+@pytest.fixture
+def servidor_smtp():
+    servidor = ServidorSMTP()
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+@pytest.fixture
+def sesion(servidor_smtp):
+    smtp = smtplib.SMTP("127.0.0.1", servidor_smtp.server_address[1], timeout=5)
+    yield smtp
+    smtp.close()
+
+def test_encabezados_y_adjunto_no_ascii(servidor_smtp, sesion, tmp_path):
+    ruta = tmp_path / "datos.txt"
+    ruta.write_bytes(b"M|0001|1.5\n" * 100)
+    asunto = "Reporte diario de medición — pozo Ñuñoa, válvula de extracción número 7 (acumulado)"
+    mensaje = MensajeStreaming(
+        "Telemetría <tesseract@example.com>", ["Operación <noc@example.com>"], asunto,
+        [("Medición_año_ñ.txt", str(ruta)), ('reporte "final".txt', str(ruta))]
+    )
+
+    assert enviar_streaming(sesion, mensaje) == {}
+
+    recibido = message_from_bytes(servidor_smtp.mensajes[0], policy=policy.default)
+    assert recibido["Subject"] == asunto
+    assert recibido["From"].addresses[0].display_name == "Telemetría"
+    adjuntos = list(recibido.iter_attachments())
+    assert [a.get_filename() for a in adjuntos] == ["Medición_año_ñ.txt", 'reporte "final".txt']
+    assert adjuntos[0].get_content() == ruta.read_bytes()
+
+def test_error_tras_data_cierra_la_sesion(servidor_smtp, sesion, tmp_path):
+    ruta = tmp_path / "datos.txt"
+    ruta.write_bytes(b"M|0001\n")
+    servidor_smtp.respuesta_data = "554 rechazado"
+    mensaje = MensajeStreaming("tesseract@example.com", ["noc@example.com"], "Reporte", [("datos.txt", str(ruta))])
+
+    with pytest.raises(smtplib.SMTPDataError):
+        enviar_streaming(sesion, mensaje)
+    # La sesión no vuelve a usarse: quien la tenga debe reconectar
+    assert sesion.sock is None
+
+def test_error_antes_de_data_conserva_la_sesion(servidor_smtp, sesion, tmp_path):
+    mensaje = MensajeStreaming(
+        "tesseract@example.com", ["noc@example.com"], "Reporte", [("falta.txt", str(tmp_path / "falta.txt"))]
+    )
+
+    with pytest.raises(FileNotFoundError):
+        enviar_streaming(sesion, mensaje)
+    assert sesion.noop()[0] == 250
+    assert servidor_smtp.mensajes == []
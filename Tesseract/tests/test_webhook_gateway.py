@@ -0,0 +1,86 @@
+# Tesseract/tests/test_webhook_gateway.py
+
+import json
+import threading
+import time
+
+import pytest
+
+from Core.Network.AlertManager import WebhookChannel
+from Core.Network.WebhookGateway import WebhookEndpoint, crear_sesion
+
+@pytest.fixture
+def endpoint_factory():
+    endpoints = []
+
+    def crear(url, **kwargs):
+        endpoint = WebhookEndpoint(url, crear_sesion(), **kwargs)
+        endpoints.append(endpoint)
+        return endpoint
+
+    yield crear
+    for endpoint in endpoints:
+        endpoint.detener()
+        endpoint.session.close()
+
+def _alertas(peticion):
+    return json.loads(peticion["cuerpo"])["alertas"]
+
+def test_publica_lote_json(servidor_http, endpoint_factory):
+    servidor = servidor_http()
+    endpoint = endpoint_factory(f"{servidor.url}/alertas", headers={"X-Token": "abc"}, origen="pozo-7")
+
+    assert endpoint.encolar("Nivel bajo", "noc").result(timeout=5)
+
+    peticion = servidor.peticiones[0]
+    assert peticion["ruta"] == "/alertas"
+    assert peticion["cabeceras"]["X-Token"] == "abc"
+    cuerpo = json.loads(peticion["cuerpo"])
+    assert cuerpo["origen"] == "pozo-7"
+    assert [(a["mensaje"], a["destino"]) for a in cuerpo["alertas"]] == [("Nivel bajo", "noc")]
+
+def test_rafaga_se_agrupa_en_una_conexion(servidor_http, endpoint_factory):
+    liberar = threading.Event()
+
+    def responder(peticion):
+        liberar.wait(5)   # la primera petición retiene el hilo mientras llega la ráfaga
+        return 200, b"{}", None
+
+    servidor = servidor_http(responder)
+    endpoint = endpoint_factory(servidor.url)
+
+    futuros = [endpoint.encolar(f"alerta {i}") for i in range(30)]
+    time.sleep(0.2)
+    liberar.set()
+
+    assert all(futuro.result(timeout=5) for futuro in futuros)
+    assert sum(len(_alertas(p)) for p in servidor.peticiones) == 30
+    assert len(servidor.peticiones) <= 2
+    assert servidor.conexiones == 1   # keep-alive entre lotes
+
+def test_reintenta_tras_5xx(servidor_http, endpoint_factory):
+    respuestas = iter([(503, b"{}", {"Retry-After": "0"}), (200, b"{}", None)])
+    servidor = servidor_http(lambda peticion: next(respuestas))
+    endpoint = endpoint_factory(servidor.url)
+
+    assert endpoint.encolar("alerta").result(timeout=5)
+    assert len(servidor.peticiones) == 2
+
+def test_rechazo_4xx_no_se_reintenta(servidor_http, endpoint_factory):
+    servidor = servidor_http(lambda peticion: (400, b"{}", None))
+    endpoint = endpoint_factory(servidor.url)
+
+    assert endpoint.encolar("alerta").result(timeout=5) is False
+    assert len(servidor.peticiones) == 1
+
+def test_canal_publica_en_todos_los_endpoints(servidor_http, error_handler):
+    noc, respaldo = servidor_http(), servidor_http(lambda peticion: (500, b"{}", {"Retry-After": "0"}))
+    canal = WebhookChannel({"webhooks": [noc.url, {"url": respaldo.url}]}, error_handler)
+    try:
+        # Un endpoint caído hace fallar el envío, pero el otro recibe la alerta
+        assert canal.send("ALERTA: prueba", "noc") is False
+        assert [a["mensaje"] for a in _alertas(noc.peticiones[0])] == ["ALERTA: prueba"]
+        assert len(respaldo.peticiones) == WebhookEndpoint.MAX_REINTENTOS
+        assert "WEBHOOK-SEND" in error_handler.codigos()
+    finally:
+        canal.cerrar()